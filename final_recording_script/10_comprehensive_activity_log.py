@@ -7,7 +7,15 @@ from datetime import datetime
 from pathlib import Path
 import threading
 from collections import deque
-import psutil
+
+from label_index import SegmentWriter
+from label_source import LabelSource
+from metrics_bus import Publisher
+from push_client import RowPusher
+from string_dict import StringDictionary, dict_path
+
+# psutil is imported lazily (init_io_counters / log_row) so that importing this
+# module, e.g. from the cold-start benchmark, stays cheap at login.
 
 # =========================
 # CONFIG
@@ -18,6 +26,25 @@ INPUT_ACTIVE_WINDOW = 3.0        # active threshold
 PROJECT_DIR = Path(__file__).resolve().parent
 CSV_PATH = PROJECT_DIR / "comprehensive_activity_log.csv"
 LABEL_FILE = PROJECT_DIR / "current_state.txt"
+# Labels are also recorded as (start_ts, end_ts, label) intervals in
+# label_segments.csv (see label_index.py). Set to False to stop repeating the
+# label on every row; readers then join it back with LabelIndex.attach().
+WRITE_LABEL_COLUMN = True
+# app_id / window_title are written as integer ids into a string dictionary
+# (comprehensive_activity_log.strings.csv, see string_dict.py). Only applies
+# to a new log: an existing plain log keeps getting plain text.
+ENCODE_STRINGS = True
+# Also push every row to a central collector (collector.py): "host:port" or a
+# UNIX socket path. Batches not yet acknowledged wait in PUSH_SPOOL (bounded).
+PUSH_SERVER = None
+PUSH_SPOOL = PROJECT_DIR / "push_spool"
+# Every sample is also published to a shared memory ring (metrics_bus.py) so
+# live_inference.py and friends can read it without tailing the CSV.
+PUBLISH_BUS = True
+BUS_FIELDS = [
+    "cpu_percent", "ram_percent", "disk_read_Bps", "disk_write_Bps", "net_in_Bps", "net_out_Bps",
+    "keyboard_active", "mouse_active", "keys_per_sec", "idle_time_sec", "max_gpu",
+]
 
 # =========================
 # GLOBAL STATE
@@ -30,10 +57,25 @@ keys_counter = 0
 # GPU State
 latest_gpu_data = {}
 gpu_headers = []
+gpu_headers_ready = threading.Event()
+
+# System IO State (filled by init_io_counters() at startup)
+prev_disk = None
+prev_net = None
+
+# Label State: LabelSource watches current_state.txt (inotify) and label.sock
+# and records each switch in label_segments.csv with its exact timestamp
+label_segments = SegmentWriter()
+label_source = LabelSource(LABEL_FILE, on_change=label_segments.update)
 
-# System IO State
-prev_disk = psutil.disk_io_counters()
-prev_net = psutil.net_io_counters()
+# String dictionary (set up in main() when ENCODE_STRINGS applies)
+strings = None
+
+# Collector client (set up in main() when PUSH_SERVER is set)
+pusher = None
+
+# Shared memory bus (the segment is created on the first sample)
+bus = Publisher() if PUBLISH_BUS else None
 
 # =========================
 # GPU MONITOR THREAD
@@ -62,6 +104,7 @@ def gpu_listener():
         # Detect header row
         if "Freq MHz req" in line:
             gpu_headers = [f"gpu_{p.strip().replace(' ', '_').replace('%', 'pct')}" for p in parts]
+            gpu_headers_ready.set()
             continue
         
         # Parse data row
@@ -122,18 +165,20 @@ def get_idle_time():
     return round(time.time() - max(last_keyboard_time, last_mouse_time), 1)
 
 def get_current_label():
-    try:
-        if LABEL_FILE.exists():
-            return LABEL_FILE.read_text().strip()
-    except Exception:
-        pass
-    return "none"
+    return label_source.label
+
+def init_io_counters():
+    global prev_disk, prev_net
+    import psutil
+    prev_disk = psutil.disk_io_counters()
+    prev_net = psutil.net_io_counters()
 
 # =========================
 # MAIN LOGGER
 # =========================
 def log_row():
     global prev_disk, prev_net
+    import psutil
 
     # 1. System Metrics
     cpu = psutil.cpu_percent()
@@ -153,6 +198,10 @@ def log_row():
     win_data = get_focused_window()
     app_id = win_data.get("app_id", "unknown") if win_data else "none"
     win_title = win_data.get("title", "none") if win_data else "none"
+    plain_text = [app_id, win_title]
+    if strings is not None:
+        app_id = strings.encode(app_id)
+        win_title = strings.encode(win_title)
 
     # 3. Input Metrics
     k_active = int(time.time() - last_keyboard_time <= INPUT_ACTIVE_WINDOW)
@@ -180,25 +229,24 @@ def log_row():
 
     # 5. Build Final Row
     # Order: timestamp, cpu, ram, disk_r, disk_w, net_i, net_o, app_id, title, k_act, m_act, kps, idle, max_gpu, [all gpu stats]
-    current_label = get_current_label()
+    now = datetime.now()
+    label = get_current_label()
 
     row = [
-        datetime.now().isoformat(timespec="seconds"),
+        now.isoformat(timespec="seconds"),
         cpu, ram, d_read, d_write, n_in, n_out,
         app_id, win_title,
         k_active, m_active, kps, idle,
         max_gpu_val,
-        current_label
-    ] + gpu_row_data
+    ] + ([label] if WRITE_LABEL_COLUMN else []) + gpu_row_data
 
     # 6. CSV Header Init (Dynamic based on GPU headers)
+    base_headers = [
+        "timestamp", "cpu_percent", "ram_percent", "disk_read_Bps", "disk_write_Bps",
+        "net_in_Bps", "net_out_Bps", "app_id", "window_title",
+        "keyboard_active", "mouse_active", "keys_per_sec", "idle_time_sec", "max_gpu",
+    ] + (["label"] if WRITE_LABEL_COLUMN else [])
     if not CSV_PATH.exists():
-        base_headers = [
-            "timestamp", "cpu_percent", "ram_percent", "disk_read_Bps", "disk_write_Bps",
-            "net_in_Bps", "net_out_Bps", "app_id", "window_title",
-            "keyboard_active", "mouse_active", "keys_per_sec", "idle_time_sec", "max_gpu",
-            "label"
-        ]
         full_headers = base_headers + (gpu_headers if gpu_headers else ["gpu_data_pending"])
         with open(CSV_PATH, "w", newline="") as f:
             csv.writer(f).writerow(full_headers)
@@ -207,18 +255,40 @@ def log_row():
     with open(CSV_PATH, "a", newline="") as f:
         csv.writer(f).writerow(row)
 
+    # 8. Push (plain text, and no GPU columns until their names are known)
+    if pusher is not None:
+        if not WRITE_LABEL_COLUMN:
+            base_headers = base_headers + ["label"]
+        pushed = row[:7] + plain_text + row[9:14] + [label]
+        pusher.push(base_headers + gpu_headers, pushed + (gpu_row_data if gpu_headers else []))
+
+    # 9. Publish numeric fields to the shared memory bus
+    if bus is not None:
+        bus.publish(now.timestamp(), BUS_FIELDS + gpu_headers,
+                    [cpu, ram, d_read, d_write, n_in, n_out, k_active, m_active, kps, idle, max_gpu_val]
+                    + (gpu_row_data if gpu_headers else []))
+
 # =========================
 # MAIN EXECUTION
 # =========================
-if __name__ == "__main__":
+def main():
+    global strings, pusher
     print(f"Logging started. Saving to {CSV_PATH}")
-    
+    init_io_counters()
+    if ENCODE_STRINGS and (not CSV_PATH.exists() or dict_path(CSV_PATH).exists()):
+        strings = StringDictionary(dict_path(CSV_PATH))
+        print(f"Window titles / app ids are dictionary-encoded in {dict_path(CSV_PATH).name}")
+    label_source.start()
+    if PUSH_SERVER:
+        pusher = RowPusher(PUSH_SERVER, PUSH_SPOOL).start()
+        print(f"Pushing rows to {PUSH_SERVER} (spool: {PUSH_SPOOL})")
+
     # Start Background Threads
     threading.Thread(target=input_listener, daemon=True).start()
     threading.Thread(target=gpu_listener, daemon=True).start()
 
-    # Wait a moment for GPU headers to populate
-    time.sleep(1.5)
+    # Wait for GPU headers to populate (at most 1.5s, usually much less)
+    gpu_headers_ready.wait(timeout=1.5)
 
     try:
         while True:
@@ -229,3 +299,13 @@ if __name__ == "__main__":
             time.sleep(max(0, INTERVAL - elapsed))
     except KeyboardInterrupt:
         print("\nLogging stopped.")
+    finally:
+        with label_source.lock:
+            label_segments.close()
+        if pusher is not None:
+            pusher.close()
+        if bus is not None:
+            bus.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Rolling-window feature definitions shared by training and inference.
+
+Feature order is the one train_model.py has always produced: the raw
+columns first, then for every column and window its mean and std.
+Only NumPy is imported here so the live daemon can use it without pandas.
+"""
+import numpy as np
+
+# Raw metrics the activity model is trained on (MUST MATCH train_model.py)
+NUMERIC_COLS = [
+    'cpu_percent', 'ram_percent',
+    'disk_read_Bps', 'disk_write_Bps',
+    'net_in_Bps', 'net_out_Bps',
+    'idle_time_sec',
+    'gpu_RC6_pct', 'gpu_RCS_pct', 'gpu_VCS_pct',
+    'gpu_Power_W_pkg'
+]
+WINDOWS = [5, 30]
+
+
+def feature_names(cols=NUMERIC_COLS, windows=WINDOWS):
+    names = list(cols)
+    for col in cols:
+        for w in windows:
+            names.append(f'{col}_mean_{w}s')
+            names.append(f'{col}_std_{w}s')
+    return names
+
+
+def latest_feature_row(history, cols=NUMERIC_COLS, windows=WINDOWS):
+    """
+    Feature vector for the newest row of `history` (rows x len(cols)).
+
+    Equivalent to the last row of pandas' rolling(w, min_periods=1) mean and
+    std (ddof=1, NaN -> 0) used in training, computed on the tail only.
+    """
+    history = np.asarray(history, dtype=np.float64)
+    n_cols = len(cols)
+    out = np.zeros(n_cols * (1 + 2 * len(windows)))
+    if len(history) == 0:
+        return out
+
+    out[:n_cols] = history[-1]
+    stats = np.empty((n_cols, len(windows), 2))
+    for j, w in enumerate(windows):
+        tail = history[-w:]
+        stats[:, j, 0] = tail.mean(axis=0)
+        stats[:, j, 1] = tail.std(axis=0, ddof=1) if len(tail) > 1 else 0.0
+    out[n_cols:] = stats.ravel()
+    return out
+
+
+def rolling_features(raw, cols=NUMERIC_COLS, windows=WINDOWS):
+    """Feature DataFrame (training order) from a DataFrame holding `cols`."""
+    features = raw[cols].copy()
+    for col in cols:
+        for w in windows:
+            features[f'{col}_mean_{w}s'] = features[col].rolling(window=w, min_periods=1).mean()
+            features[f'{col}_std_{w}s'] = features[col].rolling(window=w, min_periods=1).std().fillna(0)
+    return features
+
+
+def iter_feature_chunks(path, cols=NUMERIC_COLS, windows=WINDOWS, chunksize=100_000,
+                        target_col='label', dtype=np.float32):
+    """
+    Stream (X, y, start_row) feature chunks from a time-ordered log.
+
+    The last max(windows) - 1 raw rows of each chunk are carried into the
+    next one, so rolling values match the full-file computation (up to the
+    float32 downcast); only one chunk plus that context is ever in memory. The first
+    max(windows) rows of the file are skipped, as in full-file training.
+    `start_row` counts rows after that skip.
+    """
+    import pandas as pd
+
+    context_len = max(windows) - 1
+    skip = max(windows)
+    context = None
+    last_ts = None
+    row = 0
+    reader = pd.read_csv(
+        path,
+        usecols=['timestamp', target_col, *cols],
+        dtype={c: dtype for c in cols},
+        chunksize=chunksize,
+    )
+    for chunk in reader:
+        ts = chunk['timestamp']
+        if last_ts is not None and ts.iloc[0] < last_ts:
+            print(f"Warning: {path} is not time-ordered around row {row}; features may be off there.")
+        last_ts = ts.iloc[-1]
+
+        raw = chunk[cols]
+        n_context = 0
+        if context is not None:
+            n_context = len(context)
+            raw = pd.concat([context, raw], ignore_index=True)
+        context = raw.iloc[-context_len:] if context_len else raw.iloc[:0]
+
+        features = rolling_features(raw, cols, windows).iloc[n_context:].fillna(0)
+        y = chunk[target_col].to_numpy()
+        if skip:
+            drop = min(skip, len(features))
+            features, y, skip = features.iloc[drop:], y[drop:], skip - drop
+        if len(features):
+            yield features.to_numpy(dtype=dtype), y, row
+            row += len(features)
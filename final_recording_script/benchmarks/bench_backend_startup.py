@@ -0,0 +1,73 @@
+"""
+Startup time and peak RSS of each inference backend.
+
+    python benchmarks/bench_backend_startup.py [--repeat 5]
+
+Every run is a fresh interpreter that imports the backend, loads the model
+and predicts one row, exactly what live_inference.py does before its first
+output line. Peak RSS comes from the child's own rusage.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent.parent
+
+CHILD = """
+import numpy as np
+from inference_backends import load_backend
+backend = load_backend({name!r})
+backend.predict(np.zeros((1, len(backend.feature_names_in_)), dtype=np.float32))
+"""
+
+
+def run_once(name):
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-c", CHILD.format(name=name)],
+        cwd=SCRIPT_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    _, status, usage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - t0
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{name} backend exited with {proc.returncode}")
+    # ru_maxrss is reported in KiB on Linux
+    return elapsed, usage.ru_maxrss / 1024
+
+
+def main():
+    from inference_backends import BACKENDS, resolve_model_path
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Model paths are relative to the scripts, where the children run too
+    os.chdir(SCRIPT_DIR)
+    print(f"{'backend':<10} {'startup (s)':>12} {'peak RSS (MB)':>14}  model")
+    for name in BACKENDS:
+        # Same default/fallback resolution as load_backend (flat falls back to the joblib)
+        model_path = resolve_model_path(name)
+        if not os.path.exists(model_path):
+            print(f"{name:<10} {'skipped: ' + model_path + ' missing':>27}")
+            continue
+        try:
+            runs = [run_once(name) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{name:<10} {'failed: ' + str(e):>27}")
+            continue
+        startup = statistics.median(r[0] for r in runs)
+        rss = max(r[1] for r in runs)
+        print(f"{name:<10} {startup:>12.3f} {rss:>14.1f}  {model_path}")
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(SCRIPT_DIR))
+    main()
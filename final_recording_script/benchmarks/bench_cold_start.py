@@ -0,0 +1,75 @@
+"""
+Cold-start regression check for the login-time entry points.
+
+    python benchmarks/bench_cold_start.py [--repeat 5] [--scale 1.0]
+
+Imports each entry module in a fresh interpreter under `python -X importtime`
+and sums the cumulative time of the top-level imports. Exits with status 1
+if any module goes over its budget or pulls in a module that must stay lazy
+(e.g. pandas in live_inference). Budgets are in milliseconds; --scale
+multiplies all of them for slower machines.
+"""
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent.parent
+
+# module -> (budget in ms, modules that must not be imported at startup)
+ENTRY_POINTS = {
+    'live_inference': (250, ['pandas', 'sklearn', 'joblib', 'torch']),
+    '10_comprehensive_activity_log': (50, ['psutil', 'numpy', 'pandas']),
+}
+
+
+def import_profile(module):
+    """Return (total_ms, set of imported module names) for one cold import."""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         f'import importlib; importlib.import_module({module!r})'],
+        cwd=SCRIPT_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    total_us = 0
+    imported = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        imported.add(name.strip())
+        # Top-level entries (no indentation) already include their children
+        if not name.startswith('  '):
+            total_us += int(cumulative)
+    return total_us / 1000, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import time budget check")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--scale', type=float, default=1.0, help="Multiply every budget")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'module':<32} {'import (ms)':>12} {'budget (ms)':>12}  status")
+    for module, (budget, forbidden) in ENTRY_POINTS.items():
+        budget *= args.scale
+        runs = [import_profile(module) for _ in range(args.repeat)]
+        best = min(r[0] for r in runs)
+        leaked = sorted(m for m in forbidden if m in runs[0][1])
+
+        status = 'ok'
+        if best > budget:
+            status = 'OVER BUDGET'
+        if leaked:
+            status = f"eager import of {', '.join(leaked)}"
+        failed |= status != 'ok'
+        print(f"{module:<32} {best:>12.1f} {budget:>12.0f}  {status}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
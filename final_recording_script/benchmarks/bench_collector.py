@@ -0,0 +1,163 @@
+"""
+Collector end-to-end check on localhost: throughput, spool replay, no loss.
+
+    python benchmarks/bench_collector.py [log.csv] [--clients 4] [--rows 10000] [--batch 500]
+                                         [--unix]
+
+Starts collector.py in a subprocess on a free 127.0.0.1 port (or a UNIX
+socket with --unix) with a throw-away fleet store, then:
+
+1. offline: --clients processes push --rows rows each (replayed from the
+   log, one host name per client) while no collector is running, so
+   everything lands in their spools;
+2. the collector starts and the spools drain;
+3. the same clients push another --rows rows each, live.
+
+Reports rows/s for both phases and the per-client counters, and exits with
+status 1 unless the store ends up holding exactly clients * 2 * rows rows.
+"""
+import argparse
+import csv
+import multiprocessing as mp
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent.parent
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def load_rows(path, n, offset):
+    """n rows of the log as pushed values, timestamps shifted so every phase is distinct."""
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        base = [r for _, r in zip(range(n), reader)]
+    text = {"timestamp", "app_id", "window_title", "label"}
+    rows = []
+    for i in range(n):
+        src = base[i % len(base)]
+        # Repeat the log with a shift so tiled rows stay distinct
+        shift = timedelta(seconds=offset + (i // len(base)) * len(base))
+        row = [(datetime.fromisoformat(v) + shift).isoformat() if c == "timestamp"
+               else v if c in text else float(v) if v else None
+               for c, v in zip(header, src)]
+        rows.append(row)
+    return header, rows
+
+
+def client(address, spool, host, header, rows, batch, done):
+    import push_client
+    from push_client import RowPusher
+
+    # Reconnect quickly once the collector is up, so the replay time is not backoff
+    push_client.RETRY_MAX = 0.5
+    pusher = RowPusher(address, spool, host=host, batch_rows=batch, batch_seconds=1e9).start()
+    for row in rows:
+        pusher.push(header, row)
+    pusher.flush()
+    done.set()
+    pusher.close(timeout=600)
+
+
+def run_clients(address, tmp, args, header, rows):
+    done = [mp.Event() for _ in range(args.clients)]
+    procs = [mp.Process(target=client, args=(address, Path(tmp) / f"spool{i}", f"host{i}",
+                                              header, rows, args.batch, done[i]))
+             for i in range(args.clients)]
+    for p in procs:
+        p.start()
+    return procs, done
+
+
+def wait_stored(address, expected, timeout=600):
+    from collector import fetch_stats
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            snapshot = fetch_stats(address)
+        except OSError:
+            time.sleep(0.2)
+            continue
+        if snapshot["rows_stored"] >= expected and snapshot["queued_batches"] == 0:
+            return snapshot
+        time.sleep(0.05)
+    raise TimeoutError(f"store did not reach {expected} rows")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("csv", nargs="?", default=str(SCRIPT_DIR / "comprehensive_activity_log_with_Idle.csv"))
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=10_000, help="Rows per client per phase")
+    parser.add_argument("--batch", type=int, default=500, help="Rows per batch")
+    parser.add_argument("--unix", action="store_true", help="UNIX socket instead of TCP")
+    args = parser.parse_args()
+
+    header, offline_rows = load_rows(args.csv, args.rows, offset=0)
+    _, live_rows = load_rows(args.csv, args.rows, offset=10 ** 7)
+
+    with tempfile.TemporaryDirectory(prefix="bench_collector_") as tmp:
+        address = f"{tmp}/collector.sock" if args.unix else f"127.0.0.1:{free_port()}"
+        store = Path(tmp) / "store"
+        total = args.clients * args.rows
+
+        # 1. Offline: everything goes to the spools
+        procs, done = run_clients(address, tmp, args, header, offline_rows)
+        for d in done:
+            d.wait()
+        spooled = sum(len(list((Path(tmp) / f"spool{i}").glob("*.batch"))) for i in range(args.clients))
+        print(f"offline: {total} rows pushed, {spooled} batches spooled")
+
+        # 2. Collector comes up, spools drain
+        server = subprocess.Popen([sys.executable, str(SCRIPT_DIR / "collector.py"), "serve",
+                                   "--listen", address, "--store", str(store)],
+                                  cwd=SCRIPT_DIR, stdout=subprocess.DEVNULL)
+        try:
+            t0 = time.perf_counter()
+            wait_stored(address, total)
+            drain_s = time.perf_counter() - t0
+            for p in procs:
+                p.join()
+            print(f"replay:  {total} rows in {drain_s:.2f}s ({total / drain_s:,.0f} rows/s, "
+                  f"includes collector start-up)")
+
+            # 3. Live
+            t0 = time.perf_counter()
+            procs, _ = run_clients(address, tmp, args, header, live_rows)
+            snapshot = wait_stored(address, 2 * total)
+            live_s = time.perf_counter() - t0
+            for p in procs:
+                p.join()
+            print(f"live:    {total} rows in {live_s:.2f}s ({total / live_s:,.0f} rows/s, "
+                  f"includes client start-up)")
+            for c in sorted(snapshot["clients"], key=lambda c: c["host"]):
+                print(f"  {c['host']:<8} {c['rows']:>8} rows {c['batches']:>5} batches "
+                      f"{c['bytes'] / 1e6:>7.2f} MB {c['avg_rows_per_s']:>10,.0f} rows/s")
+        finally:
+            server.terminate()
+            server.wait()
+
+        from fleet_store import FleetStore
+        stored = FleetStore(store).load()
+        left = sum(len(list((Path(tmp) / f"spool{i}").glob("*.batch"))) for i in range(args.clients))
+        ok = len(stored) == 2 * total and not stored.duplicated().any() and left == 0
+        print(f"store: {len(stored)} rows from {stored['host'].nunique()} hosts, "
+              f"{left} batches left in spools -> {'OK' if ok else 'MISMATCH'}")
+        if not ok:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(SCRIPT_DIR))
+    main()
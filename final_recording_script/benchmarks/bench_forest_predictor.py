@@ -0,0 +1,89 @@
+"""
+Single-row and batch latency: sklearn RandomForest vs FlatForest.
+
+    python benchmarks/bench_forest_predictor.py [activity_model.joblib] [log.csv]
+
+Before timing, the flat predictor is checked against sklearn on real rows
+from the log (labels identical, probabilities equal to within float64
+rounding) and the script exits non-zero on any mismatch.
+"""
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+SCRIPT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SCRIPT_DIR))
+
+from forest_predictor import FlatForest  # noqa: E402
+
+WINDOWS = [5, 30]
+
+
+def build_features(csv_path, feature_names):
+    df = pd.read_csv(csv_path)
+    raw_cols = [c for c in feature_names if '_mean_' not in c and '_std_' not in c]
+    features = df[raw_cols].copy()
+    for col in raw_cols:
+        for w in WINDOWS:
+            features[f'{col}_mean_{w}s'] = features[col].rolling(window=w, min_periods=1).mean()
+            features[f'{col}_std_{w}s'] = features[col].rolling(window=w, min_periods=1).std().fillna(0)
+    return features[feature_names].fillna(0)
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return min(timings)
+
+
+def main():
+    model_path = sys.argv[1] if len(sys.argv) > 1 else SCRIPT_DIR / 'activity_model.joblib'
+    csv_path = sys.argv[2] if len(sys.argv) > 2 else SCRIPT_DIR / 'comprehensive_activity_log_with_Idle.csv'
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        model = joblib.load(model_path)
+    forest = FlatForest.from_sklearn(model)
+    X = build_features(csv_path, list(model.feature_names_in_))
+
+    # --- Exactness ---
+    labels, probs = forest.predict(X)
+    sk_probs = model.predict_proba(X)
+    sk_labels = model.predict(X)
+    n_label_diff = int((labels != sk_labels).sum())
+    max_prob_diff = float(np.abs(probs - sk_probs).max())
+    print(f"Checked {len(X)} rows: {n_label_diff} label mismatches, max |dp| = {max_prob_diff:.1e}")
+    if n_label_diff or max_prob_diff > 1e-12:
+        print("FAIL: flat predictor disagrees with sklearn")
+        sys.exit(1)
+
+    # --- Latency ---
+    one_df = X.iloc[[-1]]
+    one_np = one_df.to_numpy()
+    batch_df = X.iloc[-1000:]
+    batch_np = batch_df.to_numpy()
+    model.set_params(n_jobs=1)
+
+    cases = [
+        ('sklearn predict+predict_proba, 1 row',
+         lambda: (model.predict(one_df), model.predict_proba(one_df)), 20),
+        ('flat predict, 1 row', lambda: forest.predict(one_np), 200),
+        ('sklearn predict+predict_proba, 1000 rows',
+         lambda: (model.predict(batch_df), model.predict_proba(batch_df)), 5),
+        ('flat predict, 1000 rows', lambda: forest.predict(batch_np), 20),
+    ]
+    print(f"\n{'case':<45} {'best (ms)':>10}")
+    for name, fn, repeat in cases:
+        print(f"{name:<45} {best_of(fn, repeat) * 1000:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Throughput / latency of the micro-batching inference server vs batch limits.
+
+    python benchmarks/bench_inference_server.py [--hosts 64] [--seconds 5]
+                                                [--configs 1:0 16:2 64:5 256:10]
+
+For each max_batch:max_delay_ms config, starts inference_server.py on a free
+localhost port and runs --hosts simulated hosts (asyncio connections in one
+process), each sending one feature row, waiting for the answer, and
+repeating, for --seconds. Reports requests/s, client-side p50/p99 latency
+and the mean batch size the server formed. 1:0 is one predict() call per
+row, i.e. what every host does on its own today.
+
+With a closed loop no batch can exceed --hosts, so a max_batch above that
+always waits out the full delay: that is the knee to look for.
+"""
+import argparse
+import asyncio
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+SCRIPT_DIR = Path(__file__).resolve().parent.parent
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def host_loop(port, rows, deadline, latencies, index):
+    from inference_server import _REQ
+    from push_client import _LEN, frame
+
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    req_id = 0
+    while time.perf_counter() < deadline:
+        req_id += 1
+        row = rows[(index + req_id) % len(rows)]
+        t0 = time.perf_counter()
+        writer.write(frame(b"P", _REQ.pack(req_id) + row.tobytes()))
+        (length,) = _LEN.unpack(await reader.readexactly(_LEN.size))
+        data = await reader.readexactly(length)
+        if data[:1] != b"R":
+            raise RuntimeError(data[1 + _REQ.size:].decode(errors="replace"))
+        latencies.append(time.perf_counter() - t0)
+    writer.close()
+
+
+async def load(port, n_hosts, seconds, rows):
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(*(host_loop(port, rows, deadline, latencies, i) for i in range(n_hosts)))
+    return np.array(latencies)
+
+
+def wait_ready(port, rows, timeout=60):
+    from inference_server import RemoteModel
+
+    model = RemoteModel(f"127.0.0.1:{port}", host="bench")
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            model.predict(rows[:1])
+            model.close()
+            return
+        except (OSError, RuntimeError):
+            model.close()
+            time.sleep(0.2)
+    raise TimeoutError("inference server did not come up")
+
+
+def main():
+    from activity_features import NUMERIC_COLS, WINDOWS, latest_feature_row
+    from inference_server import fetch_stats
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--configs", nargs="+", default=["1:0", "16:2", "64:5", "256:10"],
+                        help="max_batch:max_delay_ms pairs")
+    parser.add_argument("--backend", default=None)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    history = rng.random((2000, len(NUMERIC_COLS))) * 100
+    rows = np.array([latest_feature_row(history[i:i + 60], NUMERIC_COLS, WINDOWS)
+                     for i in range(0, 1900, 10)], dtype="<f8")
+
+    print(f"{args.hosts} hosts, closed loop, {args.seconds:g} s per config")
+    print(f"{'batch:delay':>12} {'req/s':>9} {'p50 (ms)':>9} {'p99 (ms)':>9} {'mean batch':>11} {'predict (ms)':>13}")
+    for config in args.configs:
+        max_batch, max_delay = config.split(":")
+        port = free_port()
+        cmd = [sys.executable, "-W", "ignore", str(SCRIPT_DIR / "inference_server.py"), "serve",
+               "--listen", f"127.0.0.1:{port}", "--max-batch", max_batch, "--max-delay-ms", max_delay]
+        if args.backend:
+            cmd += ["--backend", args.backend]
+        server = subprocess.Popen(cmd, cwd=SCRIPT_DIR, stdout=subprocess.DEVNULL)
+        try:
+            wait_ready(port, rows)
+            latencies = asyncio.run(load(port, args.hosts, args.seconds, rows))
+            stats = fetch_stats(f"127.0.0.1:{port}")
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{config:>12} {len(latencies) / args.seconds:>9,.0f} "
+              f"{np.percentile(latencies, 50) * 1000:>9.2f} {np.percentile(latencies, 99) * 1000:>9.2f} "
+              f"{stats['batch_size']['mean']:>11.1f} {stats['predict_ms']['mean']:>13.2f}")
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(SCRIPT_DIR))
+    main()
@@ -0,0 +1,130 @@
+"""
+Metrics bus: publisher cost vs number of subscribers, torn-read check, and
+subscriber read cost vs tailing the CSV.
+
+    python benchmarks/bench_metrics_bus.py [log.csv] [--samples 200000] [--subscribers 0 1 4 8]
+
+For each subscriber count, one process publishes --samples samples as fast
+as it can (sample k has every field = k) while the subscribers spin on
+latest(60). Reports the publisher's cost per sample and the subscribers'
+reads, and exits with status 1 if any read returned a torn or out-of-order
+window. Then times one latest(60, NUMERIC_COLS) read against what
+live_inference does without the bus (read_tail_lines + parse_row).
+"""
+import argparse
+import multiprocessing as mp
+import sys
+import time
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent.parent
+N_FIELDS = 29
+WINDOW = 60
+
+
+def subscriber(name, ready, stop, results):
+    import numpy as np
+    from metrics_bus import Subscriber
+
+    while True:
+        try:
+            sub = Subscriber(name)
+            break
+        except FileNotFoundError:
+            time.sleep(0.001)
+    ready.set()
+    reads = torn = 0
+    while not stop.is_set():
+        ts, values = sub.latest(WINDOW)
+        if len(ts) == 0:
+            continue
+        reads += 1
+        # Every field of sample k is k, and the window is consecutive
+        if not (values == ts[:, None]).all() or not (np.diff(ts) == 1).all():
+            torn += 1
+    sub.close()
+    results.put((reads, torn))
+
+
+def run(n_subscribers, n_samples):
+    from metrics_bus import Publisher
+
+    name = f"bench_bus_{n_subscribers}"
+    fields = [f"f{i}" for i in range(N_FIELDS)]
+    pub = Publisher(name)
+    pub.publish(0.0, fields, [0.0] * N_FIELDS)
+
+    ready = [mp.Event() for _ in range(n_subscribers)]
+    stop = mp.Event()
+    results = mp.Queue()
+    procs = [mp.Process(target=subscriber, args=(name, r, stop, results)) for r in ready]
+    for p in procs:
+        p.start()
+    for r in ready:
+        r.wait()
+
+    # CPU time, not wall time: on a machine with fewer cores than processes
+    # the spinning subscribers would otherwise show up as publisher cost
+    t0 = time.process_time()
+    for k in range(1, n_samples):
+        pub.publish(float(k), fields, [float(k)] * N_FIELDS)
+    publish_s = time.process_time() - t0
+
+    stop.set()
+    stats = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    pub.close()
+    return publish_s / (n_samples - 1), sum(s[0] for s in stats), sum(s[1] for s in stats)
+
+
+def read_cost(csv_path, repeat=2000):
+    import numpy as np
+    from activity_features import NUMERIC_COLS
+    from live_inference import parse_row, read_header, read_tail_lines
+    from metrics_bus import Publisher, Subscriber
+
+    pub = Publisher("bench_bus_read")
+    fields = NUMERIC_COLS + [f"gpu_x{i}" for i in range(N_FIELDS - len(NUMERIC_COLS))]
+    for k in range(WINDOW * 2):
+        pub.publish(float(k), fields, np.random.rand(N_FIELDS).tolist())
+    sub = Subscriber("bench_bus_read")
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        sub.latest(WINDOW, NUMERIC_COLS)
+    bus_s = (time.perf_counter() - t0) / repeat
+    sub.close()
+    pub.close()
+
+    header = read_header(csv_path)
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        [parse_row(line, header) for line in read_tail_lines(csv_path, WINDOW)]
+    csv_s = (time.perf_counter() - t0) / repeat
+    return bus_s, csv_s
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("csv", nargs="?", default=str(SCRIPT_DIR / "comprehensive_activity_log_with_Idle.csv"))
+    parser.add_argument("--samples", type=int, default=200_000)
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[0, 1, 4, 8])
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'subscribers':>11} {'publish (us CPU)':>17} {'reads':>9} {'torn':>6}")
+    for n in args.subscribers:
+        per_sample, reads, torn = run(n, args.samples)
+        failed |= torn > 0
+        print(f"{n:>11} {per_sample * 1e6:>17.2f} {reads:>9} {torn:>6}")
+
+    bus_s, csv_s = read_cost(args.csv)
+    print(f"\nlatest {WINDOW} samples: bus {bus_s * 1e6:.1f} us, "
+          f"CSV tail + parse {csv_s * 1e6:.1f} us ({csv_s / bus_s:.0f}x)")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(SCRIPT_DIR))
+    main()
@@ -0,0 +1,79 @@
+"""
+Render time and peak RSS of a time-series plot with and without min/max
+downsampling (plot_utils.plot_lod).
+
+    python benchmarks/bench_plot_lod.py [--rows 1000000 10000000]
+
+Every case runs in a fresh interpreter: it builds a synthetic 1 Hz log of
+the given length (random-walk CPU with spikes), draws it as
+plot_state_overlay does (15 in wide, 100 dpi) and saves a PNG to memory.
+Timing covers plot + savefig only; peak RSS comes from the child's rusage.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent.parent
+
+CHILD = """
+import io, sys, time
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+from plot_utils import plot_lod
+
+rng = np.random.default_rng(0)
+n = {rows}
+x = np.datetime64("2025-01-01T00:00:00") + np.arange(n).astype("timedelta64[s]")
+y = np.clip(10 + np.cumsum(rng.normal(0, 0.5, n)) % 60 + (rng.random(n) < 1e-4) * 40, 0, 100)
+
+t0 = time.perf_counter()
+fig, ax = plt.subplots(figsize=(15, 4), dpi=100)
+if {lod}:
+    plot_lod(ax, x, y, linewidth=1)
+else:
+    ax.plot(x, y, linewidth=1)
+fig.savefig(io.BytesIO(), format="png")
+print(time.perf_counter() - t0)
+"""
+
+
+def run_case(rows, lod):
+    proc = subprocess.Popen(
+        [sys.executable, "-c", CHILD.format(rows=rows, lod=lod)],
+        cwd=SCRIPT_DIR,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    out = proc.stdout.read()
+    _, status, usage = os.wait4(proc.pid, 0)
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise RuntimeError(f"{rows} rows (lod={lod}) exited with {os.waitstatus_to_exitcode(status)}")
+    # ru_maxrss is reported in KiB on Linux
+    return float(out), usage.ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>12} {'mode':<6} {'render (s)':>11} {'peak RSS (MB)':>14}")
+    for rows in args.rows:
+        for lod in (False, True):
+            t0 = time.perf_counter()
+            try:
+                render, rss = run_case(rows, lod)
+            except RuntimeError as e:
+                print(f"{rows:>12} {'lod' if lod else 'raw':<6} failed after {time.perf_counter() - t0:.0f}s: {e}")
+                continue
+            print(f"{rows:>12} {'lod' if lod else 'raw':<6} {render:>11.2f} {rss:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+HMM sequence decoding vs per-row predictions and the k-of-n vote, and
+decoder speed.
+
+    python benchmarks/bench_sequence_decoder.py [log.csv] [--lags 0 2 5 10] [--days 30]
+
+Transitions are fitted on the first 80% of the labelled log, then the held-out
+20% (the rows train_model.py tests on) is decoded with each method. Each method
+reports its accuracy against the labels and its number of state changes.
+Fixed-lag output is compared to the label of the row it commits, `lag` rows back.
+
+Speed: Viterbi over --days synthetic 86400-row days, all days in one batched
+pass vs one call per day, and the per-row cost of FixedLagDecoder.update.
+"""
+import argparse
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+SCRIPT_DIR = Path(__file__).resolve().parent.parent
+
+
+def changes(states):
+    states = np.asarray(states)
+    return int((states[1:] != states[:-1]).sum())
+
+
+def accuracy_table(csv_path, backend, lags):
+    from activity_features import NUMERIC_COLS, WINDOWS, rolling_features
+    from inference_backends import load_backend
+    from sequence_decoder import FixedLagDecoder, SequenceModel, decode_days, load_labelled_log, split_points
+    from state_smoothing import smooth_labels
+    from train_model import TEST_FRACTION
+
+    df = load_labelled_log(csv_path)
+    X = rolling_features(df, NUMERIC_COLS, WINDOWS).fillna(0)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        classifier = load_backend(backend)
+    raw, probs = classifier.predict(X[classifier.feature_names_in_].to_numpy())
+
+    skip = max(WINDOWS)
+    split = skip + int((len(df) - skip) * (1 - TEST_FRACTION))
+    train, test = df.iloc[:split], df.iloc[split:]
+    hmm = SequenceModel.fit(train['label'].to_numpy(), np.sort(np.concatenate(split_points(train['timestamp']))))
+    truth = test['label'].to_numpy()
+    raw, probs = raw[split:], probs[split:]
+
+    rows = [('per-row', raw)]
+    rows.append(('vote 3:5', smooth_labels(raw, 3, 5)[0]))
+    log_emit = hmm.emissions(probs, classifier.classes_)
+    rows.append(('viterbi', np.asarray(hmm.classes)[decode_days(log_emit, test['timestamp'], hmm)]))
+    for lag in lags:
+        decoder = FixedLagDecoder(hmm, lag)
+        states = [decoder.update(p, classifier.classes_)[0] for p in probs]
+        # The state emitted at row t is the decision for row t - lag
+        rows.append((f'lag {lag}', states[lag:] + states[-1:] * lag))
+
+    print(f"{len(test)} held-out rows, {changes(truth)} true label changes")
+    print(f"{'method':>10} {'accuracy':>9} {'changes':>8}")
+    for name, states in rows:
+        print(f"{name:>10} {(np.asarray(states) == truth).mean():>9.4f} {changes(states):>8}")
+    return hmm
+
+
+def speed(hmm, n_days, lag):
+    from sequence_decoder import FixedLagDecoder, viterbi
+
+    rng = np.random.default_rng(0)
+    k = len(hmm.classes)
+    log_emit = np.log(rng.dirichlet(np.ones(k), size=(n_days, 86400)))
+
+    t0 = time.perf_counter()
+    batched = viterbi(log_emit, hmm.log_trans, hmm.log_start)
+    batched_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for day in range(min(n_days, 3)):
+        assert (viterbi(log_emit[day], hmm.log_trans, hmm.log_start) == batched[day]).all()
+    per_day_s = (time.perf_counter() - t0) / min(n_days, 3) * n_days
+
+    decoder = FixedLagDecoder(hmm, lag)
+    probs = np.exp(log_emit[0, :20000])
+    t0 = time.perf_counter()
+    for p in probs:
+        decoder.update(p, hmm.classes)
+    online_s = (time.perf_counter() - t0) / len(probs)
+
+    rows = n_days * 86400
+    print(f"\nviterbi, {n_days} days x 86400 rows: batched {batched_s:.2f} s ({rows / batched_s / 1e6:.1f} M rows/s), "
+          f"one call per day {per_day_s:.2f} s ({per_day_s / batched_s:.0f}x)")
+    print(f"fixed-lag update (lag {lag}): {online_s * 1e6:.1f} us/row")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('csv', nargs='?', default=str(SCRIPT_DIR / 'comprehensive_activity_log_with_Idle.csv'))
+    parser.add_argument('--lags', type=int, nargs='+', default=[0, 2, 5, 10])
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--backend', default='flat')
+    args = parser.parse_args()
+
+    hmm = accuracy_table(args.csv, args.backend, args.lags)
+    speed(hmm, args.days, 5)
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, str(SCRIPT_DIR))
+    main()
@@ -0,0 +1,89 @@
+"""
+Flip suppression of k-of-n vote smoothing, and the cost of notifying on the
+inference loop.
+
+    python benchmarks/bench_smoothing.py [log.csv] [--votes 1:1 2:3 3:5 4:7 6:10]
+
+Replays the held-out tail of the labelled log (the rows train_model.py
+tests on) through the model once, then smooths the per-row predictions
+with each K:N vote. For every setting prints the state changes (and how
+many raw flips were suppressed), accuracy against the labels, and the
+true label changes for reference. 1:1 is the unsmoothed stream.
+
+Then times what one state change costs the loop: a blocking
+subprocess.run (what live_inference did) against Notifier.post, with
+/bin/true standing in for notify-send.
+"""
+import argparse
+import subprocess
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+SCRIPT_DIR = Path(__file__).resolve().parent.parent
+
+
+def replay_predictions(csv_path, backend):
+    from activity_features import NUMERIC_COLS, WINDOWS
+    from feature_cache import load_features
+    from inference_backends import load_backend
+    from train_model import TEST_FRACTION
+
+    df = load_features(csv_path, NUMERIC_COLS, WINDOWS).iloc[max(WINDOWS):]
+    df = df.iloc[int(len(df) * (1 - TEST_FRACTION)):]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        model = load_backend(backend)
+    labels, _ = model.predict(df[list(model.feature_names_in_)].to_numpy())
+    return np.asarray(labels), df['label'].to_numpy()
+
+
+def notify_cost(events):
+    from state_smoothing import Notifier
+
+    t0 = time.perf_counter()
+    for _ in range(events):
+        subprocess.run(["true"])
+    blocking = (time.perf_counter() - t0) / events
+
+    notifier = Notifier(cmd=["true"], min_interval=0.0)
+    notifier.start()
+    t0 = time.perf_counter()
+    for i in range(events):
+        notifier.post("System State Change", f"Detected: {i}")
+    posted = (time.perf_counter() - t0) / events
+    time.sleep(0.5)
+    return blocking, posted, notifier
+
+
+def main():
+    from state_smoothing import smooth_labels
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('csv', nargs='?', default=str(SCRIPT_DIR / 'comprehensive_activity_log_with_Idle.csv'))
+    parser.add_argument('--votes', nargs='+', default=['1:1', '2:3', '3:5', '4:7', '6:10'], help="K:N pairs")
+    parser.add_argument('--backend', default='flat')
+    parser.add_argument('--events', type=int, default=200)
+    args = parser.parse_args()
+
+    raw, truth = replay_predictions(args.csv, args.backend)
+    true_changes = int((truth[1:] != truth[:-1]).sum())
+    print(f"{len(raw)} held-out rows, {true_changes} true label changes")
+    print(f"{'vote':>6} {'changes':>8} {'suppressed':>11} {'accuracy':>9}")
+    for vote in args.votes:
+        k, n = map(int, vote.split(':'))
+        states, smoother = smooth_labels(raw, k, n)
+        accuracy = (np.asarray(states) == truth).mean()
+        print(f"{vote:>6} {smoother.flips:>8} {smoother.suppressed:>11} {accuracy:>9.4f}")
+
+    blocking, posted, notifier = notify_cost(args.events)
+    print(f"\nper state change: subprocess.run {blocking * 1e6:.0f} us, Notifier.post {posted * 1e6:.1f} us "
+          f"({blocking / posted:.0f}x); {notifier.summary()}")
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, str(SCRIPT_DIR))
+    main()
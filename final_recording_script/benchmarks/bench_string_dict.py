@@ -0,0 +1,61 @@
+"""
+Log size and parse time, plain vs dictionary-encoded text columns.
+
+    python benchmarks/bench_string_dict.py [log.csv] [--tile 10] [--repeat 3]
+
+Encodes a copy of the log with string_dict.encode_log (tiled --tile times to
+get a longer log), then compares on-disk size and the best-of --repeat time
+to load the whole file: pd.read_csv on the plain log vs read_log on the
+encoded one (which includes joining the dictionary).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent.parent
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    import pandas as pd
+    from string_dict import dict_path, encode_log, read_log
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("csv", nargs="?", default=str(SCRIPT_DIR / "comprehensive_activity_log_with_Idle.csv"))
+    parser.add_argument("--tile", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_string_dict_") as tmp:
+        plain = os.path.join(tmp, "plain.csv")
+        encoded = os.path.join(tmp, "encoded.csv")
+        df = pd.read_csv(args.csv, dtype=str, keep_default_na=False)
+        pd.concat([df] * args.tile, ignore_index=True).to_csv(plain, index=False)
+        encode_log(plain, encoded)
+
+        plain_size = os.path.getsize(plain)
+        encoded_size = os.path.getsize(encoded) + os.path.getsize(dict_path(encoded))
+        plain_s = best_of(lambda: pd.read_csv(plain), args.repeat)
+        encoded_s = best_of(lambda: read_log(encoded), args.repeat)
+
+        print(f"{len(df) * args.tile} rows")
+        print(f"{'':<10} {'size (MB)':>10} {'load (s)':>9}")
+        print(f"{'plain':<10} {plain_size / 1e6:>10.2f} {plain_s:>9.3f}")
+        print(f"{'encoded':<10} {encoded_size / 1e6:>10.2f} {encoded_s:>9.3f}")
+        print(f"{'ratio':<10} {plain_size / encoded_size:>9.1f}x {plain_s / encoded_s:>8.1f}x")
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(SCRIPT_DIR))
+    main()
@@ -1,5 +1,9 @@
-import pandas as pd
+from relabel import relabel
 
-df = pd.read_csv("comprehensive_activity_log.csv")
+INPUT = "comprehensive_activity_log.csv"
+OUTPUT = "comprehensive_activity_log_with_Idle.csv"
 
-df.loc[df["idle_time_sec"] > 10.0, "label"] = "Idle"
+# idle_time_sec > 10.0 -> "Idle"; the rule set lives in relabel.py (RULESETS['idle'])
+counts = relabel(INPUT, OUTPUT, 'idle')
+
+print("Saved:", OUTPUT, counts)
@@ -0,0 +1,290 @@
+"""
+Central collector: receives row batches from remote loggers and writes them
+into the fleet store (fleet_store.py).
+
+    python collector.py serve [--listen 0.0.0.0:7070 | --listen /run/collector.sock]
+    python collector.py stats [--listen ...]        # per-client throughput counters
+
+Loggers push with push_client.RowPusher (set PUSH_SERVER in
+10_comprehensive_activity_log.py); the wire protocol is described there.
+
+One asyncio task per connection reads frames and puts decoded batches on a
+bounded queue; a single writer task drains whatever has queued up (group
+commit), normalises it, appends it to the store in a worker thread and only
+then acks each batch. When the store falls behind the queue fills, the
+connection tasks stop reading, and TCP flow control pushes back on the
+loggers, whose spools absorb the delay. A failed store write closes the
+connections of that flush unacked, so their batches come back from the
+spools; if the writer task itself dies, serve() stops.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from fleet_store import STORE_DIR, FleetStore, SchemaError, normalize_frame
+from push_client import MAX_FRAME, _LEN, _SEQ, connect, decode_batch, frame, recv_frame
+
+LISTEN = '0.0.0.0:7070'
+QUEUE_BATCHES = 256              # decoded batches waiting for the writer
+FLUSH_ROWS = 50_000              # max rows per store write
+STATS_INTERVAL = 60.0            # seconds between counter lines on stdout
+RATE_ALPHA = 0.2                 # EWMA weight of the newest rows/s sample
+
+
+class ClientStats:
+    def __init__(self, client, host, peer):
+        self.client = client
+        self.host = host
+        self.peer = peer
+        self.connected = time.time()
+        self.online = True
+        self.batches = self.rows = self.bytes = self.rejected = 0
+        self.last_batch = None
+        self.rows_per_s = 0.0
+        self._rate_t = time.monotonic()
+        self._rate_rows = 0
+
+    def record(self, n_rows, n_bytes):
+        self.batches += 1
+        self.rows += n_rows
+        self.bytes += n_bytes
+        self.last_batch = time.time()
+        now = time.monotonic()
+        self._rate_rows += n_rows
+        if now - self._rate_t >= 1.0:
+            sample = self._rate_rows / (now - self._rate_t)
+            self.rows_per_s = RATE_ALPHA * sample + (1 - RATE_ALPHA) * self.rows_per_s
+            self._rate_t, self._rate_rows = now, 0
+
+    def to_dict(self):
+        elapsed = max(time.time() - self.connected, 1e-9)
+        return {
+            'client': self.client, 'host': self.host, 'peer': self.peer, 'online': self.online,
+            'connected': datetime.fromtimestamp(self.connected).isoformat(timespec='seconds'),
+            'batches': self.batches, 'rows': self.rows, 'bytes': self.bytes, 'rejected': self.rejected,
+            'rows_per_s': round(self.rows_per_s, 1), 'avg_rows_per_s': round(self.rows / elapsed, 1),
+            'last_batch': None if self.last_batch is None
+            else datetime.fromtimestamp(self.last_batch).isoformat(timespec='seconds'),
+        }
+
+
+def batch_frame(n_rows, columns):
+    """DataFrame from decode_batch() columns."""
+    data = {}
+    for name, values in columns.items():
+        data[name] = np.frombuffer(values, dtype='<f8') if isinstance(values, bytes) else values
+    return pd.DataFrame(data, index=pd.RangeIndex(n_rows))
+
+
+class Collector:
+    def __init__(self, store_root=STORE_DIR, queue_batches=QUEUE_BATCHES):
+        self.store = FleetStore(store_root)
+        self.store.root.mkdir(parents=True, exist_ok=True)
+        self.queue = asyncio.Queue(maxsize=queue_batches)
+        # One part file per host/day for this collector run, appended on every flush
+        self.part_name = f"push-{socket.gethostname()}-{datetime.now():%Y%m%dT%H%M%S}"
+        # client name (host:pid) -> ClientStats, kept after disconnect
+        self.clients = {}
+        self.rows_stored = 0
+
+    # =========================
+    # CONNECTIONS
+    # =========================
+    async def handle(self, reader, writer):
+        peer = str(writer.get_extra_info('peername') or 'unix')
+        stats = None
+        lock = asyncio.Lock()
+        try:
+            while True:
+                (length,) = _LEN.unpack(await reader.readexactly(_LEN.size))
+                if not 0 < length <= MAX_FRAME:
+                    break
+                data = await reader.readexactly(length)
+                kind, payload = data[:1], data[1:]
+                if kind == b'H':
+                    hello = json.loads(payload)
+                    stats = ClientStats(hello.get('client', peer), hello['host'], peer)
+                    self.clients[stats.client] = stats
+                elif kind == b'S':
+                    await self._reply(writer, lock, frame(b'S', json.dumps(self.snapshot()).encode()))
+                elif kind == b'B' and stats is not None:
+                    try:
+                        seq, n_rows, columns = decode_batch(payload)
+                        df = batch_frame(n_rows, columns)
+                    except (ValueError, UnicodeDecodeError) as e:
+                        stats.rejected += 1
+                        seq = _SEQ.unpack_from(payload)[0] if len(payload) >= _SEQ.size else 0
+                        await self._reply(writer, lock, frame(b'E', _SEQ.pack(seq) + str(e).encode()))
+                        continue
+                    stats.record(n_rows, len(payload))
+                    # Blocks while the writer is behind: this connection stops reading
+                    await self.queue.put((stats, seq, df, writer, lock))
+                else:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError, KeyError):
+            pass
+        finally:
+            if stats is not None:
+                stats.online = False
+            writer.close()
+
+    async def _reply(self, writer, lock, data):
+        async with lock:
+            if writer.is_closing():
+                return
+            writer.write(data)
+            await writer.drain()
+
+    # =========================
+    # WRITER
+    # =========================
+    def _store(self, batches):
+        """Blocking part of a flush (runs in a thread): returns {id(batch): error or None}."""
+        results = {}
+        by_host = {}
+        for item in batches:
+            by_host.setdefault(item[0].host, []).append(item)
+        for host, items in by_host.items():
+            frames = []
+            for item in items:
+                try:
+                    frames.append(normalize_frame(item[2])[0])
+                    results[id(item)] = None
+                except SchemaError as e:
+                    results[id(item)] = str(e)
+            if frames:
+                self.rows_stored += self.store.add_frame(host, pd.concat(frames, ignore_index=True),
+                                                         self.part_name)
+        return results
+
+    async def writer(self):
+        while True:
+            batches = [await self.queue.get()]
+            rows = len(batches[0][2])
+            while rows < FLUSH_ROWS and not self.queue.empty():
+                batches.append(self.queue.get_nowait())
+                rows += len(batches[-1][2])
+            try:
+                results = await asyncio.to_thread(self._store, batches)
+            except Exception as e:
+                # Nothing in this flush is acked: drop its connections so the loggers
+                # re-send from their spools (rows that did land are deduplicated by hash)
+                writers = {id(item[3]): item[3] for item in batches}
+                print(f"Collector: store write of {rows} rows failed ({type(e).__name__}: {e}); "
+                      f"closing {len(writers)} connection(s) without acking")
+                for writer in writers.values():
+                    writer.close()
+                continue
+            for item in batches:
+                stats, seq, _, writer, lock = item
+                error = results[id(item)]
+                if error is None:
+                    reply = frame(b'A', _SEQ.pack(seq))
+                else:
+                    stats.rejected += 1
+                    reply = frame(b'E', _SEQ.pack(seq) + error.encode())
+                try:
+                    await self._reply(writer, lock, reply)
+                except ConnectionError:
+                    pass  # client gone; it re-sends the batch from its spool
+
+    def snapshot(self):
+        return {
+            'clients': [s.to_dict() for s in self.clients.values()],
+            'queued_batches': self.queue.qsize(),
+            'rows_stored': self.rows_stored,
+        }
+
+    async def report(self, interval=STATS_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            for s in self.clients.values():
+                if not s.online:
+                    continue
+                print(f"  {s.host:<16} {s.rows:>10} rows {s.rows_per_s:>8.1f} rows/s "
+                      f"({s.batches} batches, {s.bytes / 1e6:.1f} MB)")
+            print(f"Stored {self.rows_stored} new rows, {self.queue.qsize()} batches queued")
+
+
+async def serve(listen=LISTEN, store_root=STORE_DIR, started=None):
+    """Run the collector until cancelled; `started` (asyncio.Event) is set once listening."""
+    collector = Collector(store_root)
+    host, sep, port = listen.rpartition(':')
+    if sep and port.isdigit() and '/' not in listen:
+        server = await asyncio.start_server(collector.handle, host, int(port))
+    else:
+        if os.path.exists(listen):
+            os.unlink(listen)
+        server = await asyncio.start_unix_server(collector.handle, listen)
+    print(f"Collector listening on {listen}, writing to {collector.store.root}")
+    writer = asyncio.create_task(collector.writer())
+    tasks = [writer, asyncio.create_task(collector.report())]
+    # Without the writer nothing is stored or acked: stop serving rather than queue forever
+    serving = asyncio.current_task()
+    writer.add_done_callback(lambda task: task.cancelled() or serving.cancel())
+    if started is not None:
+        started.set()
+    try:
+        async with server:
+            await server.serve_forever()
+    except asyncio.CancelledError:
+        if writer.done() and not writer.cancelled():
+            raise RuntimeError("collector writer stopped") from writer.exception()
+        raise
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def fetch_stats(address):
+    sock = connect(address, timeout=5.0)
+    try:
+        sock.sendall(frame(b'S'))
+        _, payload = recv_frame(sock)
+    finally:
+        sock.close()
+    return json.loads(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collect pushed logger rows into the fleet store")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('serve')
+    p.add_argument('--listen', default=LISTEN, help="host:port or UNIX socket path")
+    p.add_argument('--store', default=str(STORE_DIR))
+    p = sub.add_parser('stats')
+    p.add_argument('--listen', default='127.0.0.1:7070', help="Collector address")
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        try:
+            asyncio.run(serve(args.listen, args.store))
+        except KeyboardInterrupt:
+            print("\nCollector stopped.")
+        except RuntimeError as e:
+            print(f"Error: {e}: {e.__cause__!r}")
+            sys.exit(1)
+    else:
+        try:
+            snapshot = fetch_stats(args.listen)
+        except OSError as e:
+            print(f"Error: cannot reach collector at {args.listen}: {e}")
+            sys.exit(1)
+        print(f"{'host':<16} {'client':<24} {'online':>6} {'rows':>10} {'rows/s':>8} {'avg/s':>8} "
+              f"{'MB':>8} {'rejected':>8}")
+        for c in snapshot['clients']:
+            print(f"{c['host']:<16} {c['client']:<24} {'yes' if c['online'] else 'no':>6} {c['rows']:>10} "
+                  f"{c['rows_per_s']:>8} {c['avg_rows_per_s']:>8} {c['bytes'] / 1e6:>8.2f} {c['rejected']:>8}")
+        print(f"{snapshot['rows_stored']} rows stored, {snapshot['queued_batches']} batches queued")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Export the trained activity RandomForest to ONNX.
+
+    python export_onnx.py [activity_model.joblib] [activity_model.onnx]
+
+The class list and feature order are stored as ONNX metadata, so the
+onnxruntime backend in inference_backends.py can run the model without
+scikit-learn installed.
+"""
+import sys
+
+import joblib
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
+
+from inference_backends import MODEL_PATHS
+
+
+def export_forest(model_path, onnx_path):
+    print(f"Loading model from {model_path}...")
+    model = joblib.load(model_path)
+    n_features = model.n_features_in_
+
+    print(f"Converting {type(model).__name__} ({n_features} features) to ONNX...")
+    onnx_model = convert_sklearn(
+        model,
+        initial_types=[('input', FloatTensorType([None, n_features]))],
+        # Plain probability tensor instead of a list of {class: prob} dicts
+        options={id(model): {'zipmap': False}},
+        target_opset=17,
+    )
+
+    for key, values in [('classes', model.classes_), ('feature_names', model.feature_names_in_)]:
+        prop = onnx_model.metadata_props.add()
+        prop.key = key
+        prop.value = '\n'.join(str(v) for v in values)
+
+    with open(onnx_path, 'wb') as f:
+        f.write(onnx_model.SerializeToString())
+    print(f"Saved {onnx_path}")
+
+
+if __name__ == "__main__":
+    src = sys.argv[1] if len(sys.argv) > 1 else MODEL_PATHS['sklearn']
+    dst = sys.argv[2] if len(sys.argv) > 2 else MODEL_PATHS['onnx']
+    export_forest(src, dst)
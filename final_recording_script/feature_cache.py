@@ -0,0 +1,217 @@
+"""
+On-disk cache of computed rolling-feature matrices.
+
+Entries are keyed by (content hash of the log segment, hash of the feature
+spec) and stored as plain .npy files, opened with mmap_mode='r':
+
+    .feature_cache/
+        index.json
+        <spec>-<source>/X.npy  labels.npy  meta.json
+
+* Same log + same spec           -> arrays are just mapped, nothing is parsed.
+* Log appended since last run    -> only the new bytes are parsed; the last
+                                    max(windows)-1 cached raw rows are used as
+                                    rolling context, and the result is stored
+                                    as a new entry.
+* Anything else (spec changed)   -> full computation.
+
+The total cache size is bounded; least recently used entries are evicted.
+A segment always ends at the last complete line, so a log that the logger
+is writing to right now is cached up to its last full row.
+"""
+import hashlib
+import io
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+
+from activity_features import rolling_features
+
+CACHE_DIR = Path(__file__).resolve().parent / '.feature_cache'
+MAX_BYTES = 2 * 1024 ** 3
+CACHE_VERSION = 1
+
+
+def spec_hash(cols, windows, label_col, dtype):
+    spec = {'version': CACHE_VERSION, 'cols': list(cols), 'windows': list(windows),
+            'label_col': label_col, 'dtype': np.dtype(dtype).str}
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+
+def _complete_length(path):
+    """Byte length of `path` up to and including its last newline."""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        pos = size
+        while pos > 0:
+            step = min(8192, pos)
+            f.seek(pos - step)
+            block = f.read(step)
+            idx = block.rfind(b'\n')
+            if idx != -1:
+                return pos - step + idx + 1
+            pos -= step
+    return 0
+
+
+class FeatureCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.dir / 'index.json'
+
+    # ---------- index ----------
+    def _read_index(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, index):
+        tmp = self.index_path.with_suffix(f'.tmp-{os.getpid()}')
+        with open(tmp, 'w') as f:
+            json.dump(index, f, indent=1)
+        os.replace(tmp, self.index_path)
+
+    def _evict(self, index, keep):
+        total = sum(e['nbytes'] for e in index.values())
+        for key, entry in sorted(index.items(), key=lambda kv: kv[1]['last_used']):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self.dir / key, ignore_errors=True)
+            total -= entry['nbytes']
+            del index[key]
+
+    # ---------- lookup ----------
+    def _hash_segment(self, path, length, boundaries):
+        """sha256 of the first `length` bytes, plus the hash at each boundary offset."""
+        digest = hashlib.sha256()
+        at = {}
+        pos = 0
+        targets = sorted(b for b in boundaries if 0 < b <= length)
+        with open(path, 'rb') as f:
+            for target in targets + [length]:
+                while pos < target:
+                    chunk = f.read(min(1 << 20, target - pos))
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    pos += len(chunk)
+                at[target] = digest.copy().hexdigest()
+        return at[length], at
+
+    def load(self, csv_path, cols, windows, label_col='label', dtype=np.float64):
+        """
+        Features (rows x feature_names) and labels for `csv_path`, in file order.
+
+        Returns (X, labels, columns); X and labels are read-only memory maps.
+        """
+        spec = spec_hash(cols, windows, label_col, dtype)
+        length = _complete_length(csv_path)
+        index = self._read_index()
+        same_spec = {k: e for k, e in index.items() if e['spec_hash'] == spec}
+
+        source, at = self._hash_segment(csv_path, length, [e['source_bytes'] for e in same_spec.values()])
+        key = f'{spec[:16]}-{source[:16]}'
+
+        if key not in index:
+            # Longest cached prefix of this file with the same spec
+            prefix = max(
+                (e for e in same_spec.values() if at.get(e['source_bytes']) == e['source_hash']),
+                key=lambda e: e['source_bytes'],
+                default=None,
+            )
+            if prefix is not None:
+                print(f"Feature cache: extending {prefix['n_rows']} cached rows "
+                      f"with {length - prefix['source_bytes']} new bytes of {csv_path}")
+                X, labels, columns = self._extend(csv_path, prefix, length, cols, windows, label_col, dtype)
+            else:
+                print(f"Feature cache: computing features for {csv_path}")
+                X, labels, columns = self._compute(csv_path, length, cols, windows, label_col, dtype)
+            self._store(key, X, labels, columns, spec, source, length)
+            index = self._read_index()
+            index[key] = {
+                'spec_hash': spec, 'source_hash': source, 'source_bytes': length,
+                'source_path': str(csv_path), 'n_rows': len(X),
+                'nbytes': X.nbytes + labels.nbytes, 'last_used': time.time(),
+            }
+        else:
+            index[key]['last_used'] = time.time()
+
+        self._evict(index, keep=key)
+        self._write_index(index)
+        return self._open(key)
+
+    # ---------- compute ----------
+    def _read_csv(self, data, cols, label_col):
+        import pandas as pd
+        return pd.read_csv(data, usecols=[*cols, label_col])
+
+    def _compute(self, csv_path, length, cols, windows, label_col, dtype):
+        with open(csv_path, 'rb') as f:
+            df = self._read_csv(io.BytesIO(f.read(length)), cols, label_col)
+        features = rolling_features(df, cols, windows)
+        return features.to_numpy(dtype=dtype), df[label_col].to_numpy(dtype=str), list(features.columns)
+
+    def _extend(self, csv_path, prefix, length, cols, windows, label_col, dtype):
+        import pandas as pd
+
+        old_X, old_labels, columns = self._open(self._key_of(prefix))
+        with open(csv_path, 'rb') as f:
+            header = f.readline()
+            f.seek(prefix['source_bytes'])
+            new = self._read_csv(io.BytesIO(header + f.read(length - prefix['source_bytes'])), cols, label_col)
+
+        # Raw columns come first in the feature layout: reuse them as context
+        n_context = min(max(windows, default=1) - 1, len(old_X))
+        context = pd.DataFrame(np.asarray(old_X[len(old_X) - n_context:, :len(cols)]), columns=cols)
+        raw = pd.concat([context, new[cols]], ignore_index=True)
+        features = rolling_features(raw, cols, windows).iloc[n_context:]
+
+        X = np.concatenate([old_X, features.to_numpy(dtype=dtype)])
+        labels = np.concatenate([old_labels, new[label_col].to_numpy(dtype=str)])
+        return X, labels, columns
+
+    # ---------- storage ----------
+    def _key_of(self, entry):
+        return f"{entry['spec_hash'][:16]}-{entry['source_hash'][:16]}"
+
+    def _store(self, key, X, labels, columns, spec, source, length):
+        tmp = self.dir / f'.tmp-{os.getpid()}-{key}'
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        np.save(tmp / 'X.npy', X)
+        np.save(tmp / 'labels.npy', labels)
+        with open(tmp / 'meta.json', 'w') as f:
+            json.dump({'columns': columns, 'spec_hash': spec, 'source_hash': source,
+                       'source_bytes': length}, f)
+        if (self.dir / key).exists():
+            shutil.rmtree(tmp)  # another process got there first
+        else:
+            os.replace(tmp, self.dir / key)
+
+    def _open(self, key):
+        entry = self.dir / key
+        with open(entry / 'meta.json') as f:
+            columns = json.load(f)['columns']
+        return (np.load(entry / 'X.npy', mmap_mode='r'),
+                np.load(entry / 'labels.npy', mmap_mode='r'),
+                columns)
+
+
+def load_features(csv_path, cols, windows, label_col='label', cache_dir=CACHE_DIR):
+    """Cached rolling features as a DataFrame (training column order) plus a `label_col` column."""
+    import pandas as pd
+
+    X, labels, columns = FeatureCache(cache_dir).load(csv_path, cols, windows, label_col)
+    df = pd.DataFrame(np.asarray(X), columns=columns)
+    df[label_col] = np.asarray(labels)
+    return df
@@ -0,0 +1,374 @@
+"""
+Fleet store: activity logs from many machines in one partitioned store.
+
+    python fleet_store.py ingest uploads/alice/*.csv uploads/bob/*.csv [--workers 4]
+    python fleet_store.py ingest --host alice some_log.csv
+    python fleet_store.py list
+    python fleet_store.py export all_hosts_30d.csv [--days 30] [--hosts alice bob]
+
+Layout (Hive-style partitions, plain CSV so every existing reader works):
+
+    fleet_store/
+        manifest.json                      sha256 of every ingested file
+        host=alice/date=2026-01-30/
+            part-<sha12>.csv               rows first seen in that upload
+            part-push-<...>.csv            rows received by collector.py
+            rows.npy                       sorted uint64 hashes of all rows
+
+Ingest validates each log (required columns, GPU header variants, the
+'gpu_data_pending' placeholder header, a torn last row), decodes dictionary-encoded text
+columns, and normalises to SCHEMA (missing GPU columns -> NaN, missing
+label -> 'none', unknown columns dropped). Files are hashed and parsed in
+parallel; an upload whose bytes were already ingested is skipped before it
+is parsed, and rows of an overlapping upload (e.g. the same log re-sent a
+day later) that are already in the partition are dropped by row hash.
+
+The host is --host, or else the name of the file's parent directory.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from feature_cache import _complete_length
+from string_dict import read_log
+
+STORE_DIR = Path(__file__).resolve().parent / 'fleet_store'
+
+BASE_COLS = [
+    'timestamp', 'cpu_percent', 'ram_percent', 'disk_read_Bps', 'disk_write_Bps',
+    'net_in_Bps', 'net_out_Bps', 'app_id', 'window_title',
+    'keyboard_active', 'mouse_active', 'keys_per_sec', 'idle_time_sec', 'max_gpu',
+]
+OPTIONAL_COLS = {'label': 'none'}
+# intel_gpu_top -c columns as the logger names them
+GPU_COLS = [
+    'gpu_Freq_MHz_req', 'gpu_Freq_MHz_act', 'gpu_IRQ_/s', 'gpu_RC6_pct',
+    'gpu_Power_W_gpu', 'gpu_Power_W_pkg',
+    'gpu_RCS_pct', 'gpu_RCS_se', 'gpu_RCS_wa', 'gpu_BCS_pct', 'gpu_BCS_se', 'gpu_BCS_wa',
+    'gpu_VCS_pct', 'gpu_VCS_se', 'gpu_VCS_wa', 'gpu_VECS_pct', 'gpu_VECS_se', 'gpu_VECS_wa',
+]
+SCHEMA = BASE_COLS + list(OPTIONAL_COLS) + GPU_COLS
+TEXT_COLS = ['app_id', 'window_title', 'label']
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# =========================
+# VALIDATE + NORMALISE (worker processes)
+# =========================
+def normalize_log(path):
+    """Read one log and return it in SCHEMA column order; raises SchemaError."""
+    with open(path, newline='') as f:
+        header = f.readline().strip().split(',')
+
+    missing = [c for c in BASE_COLS if c not in header]
+    if missing:
+        raise SchemaError(f"missing required columns {missing}")
+
+    torn = _complete_length(path) < os.path.getsize(path)
+    if 'gpu_data_pending' in header:
+        # Logger started before intel_gpu_top printed its header: the
+        # placeholder stands for the full GPU column set
+        names = header[:header.index('gpu_data_pending')] + GPU_COLS
+        counts = _field_counts(path)
+        if torn:
+            counts = counts[:-1]
+        wrong = np.flatnonzero(counts != len(names))
+        if len(wrong):
+            raise SchemaError(f"{len(wrong)} data rows do not have the {len(names)} fields the "
+                              f"'gpu_data_pending' header stands for (first: row {wrong[0] + 1} "
+                              f"has {counts[wrong[0]]})")
+        df = read_log(path, header=0, names=names, index_col=False)
+    else:
+        df = read_log(path)
+    if torn:
+        # Upload cut mid-row (log copied while the logger was writing)
+        df = df.iloc[:-1]
+
+    return normalize_frame(df)
+
+
+def _field_counts(path):
+    """Number of fields in each data row (quoted commas and newlines respected)."""
+    with open(path, newline='') as f:
+        f.readline()
+        return np.array([len(row) for row in csv.reader(f)], dtype=np.int64)
+
+
+def normalize_frame(df):
+    """(df in SCHEMA order, dropped unknown columns) for raw log rows; raises SchemaError."""
+    missing = [c for c in BASE_COLS if c not in df.columns]
+    if missing:
+        raise SchemaError(f"missing required columns {missing}")
+    unknown = [c for c in df.columns if c not in SCHEMA]
+    df = df.drop(columns=unknown)
+    for col, default in OPTIONAL_COLS.items():
+        if col not in df.columns:
+            df[col] = default
+    for col in GPU_COLS:
+        if col not in df.columns:
+            df[col] = np.nan
+
+    df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
+    bad = df['timestamp'].isna()
+    if bad.all():
+        raise SchemaError("no parseable timestamps")
+    df = df[~bad]
+    for col in SCHEMA:
+        if col in TEXT_COLS:
+            df[col] = df[col].astype(object)
+        elif col != 'timestamp':
+            # float64 throughout, so a row hashes the same whether it came
+            # from a CSV upload (ints) or from collector.py (all floats)
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(np.float64)
+    return df[SCHEMA], unknown
+
+
+def _ingest_worker(task):
+    path, host, sha = task
+    try:
+        df, unknown = normalize_log(path)
+    except (SchemaError, pd.errors.ParserError, UnicodeDecodeError) as e:
+        return path, host, sha, None, str(e)
+    return path, host, sha, df, unknown
+
+
+def row_hashes(df):
+    return pd.util.hash_pandas_object(df[SCHEMA], index=False).to_numpy(dtype=np.uint64)
+
+
+# =========================
+# STORE
+# =========================
+class FleetStore:
+    def __init__(self, root=STORE_DIR):
+        self.root = Path(root)
+        self.manifest_path = self.root / 'manifest.json'
+        self._hash_cache = {}
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self, manifest):
+        tmp = self.manifest_path.with_suffix(f'.tmp-{os.getpid()}')
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp, self.manifest_path)
+
+    def partition(self, host, day):
+        return self.root / f'host={host}' / f'date={day}'
+
+    def _known_hashes(self, hashes_path):
+        """Stored row hashes of a partition, cached while rows.npy is unchanged on disk."""
+        try:
+            mtime = hashes_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return np.empty(0, dtype=np.uint64)
+        cached = self._hash_cache.get(hashes_path)
+        if cached is None or cached[0] != mtime:
+            cached = self._hash_cache[hashes_path] = (mtime, np.load(hashes_path))
+        return cached[1]
+
+    def _write_partition(self, host, day, rows, part_name):
+        part = self.partition(host, day)
+        part.mkdir(parents=True, exist_ok=True)
+        hashes_path = part / 'rows.npy'
+        known = self._known_hashes(hashes_path)
+
+        hashes = row_hashes(rows)
+        # Drop rows already stored (overlapping upload) and repeats within this upload
+        _, first = np.unique(hashes, return_index=True)
+        fresh = np.zeros(len(rows), dtype=bool)
+        fresh[first] = True
+        fresh &= ~np.isin(hashes, known)
+        if not fresh.any():
+            return 0
+
+        out = part / f'part-{part_name}.csv'
+        if out.exists():
+            # Same writer again (collector flush): append, header already there
+            rows[fresh].to_csv(out, mode='a', header=False, index=False)
+        else:
+            rows[fresh].to_csv(out.with_suffix('.tmp'), index=False)
+            os.replace(out.with_suffix('.tmp'), out)
+        np.save(hashes_path.with_suffix('.tmp.npy'), np.sort(np.concatenate([known, hashes[fresh]])))
+        os.replace(hashes_path.with_suffix('.tmp.npy'), hashes_path)
+        return int(fresh.sum())
+
+    def add_frame(self, host, df, part_name):
+        """Store normalised rows of one host into its day partitions; returns rows added."""
+        added = 0
+        for day, rows in df.groupby(df['timestamp'].dt.date, sort=True):
+            added += self._write_partition(host, day.isoformat(), rows, part_name)
+        return added
+
+    def ingest(self, tasks, workers=None):
+        """
+        Ingest [(path, host)]. Files are hashed first and uploads already in
+        the manifest (or repeated in this batch) are skipped unparsed; the
+        rest are parsed in parallel, and writes are serialised here.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        manifest = self._read_manifest()
+        paths = [str(path) for path, _ in tasks]
+        workers = workers or min(len(paths), os.cpu_count() or 1)
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            shas = list(pool.map(file_sha256, paths)) if pool else [file_sha256(p) for p in paths]
+
+            summary = []
+            todo = []
+            seen = {}
+            for path, (_, host), sha in zip(paths, tasks, shas):
+                if sha in manifest or sha in seen:
+                    source = (f"{manifest[sha]['host']}/{Path(manifest[sha]['source']).name}" if sha in manifest
+                              else seen[sha])
+                    print(f"  skip {path}: already ingested as {source}")
+                    summary.append((path, host, 'duplicate', 0))
+                    continue
+                seen[sha] = f"{host}/{Path(path).name}"
+                todo.append((path, host, sha))
+
+            results = list(pool.map(_ingest_worker, todo)) if pool else [_ingest_worker(t) for t in todo]
+        finally:
+            if pool:
+                pool.shutdown()
+
+        for path, host, sha, df, info in results:
+            if df is None:
+                print(f"  REJECTED {path}: {info}")
+                summary.append((path, host, 'rejected', 0))
+                continue
+            if info:
+                print(f"  {path}: dropped unknown columns {info}")
+            added = self.add_frame(host, df, sha[:12])
+            manifest[sha] = {
+                'host': host, 'source': os.path.abspath(path), 'rows': len(df), 'rows_added': added,
+                'ingested': datetime.now().isoformat(timespec='seconds'),
+            }
+            self._write_manifest(manifest)
+            print(f"  {host}: {path} -> {added}/{len(df)} new rows")
+            summary.append((path, host, 'ok', added))
+        return summary
+
+    # =========================
+    # QUERIES
+    # =========================
+    def partitions(self, hosts=None, days=None, since=None):
+        """[(host, date, dir)] matching the filters; `days` counts back from today."""
+        if days is not None:
+            since = (datetime.now() - timedelta(days=days)).date().isoformat()
+        out = []
+        for host_dir in sorted(self.root.glob('host=*')):
+            host = host_dir.name[len('host='):]
+            if hosts and host not in hosts:
+                continue
+            for date_dir in sorted(host_dir.glob('date=*')):
+                day = date_dir.name[len('date='):]
+                if since and day < since:
+                    continue
+                out.append((host, day, date_dir))
+        return out
+
+    def load(self, hosts=None, days=None, since=None, columns=None):
+        """All matching rows with a 'host' column, sorted by host then time."""
+        frames = []
+        for host, _, part in self.partitions(hosts, days, since):
+            for f in sorted(part.glob('part-*.csv')):
+                frame = pd.read_csv(f, usecols=columns)
+                frame.insert(0, 'host', host)
+                frames.append(frame)
+        if not frames:
+            return pd.DataFrame(columns=['host', *(columns or SCHEMA)])
+        df = pd.concat(frames, ignore_index=True)
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        return df.sort_values(['host', 'timestamp'], kind='stable').reset_index(drop=True)
+
+
+def fleet_features(cols, windows, label_col='label', hosts=None, days=None, store=None):
+    """
+    Rolling features over the fleet store, computed per host so no window
+    spans two machines; the first max(windows) rows of each host are
+    dropped as in single-log training. Returns (features, labels), time-ordered.
+    """
+    from activity_features import rolling_features
+
+    df = (store or FleetStore()).load(hosts, days, columns=['timestamp', label_col, *cols])
+    parts = []
+    for _, host_df in df.groupby('host', sort=False):
+        features = rolling_features(host_df, cols, windows).iloc[max(windows):]
+        features['timestamp'] = host_df['timestamp'].iloc[max(windows):]
+        features[label_col] = host_df[label_col].iloc[max(windows):]
+        parts.append(features)
+    if not parts:
+        raise ValueError("fleet store has no rows for that selection")
+    merged = pd.concat(parts).sort_values('timestamp', kind='stable')
+    labels = merged.pop(label_col)
+    merged.pop('timestamp')
+    return merged.fillna(0), labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-host activity log store")
+    parser.add_argument('--store', default=str(STORE_DIR))
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('ingest', help="Validate, normalise and store log files")
+    p.add_argument('paths', nargs='+')
+    p.add_argument('--host', help="Host name (default: each file's parent directory name)")
+    p.add_argument('--workers', type=int, default=None)
+    sub.add_parser('list', help="Rows per host and day")
+    p = sub.add_parser('export', help="Write matching rows (with a host column) to one CSV")
+    p.add_argument('output')
+    p.add_argument('--days', type=int)
+    p.add_argument('--hosts', nargs='+')
+    args = parser.parse_args()
+
+    store = FleetStore(args.store)
+    if args.command == 'ingest':
+        tasks = []
+        for path in args.paths:
+            if not os.path.exists(path):
+                print(f"Error: {path} not found.")
+                sys.exit(1)
+            tasks.append((path, args.host or Path(path).resolve().parent.name))
+        t0 = time.perf_counter()
+        summary = store.ingest(tasks, args.workers)
+        added = sum(s[3] for s in summary)
+        print(f"Ingested {len(tasks)} files, {added} new rows in {time.perf_counter() - t0:.1f}s")
+        if any(s[2] == 'rejected' for s in summary):
+            sys.exit(1)
+    elif args.command == 'list':
+        for host, day, part in store.partitions():
+            print(f"{host:<16} {day}  {len(np.load(part / 'rows.npy')):>8} rows")
+    else:
+        df = store.load(args.hosts, args.days)
+        df.to_csv(args.output, index=False)
+        print(f"Wrote {len(df)} rows from {df['host'].nunique()} hosts to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
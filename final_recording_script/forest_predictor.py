@@ -0,0 +1,108 @@
+"""
+Flat-array RandomForest predictor.
+
+All trees of a fitted RandomForestClassifier are concatenated into five
+contiguous arrays (feature, threshold, left, right, value). Prediction walks
+every tree for every row at once: one fancy-indexing step per tree level,
+so a single row costs ~max_depth small NumPy ops instead of two passes of
+sklearn's per-call validation and per-tree dispatch.
+
+Output matches sklearn: inputs are cast to float32 and compared against the
+float64 thresholds (as sklearn's Cython tree does), leaf class weights are
+normalised per tree and then accumulated in estimator order.
+"""
+import numpy as np
+
+
+class FlatForest:
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth,
+                 classes, feature_names):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.classes_ = list(classes)
+        self.feature_names_in_ = list(feature_names)
+        self._classes = np.asarray(self.classes_)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a fitted RandomForestClassifier (or a single DecisionTreeClassifier)."""
+        estimators = getattr(model, 'estimators_', [model])
+        if not all(hasattr(est, 'tree_') for est in estimators):
+            raise ValueError(f"{type(model).__name__} is not a tree ensemble (use the sklearn backend)")
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        for est in estimators:
+            tree = est.tree_
+            n = tree.node_count
+            idx = np.arange(n, dtype=np.int64)
+
+            left = tree.children_left.astype(np.int64)
+            right = tree.children_right.astype(np.int64)
+            leaf = left == -1
+            # Leaves point at themselves so every row can take exactly
+            # max_depth steps without branching on "already at a leaf".
+            left[leaf] = idx[leaf]
+            right[leaf] = idx[leaf]
+            feature = tree.feature.astype(np.int64)
+            feature[leaf] = 0
+
+            # Same normalisation as DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+
+            features.append(feature)
+            thresholds.append(tree.threshold.astype(np.float64))
+            lefts.append(left + offset)
+            rights.append(right + offset)
+            values.append(value / normalizer)
+            roots.append(offset)
+            offset += n
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            value=np.ascontiguousarray(np.concatenate(values)),
+            roots=np.asarray(roots, dtype=np.int64),
+            max_depth=max(est.tree_.max_depth for est in estimators),
+            classes=model.classes_,
+            feature_names=getattr(model, 'feature_names_in_', range(model.n_features_in_)),
+        )
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    def apply(self, X):
+        """Leaf node index (into the flat arrays) for every (row, tree) pair."""
+        if not isinstance(X, np.ndarray):
+            X = X[self.feature_names_in_].to_numpy()
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis]
+        n_rows, n_features = X.shape
+
+        flat_X = X.ravel()
+        row_base = (np.arange(n_rows, dtype=np.int64) * n_features)[:, np.newaxis]
+        node = np.broadcast_to(self.roots, (n_rows, len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            go_left = flat_X[row_base + self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def predict_proba(self, X):
+        leaf_values = self.value[self.apply(X)]  # (rows, trees, classes)
+        # cumsum adds strictly in tree order, like sklearn's `out += proba` loop
+        return leaf_values.cumsum(axis=1)[:, -1] / self.n_estimators
+
+    def predict(self, X):
+        """Label and class probabilities in one pass: (labels, probs)."""
+        probs = self.predict_proba(X)
+        return self._classes[probs.argmax(axis=1)], probs
@@ -7,20 +7,34 @@ import seaborn as sns
 import matplotlib.dates as mdates
 import matplotlib.patches as mpatches
 import numpy as np
+import argparse
 import os
 
+from plot_utils import ONE_SECOND, draw_segments, fill_between_lod, find_segments, plot_lod
+from report_runner import run_report
+from label_sketches import LabelSketches
+from rollups import Rollups
+from string_dict import read_log
+
 # Set style
 sns.set_theme(style="whitegrid")
 plt.rcParams['figure.figsize'] = (15, 8)
 
 OUTPUT_DIR = "activity_reports"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
+LOG_PATH = 'comprehensive_activity_log_with_Idle.csv'
 
 def load_data(filepath):
-    df = pd.read_csv(filepath)
+    # app_id comes back as a Categorical if the log is dictionary-encoded
+    df = read_log(filepath)
     df['timestamp'] = pd.to_datetime(df['timestamp'])
     return df
 
+def top_apps(n):
+    """The n app_ids with the most rows, from the rollups (main() brings them up to date)."""
+    counts = Rollups.load(LOG_PATH).query('cpu_percent', by=['app_id'], quantiles=())
+    return counts.nlargest(n, 'count', keep='first')['app_id'].tolist()
+
 def plot_state_overlay(df):
     print("Generating 1_state_overlay.png...")
     fig, axes = plt.subplots(3, 1, figsize=(15, 12), sharex=True)
@@ -42,30 +56,16 @@ def plot_state_overlay(df):
     # fallback for unknown labels
     default_color = 'whitesmoke'
 
+    # Label segments, found once for all axes
+    segments = find_segments(df['label'].to_numpy(dtype=str), df['timestamp'].to_numpy())
+
     for i, (col, title, color) in enumerate(metrics):
         ax = axes[i]
-        ax.plot(df['timestamp'], df[col], label=title, color=color, linewidth=1)
+        plot_lod(ax, df['timestamp'], df[col], label=title, color=color, linewidth=1)
         ax.set_ylabel(title)
         
         # Add colored background for states
-        # Find segments
-        df['label_change'] = df['label'].shift() != df['label']
-        changes = df[df['label_change']].index.tolist()
-        if 0 not in changes:
-            changes.insert(0, 0)
-        changes.append(len(df))
-        
-        for j in range(len(changes) - 1):
-            start_idx = changes[j]
-            end_idx = changes[j+1] - 1
-            if end_idx >= len(df): end_idx = len(df) - 1
-            
-            segment_label = df.iloc[start_idx]['label']
-            start_time = df.iloc[start_idx]['timestamp']
-            end_time = df.iloc[end_idx]['timestamp']
-            
-            facecolor = label_colors.get(segment_label, default_color)
-            ax.axvspan(start_time, end_time, facecolor=facecolor, alpha=0.3, linewidth=0)
+        draw_segments(ax, *segments, label_colors, default_color, alpha=0.3, linewidth=0)
 
     # Legend for states
     patches = [mpatches.Patch(color=color, label=label, alpha=0.3) 
@@ -81,71 +81,25 @@ def plot_activity_swimlanes(df):
     print("Generating 2_activity_swimlanes.png...")
     fig, ax = plt.subplots(figsize=(15, 6))
     
-    # 1. Keyboard
-    # We treat 1 as active.
-    # To make it performant, we find intervals where it is 1
-    kb_active = df[df['keyboard_active'] == 1]
-    if not kb_active.empty:
-        # We plot as vertical broken bars or just a scatter/line
-        # A Gantt style is better: horizontal bars
-        # Finding contiguous segments
-        kb_segments = []
-        if len(kb_active) > 0:
-            kb_df = df.copy()
-            kb_df['group'] = (kb_df['keyboard_active'] != kb_df['keyboard_active'].shift()).cumsum()
-            kb_groups = kb_df[kb_df['keyboard_active'] == 1].groupby('group')
-            for _, group in kb_groups:
-                start = group['timestamp'].iloc[0]
-                end = group['timestamp'].iloc[-1]
-                # if start == end, add a small duration
-                if start == end:
-                    end = start + pd.Timedelta(seconds=1)
-                kb_segments.append((start, end - start))
-        
-        # Using broken_barh
-        # ax.broken_barh(kb_segments, (20, 9), facecolors='tab:purple') # y=20, height=9
-        # But broken_barh takes (x_start, width) in axis units. Time axis is tricky.
-        # easier: hlines
-        for start, duration in kb_segments:
-             ax.hlines(y=3, xmin=start, xmax=start+duration, linewidth=10, color='tab:purple')
-
-    # 2. Mouse
-    mouse_active = df[df['mouse_active'] == 1]
-    if not mouse_active.empty:
-        m_df = df.copy()
-        m_df['group'] = (m_df['mouse_active'] != m_df['mouse_active'].shift()).cumsum()
-        m_groups = m_df[m_df['mouse_active'] == 1].groupby('group')
-        for _, group in m_groups:
-            start = group['timestamp'].iloc[0]
-            end = group['timestamp'].iloc[-1]
-            if start == end: end = start + pd.Timedelta(seconds=1)
-            ax.hlines(y=2, xmin=start, xmax=end, linewidth=10, color='tab:cyan')
+    # 1. Keyboard / 2. Mouse
+    # We treat 1 as active: contiguous runs where the flag is 1, as Gantt-style bars
+    ts = df['timestamp'].to_numpy()
+    for y, col, color in [(3, 'keyboard_active', 'tab:purple'), (2, 'mouse_active', 'tab:cyan')]:
+        starts, ends, values = find_segments(df[col].to_numpy(), ts)
+        active = values == 1
+        draw_segments(ax, starts[active], ends[active], values[active], {1: color},
+                      y=y, height=0.12, min_duration=ONE_SECOND, linewidth=0)
 
     # 3. App ID / Window
     # This is categorical. We'll map top N apps to colors, others to gray.
     # Segment by app_id
-    df['app_change'] = df['app_id'].shift() != df['app_id']
-    app_changes = df[df['app_change']].index.tolist()
-    if 0 not in app_changes: app_changes.insert(0, 0)
-    app_changes.append(len(df))
-    
     # Get top 5 apps
-    top_apps = df['app_id'].value_counts().nlargest(5).index.tolist()
-    palette = sns.color_palette("husl", len(top_apps))
-    app_colors = {app: palette[i] for i, app in enumerate(top_apps)}
+    apps = top_apps(5)
+    palette = sns.color_palette("husl", len(apps))
+    app_colors = {app: palette[i] for i, app in enumerate(apps)}
     
-    for j in range(len(app_changes) - 1):
-        start_idx = app_changes[j]
-        end_idx = app_changes[j+1] - 1
-        if end_idx >= len(df): end_idx = len(df) - 1
-        
-        app_id = df.iloc[start_idx]['app_id']
-        start_time = df.iloc[start_idx]['timestamp']
-        end_time = df.iloc[end_idx]['timestamp']
-        if start_time == end_time: end_time = start_time + pd.Timedelta(seconds=1)
-        
-        color = app_colors.get(app_id, 'lightgray')
-        ax.hlines(y=1, xmin=start_time, xmax=end_time, linewidth=10, color=color)
+    draw_segments(ax, *find_segments(df['app_id'].to_numpy(dtype=str), ts), app_colors, 'lightgray',
+                  y=1, height=0.12, min_duration=ONE_SECOND, linewidth=0)
 
     ax.set_yticks([1, 2, 3])
     ax.set_yticklabels(['App Focus', 'Mouse', 'Keyboard'])
@@ -165,15 +119,18 @@ def plot_distribution_by_label(df):
     print("Generating 3_distribution_by_label.png...")
     metrics = ['cpu_percent', 'gpu_Power_W_pkg', 'net_in_Bps']
     
+    # Box plots from the per-label rollup sketches rather than a KDE over every row
+    sketches = LabelSketches.from_rollups(Rollups.load(LOG_PATH), metrics)
     fig, axes = plt.subplots(1, 3, figsize=(18, 6))
     
     for i, col in enumerate(metrics):
-        sns.violinplot(x='label', y=col, data=df, ax=axes[i], inner='quartile')
-        axes[i].set_title(f"Distribution of {col}")
+        boxes = sketches.box_stats(col)
+        axes[i].bxp(boxes, showmeans=True, showfliers=False)
+        axes[i].set_title(f"Distribution of {col} (box p25-p75, whiskers p1-p99)")
         axes[i].tick_params(axis='x', rotation=15)
         
         # Log scale for net_in_Bps if range is huge
-        if col == 'net_in_Bps' and df[col].max() > 10000:
+        if col == 'net_in_Bps' and max((b['whishi'] for b in boxes), default=0) > 10000:
             axes[i].set_yscale('log')
 
     plt.tight_layout()
@@ -185,15 +142,15 @@ def plot_throughput_mountain(df):
     fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(15, 10), sharex=True)
     
     # Network (Top)
-    ax1.fill_between(df['timestamp'], df['net_in_Bps'], color='tab:green', alpha=0.6, label='Net In')
-    ax1.fill_between(df['timestamp'], -df['net_out_Bps'], color='tab:blue', alpha=0.6, label='Net Out')
+    fill_between_lod(ax1, df['timestamp'], df['net_in_Bps'], color='tab:green', alpha=0.6, label='Net In')
+    fill_between_lod(ax1, df['timestamp'], -df['net_out_Bps'], color='tab:blue', alpha=0.6, label='Net Out')
     ax1.set_ylabel('Network Bytes/s (In/-Out)')
     ax1.legend(loc='upper right')
     ax1.axhline(0, color='black', linewidth=0.5)
     
     # Disk (Bottom, inverted)
-    ax2.fill_between(df['timestamp'], df['disk_read_Bps'], color='tab:orange', alpha=0.6, label='Disk Read')
-    ax2.fill_between(df['timestamp'], -df['disk_write_Bps'], color='tab:red', alpha=0.6, label='Disk Write')
+    fill_between_lod(ax2, df['timestamp'], df['disk_read_Bps'], color='tab:orange', alpha=0.6, label='Disk Read')
+    fill_between_lod(ax2, df['timestamp'], -df['disk_write_Bps'], color='tab:red', alpha=0.6, label='Disk Write')
     ax2.set_ylabel('Disk Bytes/s (Read/-Write)')
     ax2.legend(loc='upper right')
     ax2.axhline(0, color='black', linewidth=0.5)
@@ -208,28 +165,10 @@ def plot_throughput_mountain(df):
     }
     default_color = 'whitesmoke'
 
-    # Find segments
-    # Note: df['label_change'] might already exist if plot_state_overlay ran, but re-calculate to be safe/independent
-    df['label_change'] = df['label'].shift() != df['label']
-    changes = df[df['label_change']].index.tolist()
-    if 0 not in changes:
-        changes.insert(0, 0)
-    changes.append(len(df))
-    
-    for j in range(len(changes) - 1):
-        start_idx = changes[j]
-        end_idx = changes[j+1] - 1
-        if end_idx >= len(df): end_idx = len(df) - 1
-        
-        segment_label = df.iloc[start_idx]['label']
-        start_time = df.iloc[start_idx]['timestamp']
-        end_time = df.iloc[end_idx]['timestamp']
-        
-        facecolor = label_colors.get(segment_label, default_color)
-        
-        # Apply to both axes
-        for ax in [ax1, ax2]:
-            ax.axvspan(start_time, end_time, facecolor=facecolor, alpha=0.3, linewidth=0)
+    # Find segments once, draw them on both axes
+    segments = find_segments(df['label'].to_numpy(dtype=str), df['timestamp'].to_numpy())
+    for ax in [ax1, ax2]:
+        draw_segments(ax, *segments, label_colors, default_color, alpha=0.3, linewidth=0)
 
     # Legend for states (add to figure, similar to plot_state_overlay)
     patches = [mpatches.Patch(color=color, label=label, alpha=0.3) 
@@ -260,8 +199,7 @@ def plot_correlation_heatmap(df):
 def plot_small_multiples(df):
     print("Generating 6_small_multiples.png...")
     # Filter for top N apps to avoid too many plots
-    top_apps = df['app_id'].value_counts().nlargest(9).index.tolist()
-    subset = df[df['app_id'].isin(top_apps)].copy()
+    subset = df[df['app_id'].isin(top_apps(9))].copy()
     
     # Simplify app names
     subset['app_name'] = subset['app_id'].apply(lambda x: x.split('.')[-1])
@@ -279,8 +217,22 @@ def plot_small_multiples(df):
     plt.savefig(f"{OUTPUT_DIR}/6_small_multiples.png")
     plt.close()
 
+PLOTS = [
+    plot_state_overlay,
+    plot_activity_swimlanes,
+    plot_distribution_by_label,
+    plot_throughput_mountain,
+    plot_correlation_heatmap,
+    plot_small_multiples,
+]
+
 def main():
-    file_path = 'comprehensive_activity_log_with_Idle.csv'
+    parser = argparse.ArgumentParser(description="Generate the activity report PNGs")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Worker processes (default: one per plot, up to the number of cores)")
+    args = parser.parse_args()
+
+    file_path = LOG_PATH
     if not os.path.exists(file_path):
         print(f"Error: {file_path} not found.")
         return
@@ -289,12 +241,13 @@ def main():
     df = load_data(file_path)
     print(f"Loaded {len(df)} records.")
 
-    plot_state_overlay(df)
-    plot_activity_swimlanes(df)
-    plot_distribution_by_label(df)
-    plot_throughput_mountain(df)
-    plot_correlation_heatmap(df)
-    plot_small_multiples(df)
+    # Per-app / per-label summaries come from the rollups; catch them up once here
+    rollups = Rollups.load(file_path)
+    rollups.update()
+    rollups.save()
+
+    # Each plot renders in its own process over one shared copy of the data
+    run_report(df, PLOTS, args.workers)
     
     print(f"All visualizations saved to {OUTPUT_DIR}/")
 
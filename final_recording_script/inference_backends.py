@@ -0,0 +1,147 @@
+"""
+Interchangeable inference backends for the activity classifier.
+
+Every backend exposes the same small surface:
+
+    backend.classes_            -> list of class labels (model output order)
+    backend.feature_names_in_   -> list of feature names (model input order)
+    backend.predict(X)          -> (labels, probs) for a 2D feature matrix
+
+Heavy libraries are imported inside the backend that needs them, so picking
+the ONNX backend never pulls in pandas / scikit-learn / joblib.
+"""
+import os
+
+import numpy as np
+
+MODEL_PATHS = {
+    'sklearn': 'activity_model.joblib',
+    'flat': 'activity_model.store',
+    'onnx': 'activity_model.onnx',
+}
+# Used when the backend's usual file does not exist yet (no store written so far)
+FALLBACK_PATHS = {
+    'flat': 'activity_model.joblib',
+}
+DEFAULT_BACKEND = 'flat'
+
+
+class SklearnBackend:
+    """The original joblib-pickled RandomForestClassifier (or its copy in a model store)."""
+
+    name = 'sklearn'
+
+    def __init__(self, model_path):
+        if os.path.isdir(model_path):
+            from model_store import load_sklearn
+            self.model = load_sklearn(model_path)
+        else:
+            import joblib
+            self.model = joblib.load(model_path)
+        self.classes_ = list(self.model.classes_)
+        self.feature_names_in_ = list(self.model.feature_names_in_)
+
+    def predict(self, X):
+        # sklearn expects the named columns it was fitted with
+        if isinstance(X, np.ndarray):
+            import pandas as pd
+            X = pd.DataFrame(X, columns=self.feature_names_in_)
+        probs = self.model.predict_proba(X)
+        labels = np.asarray(self.classes_)[probs.argmax(axis=1)]
+        return labels, probs
+
+
+class FlatForestBackend:
+    """
+    The forest as flat NumPy arrays (see forest_predictor.py).
+
+    Given a model store directory the arrays are memory-mapped and neither
+    joblib nor sklearn is imported; a .joblib file is flattened on load.
+    """
+
+    name = 'flat'
+
+    def __init__(self, model_path):
+        if os.path.isdir(model_path):
+            from model_store import load_forest
+            self.forest = load_forest(model_path)
+        else:
+            import joblib
+            from forest_predictor import FlatForest
+            self.forest = FlatForest.from_sklearn(joblib.load(model_path))
+        self.classes_ = self.forest.classes_
+        self.feature_names_in_ = self.forest.feature_names_in_
+
+    def predict(self, X):
+        return self.forest.predict(X)
+
+
+class OnnxBackend:
+    """An exported ONNX graph run through onnxruntime (NumPy only on the Python side)."""
+
+    name = 'onnx'
+
+    def __init__(self, model_path):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        # The daemon should stay invisible: one thread is plenty for one row/s.
+        options.intra_op_num_threads = 1
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            model_path, sess_options=options, providers=['CPUExecutionProvider']
+        )
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self.classes_ = meta['classes'].split('\n')
+        self.feature_names_in_ = meta['feature_names'].split('\n')
+        self.input_name = self.session.get_inputs()[0].name
+        self.prob_output = self.session.get_outputs()[1].name
+
+    def predict(self, X):
+        if not isinstance(X, np.ndarray):
+            X = X[self.feature_names_in_].to_numpy()
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        probs = self.session.run([self.prob_output], {self.input_name: X})[0]
+        labels = np.asarray(self.classes_)[probs.argmax(axis=1)]
+        return labels, probs
+
+
+BACKENDS = {
+    'sklearn': SklearnBackend,
+    'flat': FlatForestBackend,
+    'onnx': OnnxBackend,
+}
+
+
+def resolve_model_path(name=DEFAULT_BACKEND, model_path=None):
+    """The file/store a backend would load, applying the default and fallback paths."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    if model_path is None:
+        model_path = MODEL_PATHS[name]
+        if not os.path.exists(model_path) and name in FALLBACK_PATHS:
+            model_path = FALLBACK_PATHS[name]
+    return model_path
+
+
+def has_forest_arrays(model_path):
+    """False for a model store whose current model is not a forest (e.g. train_model.py --engine hgb)."""
+    if not os.path.isdir(model_path):
+        return True
+    from model_store import read_metadata
+    return read_metadata(model_path).get('has_forest_arrays', True)
+
+
+def load_backend(name=DEFAULT_BACKEND, model_path=None):
+    """
+    Instantiate backend `name`, defaulting to its conventional model file.
+    A store holding a non-forest model is loaded with the sklearn backend
+    instead of the flat one, which can only run forests.
+    """
+    model_path = resolve_model_path(name, model_path)
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(model_path)
+    if name == 'flat' and not has_forest_arrays(model_path):
+        print(f"Note: the model in {model_path} is not a random forest; using the sklearn backend.")
+        name = 'sklearn'
+    return BACKENDS[name](model_path)
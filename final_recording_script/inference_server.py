@@ -0,0 +1,371 @@
+"""
+Central inference server: one copy of the model predicts for many hosts.
+
+    python inference_server.py serve [--listen 0.0.0.0:7071] [--backend flat]
+                                     [--max-batch 256] [--max-delay-ms 10]
+    python inference_server.py stats [--listen 127.0.0.1:7071]
+    python live_inference.py --server collector.lan:7071      # on each host
+
+Requests from all connections go into one queue. The batcher takes the
+first waiting request, keeps collecting until --max-batch rows or
+--max-delay-ms after that request arrived, and runs one vectorised
+predict() for the whole batch in a worker thread while the event loop keeps
+accepting the next one. Larger batches amortise per-call overhead; the
+delay bounds what a lone request pays for it. The stats frame reports
+histograms of batch size, per-request latency (arrival to reply) and
+per-batch predict time, plus the latest label per host, so the knee of the
+throughput/latency curve can be read off (see
+benchmarks/bench_inference_server.py).
+
+The model is hot-reloaded like in live_inference.py (ModelWatcher).
+
+Frames as in push_client.py (4-byte length, 1-byte type):
+
+    client -> server
+      H  hello     JSON {"host": ...} -> H JSON {"classes", "features", "generation"}
+      P  predict   <Q req_id> then len(FEATURE_NAMES) float64 (live_inference order)
+      S  stats     -> S JSON
+    server -> client
+      R  result    <Q req_id> <I generation> then len(classes) float64 probabilities
+      E  error     <Q req_id> message
+"""
+import argparse
+import asyncio
+import json
+import struct
+import sys
+import time
+from bisect import bisect_right
+from datetime import datetime
+
+import numpy as np
+
+from push_client import MAX_FRAME, _LEN, connect, frame, recv_frame
+
+LISTEN = '0.0.0.0:7071'
+MAX_BATCH = 256
+MAX_DELAY_MS = 10.0
+
+_REQ = struct.Struct('<Q')
+_RESULT = struct.Struct('<QI')
+
+BATCH_EDGES = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024]
+# 0.05 ms .. ~1.6 s in steps of 2**0.5
+LATENCY_EDGES_MS = [round(0.05 * 2 ** (i / 2), 3) for i in range(31)]
+
+
+class Histogram:
+    """Counts per bucket [edges[i], edges[i+1]); percentiles are bucket upper bounds."""
+
+    def __init__(self, edges):
+        self.edges = list(edges)
+        self.counts = [0] * (len(self.edges) + 1)
+        self.n = 0
+        self.total = 0.0
+
+    def add(self, value):
+        self.counts[bisect_right(self.edges, value)] += 1
+        self.n += 1
+        self.total += value
+
+    def percentile(self, q):
+        if self.n == 0:
+            return None
+        target = q * self.n
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return self.edges[i] if i < len(self.edges) else float('inf')
+        return float('inf')
+
+    def to_dict(self):
+        return {
+            'edges': self.edges, 'counts': self.counts, 'n': self.n,
+            'mean': self.total / self.n if self.n else None,
+            'p50': self.percentile(0.5), 'p90': self.percentile(0.9), 'p99': self.percentile(0.99),
+        }
+
+
+class InferenceServer:
+    def __init__(self, watcher, max_batch=MAX_BATCH, max_delay_ms=MAX_DELAY_MS):
+        from live_inference import FEATURE_NAMES
+
+        self.watcher = watcher
+        self.n_features = len(FEATURE_NAMES)
+        self.feature_names = FEATURE_NAMES
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.queue = asyncio.Queue()
+        self.batch_sizes = Histogram(BATCH_EDGES)
+        self.latency_ms = Histogram(LATENCY_EDGES_MS)
+        self.predict_ms = Histogram(LATENCY_EDGES_MS)
+        self.hosts = {}
+        self.started = time.time()
+        self.requests = 0
+        self._model = None
+        self.generation = 0
+
+    def model(self):
+        """(model, column_order), bumping the generation when the watcher swapped models."""
+        current = self.watcher.current
+        if current is not self._model:
+            self._model = current
+            self.generation += 1
+        return current
+
+    # =========================
+    # CONNECTIONS
+    # =========================
+    async def handle(self, reader, writer):
+        host = str(writer.get_extra_info('peername') or 'unix')
+        lock = asyncio.Lock()
+        try:
+            while True:
+                (length,) = _LEN.unpack(await reader.readexactly(_LEN.size))
+                if not 0 < length <= MAX_FRAME:
+                    break
+                data = await reader.readexactly(length)
+                arrived = time.perf_counter()
+                kind, payload = data[:1], data[1:]
+                if kind == b'P':
+                    (req_id,) = _REQ.unpack_from(payload)
+                    x = np.frombuffer(payload, dtype='<f8', offset=_REQ.size)
+                    if len(x) != self.n_features:
+                        await self._reply(writer, lock, frame(b'E', _REQ.pack(req_id) +
+                                          f"expected {self.n_features} features, got {len(x)}".encode()))
+                        continue
+                    self.queue.put_nowait((arrived, req_id, x, host, writer, lock))
+                elif kind == b'H':
+                    host = json.loads(payload).get('host', host)
+                    await self._reply(writer, lock, frame(b'H', json.dumps(self.hello()).encode()))
+                elif kind == b'S':
+                    await self._reply(writer, lock, frame(b'S', json.dumps(self.snapshot()).encode()))
+                else:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _reply(self, writer, lock, data):
+        async with lock:
+            if writer.is_closing():
+                return
+            writer.write(data)
+            await writer.drain()
+
+    def hello(self):
+        current = self.model()
+        classes = [] if current is None else [str(c) for c in current[0].classes_]
+        return {'classes': classes, 'features': self.feature_names, 'generation': self.generation}
+
+    # =========================
+    # BATCHER
+    # =========================
+    async def _collect(self):
+        """Next batch: the oldest request plus whatever arrives within max_delay of it."""
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_delay - (time.perf_counter() - batch[0][0])
+        while len(batch) < self.max_batch:
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            remaining = deadline - loop.time()
+            if len(batch) >= self.max_batch or remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def batcher(self):
+        while True:
+            batch = await self._collect()
+            current = self.model()
+            if current is None:
+                error = self.watcher.error or 'model still loading'
+                for _, req_id, _, _, writer, lock in batch:
+                    await self._reply(writer, lock, frame(b'E', _REQ.pack(req_id) + str(error).encode()))
+                continue
+            model, column_order = current
+            X = np.stack([item[2] for item in batch])[:, column_order]
+
+            t0 = time.perf_counter()
+            try:
+                labels, probs = await asyncio.to_thread(model.predict, X)
+            except Exception as e:
+                for _, req_id, _, _, writer, lock in batch:
+                    await self._reply(writer, lock, frame(b'E', _REQ.pack(req_id) + str(e).encode()))
+                continue
+            self.predict_ms.add((time.perf_counter() - t0) * 1000)
+            self.batch_sizes.add(len(batch))
+
+            probs = np.ascontiguousarray(probs, dtype='<f8')
+            for i, (arrived, req_id, _, host, writer, lock) in enumerate(batch):
+                try:
+                    await self._reply(writer, lock, frame(b'R', _RESULT.pack(req_id, self.generation) +
+                                                          probs[i].tobytes()))
+                except ConnectionError:
+                    continue
+                self.latency_ms.add((time.perf_counter() - arrived) * 1000)
+                stats = self.hosts.setdefault(host, {'requests': 0})
+                stats['requests'] += 1
+                stats['label'] = str(labels[i])
+                stats['confidence'] = float(probs[i].max())
+                stats['last_seen'] = datetime.now().isoformat(timespec='seconds')
+            self.requests += len(batch)
+
+    def snapshot(self):
+        elapsed = max(time.time() - self.started, 1e-9)
+        return {
+            'max_batch': self.max_batch, 'max_delay_ms': self.max_delay * 1000,
+            'requests': self.requests, 'requests_per_s': round(self.requests / elapsed, 1),
+            'queued': self.queue.qsize(), 'model_generation': self.generation,
+            'batch_size': self.batch_sizes.to_dict(),
+            'latency_ms': self.latency_ms.to_dict(),
+            'predict_ms': self.predict_ms.to_dict(),
+            'hosts': self.hosts,
+        }
+
+
+async def serve(listen=LISTEN, backend=None, model_path=None, max_batch=MAX_BATCH, max_delay_ms=MAX_DELAY_MS):
+    from inference_backends import DEFAULT_BACKEND
+    from live_inference import ModelWatcher
+
+    watcher = ModelWatcher(backend or DEFAULT_BACKEND, model_path)
+    watcher.start()
+    server_state = InferenceServer(watcher, max_batch, max_delay_ms)
+    host, sep, port = listen.rpartition(':')
+    if sep and port.isdigit() and '/' not in listen:
+        server = await asyncio.start_server(server_state.handle, host, int(port))
+    else:
+        server = await asyncio.start_unix_server(server_state.handle, listen)
+    print(f"Inference server on {listen} (batch <= {max_batch} rows or {max_delay_ms:g} ms)")
+    batcher = asyncio.create_task(server_state.batcher())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batcher.cancel()
+
+
+# =========================
+# CLIENT
+# =========================
+class RemoteModel:
+    """
+    Backend-compatible client (classes_, feature_names_in_, predict) for
+    live_inference.py --server: rows go to the server, one request each.
+    """
+
+    def __init__(self, address, host=None, timeout=5.0):
+        import socket
+        self.address = address
+        self.host = host or socket.gethostname()
+        self.timeout = timeout
+        self.sock = None
+        self.req_id = 0
+        self.generation = None
+
+    def _connect(self):
+        self.sock = connect(self.address, timeout=self.timeout)
+        self.sock.sendall(frame(b'H', json.dumps({'host': self.host}).encode()))
+        _, payload = recv_frame(self.sock)
+        hello = json.loads(payload)
+        self.classes_ = hello['classes']
+        self.feature_names_in_ = hello['features']
+        self.generation = hello['generation']
+
+    def predict(self, X):
+        """(labels, probs) for the rows of X (live_inference feature order)."""
+        X = np.ascontiguousarray(np.atleast_2d(X), dtype='<f8')
+        try:
+            if self.sock is None:
+                self._connect()
+            for row in X:
+                self.req_id += 1
+                self.sock.sendall(frame(b'P', _REQ.pack(self.req_id) + row.tobytes()))
+            probs = []
+            for _ in X:
+                kind, payload = recv_frame(self.sock)
+                if kind == b'E':
+                    raise RuntimeError(f"inference server: {payload[_REQ.size:].decode(errors='replace')}")
+                _, generation = _RESULT.unpack_from(payload)
+                probs.append(np.frombuffer(payload, dtype='<f8', offset=_RESULT.size))
+        except OSError:
+            self.close()
+            raise
+        if generation != self.generation:
+            # Server reloaded its model: fetch the new class list
+            self.close()
+            self._connect()
+        probs = np.vstack(probs)
+        return np.asarray(self.classes_)[probs.argmax(axis=1)], probs
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+def fetch_stats(address):
+    sock = connect(address, timeout=5.0)
+    try:
+        sock.sendall(frame(b'S'))
+        _, payload = recv_frame(sock)
+    finally:
+        sock.close()
+    return json.loads(payload)
+
+
+def print_histogram(title, hist, unit):
+    print(f"{title}: n={hist['n']} mean={hist['mean'] or 0:.3f}{unit} "
+          f"p50<={hist['p50']}{unit} p90<={hist['p90']}{unit} p99<={hist['p99']}{unit}")
+    edges = hist['edges']
+    peak = max(hist['counts']) or 1
+    for i, count in enumerate(hist['counts']):
+        if count == 0:
+            continue
+        lo = edges[i - 1] if i > 0 else 0
+        hi = edges[i] if i < len(edges) else float('inf')
+        print(f"  [{lo:>9.3g}, {hi:>9.3g}) {count:>8} {'#' * round(40 * count / peak)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-batching inference server for many hosts")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('serve')
+    p.add_argument('--listen', default=LISTEN, help="host:port or UNIX socket path")
+    p.add_argument('--backend', default=None, help="Inference backend (default: live_inference's)")
+    p.add_argument('--model', default=None)
+    p.add_argument('--max-batch', type=int, default=MAX_BATCH)
+    p.add_argument('--max-delay-ms', type=float, default=MAX_DELAY_MS)
+    p = sub.add_parser('stats')
+    p.add_argument('--listen', default='127.0.0.1:7071', help="Server address")
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        try:
+            asyncio.run(serve(args.listen, args.backend, args.model, args.max_batch, args.max_delay_ms))
+        except KeyboardInterrupt:
+            print("\nInference server stopped.")
+        return
+
+    try:
+        snapshot = fetch_stats(args.listen)
+    except OSError as e:
+        print(f"Error: cannot reach inference server at {args.listen}: {e}")
+        sys.exit(1)
+    print(f"{snapshot['requests']} requests ({snapshot['requests_per_s']}/s), {snapshot['queued']} queued, "
+          f"batch <= {snapshot['max_batch']} rows or {snapshot['max_delay_ms']:g} ms")
+    print_histogram("batch size", snapshot['batch_size'], '')
+    print_histogram("latency", snapshot['latency_ms'], ' ms')
+    print_histogram("predict per batch", snapshot['predict_ms'], ' ms')
+    for host, s in sorted(snapshot['hosts'].items()):
+        print(f"  {host:<20} {s['requests']:>8} requests  {s['label']:<20} ({s['confidence']:.2f}, {s['last_seen']})")
+
+
+if __name__ == "__main__":
+    main()
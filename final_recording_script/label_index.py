@@ -0,0 +1,159 @@
+"""
+Label intervals: one (start_ts, end_ts, label) record per labelled state
+instead of a label string repeated on every logged row.
+
+    label_segments.csv
+        start_ts,end_ts,label
+        2025-12-14T21:03:10.000,2025-12-14T21:47:52.000,interactive_light
+        ...
+
+SegmentWriter appends a record only when the state changes (and once more
+on shutdown for the open segment). LabelIndex keeps the segments as sorted
+int64 nanosecond arrays, so labelling N samples is one np.searchsorted
+call and "which segments overlap [t0, t1)" is O(log n).
+
+Segments are half-open, [start_ts, end_ts), and never overlap.
+Only the standard library is imported at module level: the logger imports
+SegmentWriter at login and must not pay for NumPy.
+"""
+import csv
+from datetime import datetime
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent
+SEGMENTS_PATH = PROJECT_DIR / "label_segments.csv"
+HEADER = ["start_ts", "end_ts", "label"]
+NO_LABEL = "none"
+
+
+def _iso(ts):
+    return ts.isoformat(timespec="milliseconds")
+
+
+class SegmentWriter:
+    """
+    Append-only writer used by the logger. Call update() with the current
+    label on every tick (cheap: a string compare) and close() on shutdown.
+    A segment that is still open when the process is killed is lost; the
+    per-row label column, while it is still written, covers that gap.
+    """
+
+    def __init__(self, path=SEGMENTS_PATH):
+        self.path = Path(path)
+        self.label = None
+        self.start = None
+
+    def update(self, label, ts=None):
+        ts = ts or datetime.now()
+        if label == self.label:
+            return
+        if self.label is not None:
+            self._append(self.start, ts, self.label)
+        self.label = label
+        self.start = ts
+
+    def close(self, ts=None):
+        if self.label is not None:
+            self._append(self.start, ts or datetime.now(), self.label)
+        self.label = None
+
+    def _append(self, start, end, label):
+        new = not self.path.exists()
+        with open(self.path, "a", newline="") as f:
+            writer = csv.writer(f)
+            if new:
+                writer.writerow(HEADER)
+            writer.writerow([_iso(start), _iso(end), label])
+
+
+def _to_ns(timestamps):
+    import numpy as np
+    return np.asarray(timestamps, dtype="datetime64[ns]").astype(np.int64)
+
+
+class LabelIndex:
+    """Sorted, non-overlapping label segments with vectorised lookups."""
+
+    def __init__(self, starts, ends, labels):
+        import numpy as np
+        starts = _to_ns(starts)
+        ends = _to_ns(ends)
+        order = np.argsort(starts, kind="stable")
+        self.starts = starts[order]
+        self.ends = ends[order]
+        # Labels as small integer codes into self.categories
+        self.categories, codes = np.unique(np.asarray(labels, dtype=str)[order], return_inverse=True)
+        self.codes = codes.astype(np.int32)
+
+    def __len__(self):
+        return len(self.starts)
+
+    @classmethod
+    def load(cls, path=SEGMENTS_PATH):
+        import pandas as pd
+        df = pd.read_csv(path)
+        return cls(pd.to_datetime(df["start_ts"], format="ISO8601"),
+                   pd.to_datetime(df["end_ts"], format="ISO8601"),
+                   df["label"].astype(str))
+
+    @classmethod
+    def from_rows(cls, timestamps, labels, period_s=1.0):
+        """
+        Run-length encode an existing per-row label column into segments.
+        Each row covers [timestamp, timestamp + period_s); a gap in the
+        timestamps (logger not running) ends the segment.
+        """
+        import numpy as np
+        ts = _to_ns(timestamps)
+        labels = np.asarray(labels, dtype=str)
+        if len(ts) == 0:
+            return cls(ts, ts, labels)
+        period = int(period_s * 1e9)
+        breaks = np.flatnonzero((labels[1:] != labels[:-1]) | (np.diff(ts) > period)) + 1
+        first = np.concatenate([[0], breaks])
+        last = np.concatenate([breaks, [len(ts)]]) - 1
+        return cls(ts[first], ts[last] + period, labels[first])
+
+    def save(self, path=SEGMENTS_PATH):
+        self.to_frame().assign(
+            start_ts=lambda d: d["start_ts"].dt.strftime("%Y-%m-%dT%H:%M:%S.%f").str[:-3],
+            end_ts=lambda d: d["end_ts"].dt.strftime("%Y-%m-%dT%H:%M:%S.%f").str[:-3],
+        ).to_csv(path, index=False)
+
+    def to_frame(self):
+        import pandas as pd
+        return pd.DataFrame({
+            "start_ts": self.starts.astype("datetime64[ns]"),
+            "end_ts": self.ends.astype("datetime64[ns]"),
+            "label": self.categories[self.codes],
+        })
+
+    def segment_positions(self, timestamps):
+        """Segment position for each timestamp, -1 where no segment covers it."""
+        import numpy as np
+        t = _to_ns(timestamps)
+        pos = np.searchsorted(self.starts, t, side="right") - 1
+        valid = pos >= 0
+        valid[valid] = t[valid] < self.ends[pos[valid]]
+        return np.where(valid, pos, -1)
+
+    def lookup(self, timestamps, default=NO_LABEL):
+        """Label for each timestamp (`default` outside every segment)."""
+        import numpy as np
+        pos = self.segment_positions(timestamps)
+        if len(self) == 0:
+            return np.full(len(pos), default, dtype=object)
+        labels = np.append(self.categories, default)
+        return labels[np.where(pos >= 0, self.codes[pos], len(self.categories))]
+
+    def attach(self, df, ts_col="timestamp", label_col="label"):
+        """Copy of `df` with `label_col` joined from the segments."""
+        return df.assign(**{label_col: self.lookup(df[ts_col].to_numpy(dtype="datetime64[ns]"))})
+
+    def between(self, t0, t1):
+        """Slice of the segments overlapping [t0, t1), found by binary search."""
+        import numpy as np
+        t0, t1 = _to_ns([t0, t1])
+        lo = np.searchsorted(self.ends, t0, side="right")
+        hi = np.searchsorted(self.starts, t1, side="left")
+        return slice(lo, max(lo, hi))
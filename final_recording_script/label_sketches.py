@@ -0,0 +1,232 @@
+"""
+Per-label metric distributions as mergeable sketches.
+
+    python label_sketches.py build LOG.csv [-o LOG.sketches.json] [--host NAME]
+    python label_sketches.py merge A.sketches.json B.sketches.json ... -o fleet.sketches.json
+    python label_sketches.py report fleet.sketches.json [--metrics cpu_percent ...] [--plot out.png]
+
+There is no separate pass over the log: the per-label view is the 1 h
+rollups (rollups.py) re-grouped by label, i.e. per (label, metric) a KLL
+quantile sketch plus count / sum / sum of squares. `build` writes that view
+to a small JSON file so segments from different days and machines can be
+merged and reported on (mean, std, median, any quantile, box plots) without
+ever loading raw rows again; scripts reading the local log use from_log().
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from quantile_sketch import KLLSketch
+from rollups import METRICS, Rollups
+
+FORMAT_VERSION = 1
+QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+
+def sketch_path(csv_path):
+    return Path(csv_path).with_suffix('.sketches.json')
+
+
+class LabelSketches:
+    def __init__(self, metrics=METRICS):
+        self.metrics = list(metrics)
+        # label -> metric -> [count, sum, sumsq, KLLSketch]
+        self.stats = {}
+        self.sources = []
+
+    def _entry(self, label, metric):
+        per_label = self.stats.setdefault(label, {})
+        if metric not in per_label:
+            per_label[metric] = [0, 0.0, 0.0, KLLSketch()]
+        return per_label[metric]
+
+    @classmethod
+    def from_rollups(cls, rollups, metrics=None):
+        """Per-label view of the 1 h rollups (the sketched table that covers the whole log)."""
+        out = cls(metrics or rollups.metrics)
+        cols = [rollups.metrics.index(m) for m in out.metrics]
+        for (_, _, label), (acc, sketches) in rollups.tables['1h'].items():
+            for metric, j in zip(out.metrics, cols):
+                entry = out._entry(label, metric)
+                entry[0] += int(acc[j, 0])
+                entry[1] += float(acc[j, 1])
+                entry[2] += float(acc[j, 2])
+                entry[3].merge(sketches[j])
+        return out
+
+    def merge(self, other):
+        for label, per_label in other.stats.items():
+            for metric, (count, total, sumsq, sketch) in per_label.items():
+                entry = self._entry(label, metric)
+                entry[0] += count
+                entry[1] += total
+                entry[2] += sumsq
+                entry[3].merge(sketch)
+        self.metrics += [m for m in other.metrics if m not in self.metrics]
+        self.sources += other.sources
+        return self
+
+    # =========================
+    # QUERIES
+    # =========================
+    def summary(self, metrics=None, quantiles=(0.5,)):
+        """DataFrame indexed by label with (metric, stat) columns, like groupby().agg()."""
+        metrics = metrics or self.metrics
+        rows = {}
+        for label in sorted(self.stats):
+            row = {}
+            for metric in metrics:
+                count, total, sumsq, sketch = self.stats[label].get(metric, [0, 0.0, 0.0, KLLSketch()])
+                mean = total / count if count else np.nan
+                var = (sumsq - count * mean ** 2) / (count - 1) if count > 1 else np.nan
+                row[(metric, 'mean')] = mean
+                for q, value in zip(quantiles, np.atleast_1d(sketch.quantile(list(quantiles)))):
+                    row[(metric, 'median' if q == 0.5 else f'p{round(q * 100):g}')] = value
+                row[(metric, 'std')] = np.sqrt(max(var, 0.0)) if count > 1 else np.nan
+                row[(metric, 'count')] = count
+            rows[label] = row
+        out = pd.DataFrame.from_dict(rows, orient='index')
+        out.columns = pd.MultiIndex.from_tuples(out.columns)
+        out.index.name = 'label'
+        return out
+
+    def box_stats(self, metric):
+        """Matplotlib bxp() input per label: box = p25..p75, whiskers = p1..p99."""
+        out = []
+        for label in sorted(self.stats):
+            entry = self.stats[label].get(metric)
+            if not entry or entry[0] == 0:
+                continue
+            p1, p25, p50, p75, p99 = entry[3].quantile([0.01, 0.25, 0.5, 0.75, 0.99])
+            out.append({'label': label, 'whislo': p1, 'q1': p25, 'med': p50, 'q3': p75,
+                        'whishi': p99, 'mean': entry[1] / entry[0], 'fliers': []})
+        return out
+
+    # =========================
+    # SERIALISATION
+    # =========================
+    def to_dict(self):
+        return {
+            'version': FORMAT_VERSION,
+            'metrics': self.metrics,
+            'sources': self.sources,
+            'labels': {
+                label: {metric: {'count': c, 'sum': s, 'sumsq': q, 'sketch': k.to_dict()}
+                        for metric, (c, s, q, k) in per_label.items()}
+                for label, per_label in self.stats.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        if d.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported sketch file version {d.get('version')}")
+        out = cls(d['metrics'])
+        out.sources = d['sources']
+        for label, per_label in d['labels'].items():
+            for metric, e in per_label.items():
+                out.stats.setdefault(label, {})[metric] = [e['count'], e['sum'], e['sumsq'],
+                                                           KLLSketch.from_dict(e['sketch'])]
+        return out
+
+    def save(self, path):
+        tmp = f'{path}.tmp-{os.getpid()}'
+        with open(tmp, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def from_log(csv_path, metrics=METRICS):
+    """Per-label sketches for `csv_path`, from its rollups (caught up with the log first)."""
+    return LabelSketches.from_rollups(_rollups(csv_path), metrics)
+
+
+def _rollups(csv_path):
+    rollups = Rollups.load(csv_path)
+    rollups.update()
+    rollups.save()
+    return rollups
+
+
+def build(csv_path, host=None, metrics=METRICS):
+    """Sketch one log segment and record where it came from."""
+    rollups = _rollups(csv_path)
+    sketches = LabelSketches.from_rollups(rollups, metrics)
+    buckets = [key[0] for key in rollups.tables['1min']]
+    sketches.sources.append({
+        'path': os.path.abspath(csv_path), 'host': host or os.uname().nodename,
+        'rows': int(sum(acc[:, 0].max() for acc, _ in rollups.tables['1min'].values())),
+        'first': pd.Timestamp(min(buckets)).isoformat() if buckets else None,
+        'last': pd.Timestamp(max(buckets)).isoformat() if buckets else None,
+        'built': datetime.now().isoformat(timespec='seconds'),
+    })
+    return sketches
+
+
+def plot_boxes(sketches, metrics, out_path):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(1, len(metrics), figsize=(6 * len(metrics), 6), squeeze=False)
+    for ax, metric in zip(axes[0], metrics):
+        ax.bxp(sketches.box_stats(metric), showmeans=True, showfliers=False)
+        ax.set_title(f"{metric} (box p25-p75, whiskers p1-p99)")
+        ax.tick_params(axis='x', rotation=15)
+    fig.tight_layout()
+    fig.savefig(out_path)
+    plt.close(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mergeable per-label metric distribution sketches")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('build', help="Sketch one log segment")
+    p.add_argument('csv')
+    p.add_argument('-o', '--output')
+    p.add_argument('--host')
+    p = sub.add_parser('merge', help="Merge sketch files (days, hosts) into one")
+    p.add_argument('inputs', nargs='+')
+    p.add_argument('-o', '--output', required=True)
+    p = sub.add_parser('report', help="Per-label summary from a sketch file")
+    p.add_argument('input')
+    p.add_argument('--metrics', nargs='+', default=['cpu_percent', 'gpu_Power_W_pkg', 'net_in_Bps'])
+    p.add_argument('--plot', help="Also write per-label box plots to this PNG")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        if not os.path.exists(args.csv):
+            print(f"Error: {args.csv} not found.")
+            sys.exit(1)
+        sketches = build(args.csv, host=args.host)
+        out = args.output or sketch_path(args.csv)
+        sketches.save(out)
+        print(f"Sketched {sketches.sources[-1]['rows']} rows, {len(sketches.stats)} labels -> {out}")
+    elif args.command == 'merge':
+        merged = LabelSketches([])
+        for path in args.inputs:
+            merged.merge(LabelSketches.load(path))
+        merged.save(args.output)
+        print(f"Merged {len(args.inputs)} files ({sum(s['rows'] for s in merged.sources)} rows) -> {args.output}")
+    else:
+        sketches = LabelSketches.load(args.input)
+        with pd.option_context('display.width', 200, 'display.max_columns', None):
+            print(sketches.summary(args.metrics, quantiles=QUANTILES))
+        if args.plot:
+            plot_boxes(sketches, args.metrics, args.plot)
+            print(f"Saved {args.plot}")
+
+
+if __name__ == "__main__":
+    main()
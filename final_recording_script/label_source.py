@@ -0,0 +1,214 @@
+"""
+Event-driven source for the current activity label.
+
+Instead of re-reading current_state.txt on every logger tick, one
+background thread blocks until something changes:
+
+* inotify on current_state.txt itself (IN_CLOSE_WRITE), so a write by
+  state_switching_script.sh is seen the moment the file is closed. The
+  watch follows the path: when the file is replaced or removed it is
+  re-armed, checking every POLL_INTERVAL seconds while the file is missing;
+* a UNIX stream socket (label.sock) that accepts one label per line, e.g.
+      printf 'media_watching\\n' | nc -NU label.sock
+  Socket labels are also written to current_state.txt, so the switching
+  script toggles from the real current state.
+
+Each change is reported with the time it was received (datetime, ms
+precision) through the on_change callback, so label boundaries are exact
+instead of rounded to the next 1 s tick. Where inotify is not available
+the thread falls back to an mtime check every POLL_INTERVAL seconds.
+"""
+import os
+import selectors
+import socket
+import struct
+import threading
+from datetime import datetime
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent
+LABEL_FILE = PROJECT_DIR / "current_state.txt"
+LABEL_SOCKET = PROJECT_DIR / "label.sock"
+NO_LABEL = "none"
+POLL_INTERVAL = 1.0
+
+# <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVE_SELF = 0x00000800
+IN_DELETE_SELF = 0x00000400
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class _Inotify:
+    """Watch on a single file that can be re-armed after the file is replaced."""
+
+    def __init__(self):
+        import ctypes
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.wd = None
+
+    def watch(self, path):
+        """Watch `path` (dropping any previous watch); False if it does not exist."""
+        if self.wd is not None:
+            self.libc.inotify_rm_watch(self.fd, self.wd)
+            self.wd = None
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), IN_CLOSE_WRITE | IN_MOVE_SELF | IN_DELETE_SELF)
+        if wd < 0:
+            return False
+        self.wd = wd
+        return True
+
+    def masks(self):
+        """Event masks of all pending events for the current watch."""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        masks = []
+        pos = 0
+        while pos < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, pos)
+            pos += _EVENT.size + length
+            if wd == self.wd:
+                masks.append(mask)
+        return masks
+
+
+class LabelSource:
+    """
+    Current label, kept up to date by a daemon thread.
+
+    `label` and `changed_at` can be read from any thread. `on_change(label, ts)`
+    runs on the watcher thread, once at start() and then only on real changes.
+    """
+
+    def __init__(self, label_file=LABEL_FILE, socket_path=LABEL_SOCKET, on_change=None):
+        self.label_file = Path(label_file)
+        self.socket_path = Path(socket_path) if socket_path else None
+        self.on_change = on_change
+        self.label = NO_LABEL
+        self.changed_at = None
+        self.lock = threading.Lock()
+        self._mtime = None
+
+    def start(self):
+        self._set(self._read_file(), datetime.now())
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    def _read_file(self):
+        try:
+            self._mtime = self.label_file.stat().st_mtime_ns
+            return self.label_file.read_text().strip() or NO_LABEL
+        except OSError:
+            self._mtime = None
+            return NO_LABEL
+
+    def _set(self, label, ts, write_file=False):
+        with self.lock:
+            if label == self.label and self.changed_at is not None:
+                return
+            self.label = label
+            self.changed_at = ts
+            if write_file:
+                try:
+                    self.label_file.write_text(label + "\n")
+                    self._mtime = self.label_file.stat().st_mtime_ns
+                except OSError as e:
+                    print(f"Could not write {self.label_file}: {e}")
+            if self.on_change:
+                self.on_change(label, ts)
+
+    # =========================
+    # WATCHER THREAD
+    # =========================
+    def _listen(self):
+        if self.socket_path.exists():
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(os.fspath(self.socket_path))
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Left behind by a logger that was killed
+                self.socket_path.unlink(missing_ok=True)
+            else:
+                raise OSError(f"{self.socket_path} is in use by another running logger")
+            finally:
+                probe.close()
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(os.fspath(self.socket_path))
+        server.listen()
+        server.setblocking(False)
+        return server
+
+    def _poll_file(self, now):
+        try:
+            mtime = self.label_file.stat().st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            self._set(self._read_file(), now)
+
+    def _run(self):
+        sel = selectors.DefaultSelector()
+        try:
+            inotify = _Inotify()
+            sel.register(inotify.fd, selectors.EVENT_READ, "inotify")
+            watching = inotify.watch(self.label_file)
+        except (OSError, AttributeError):
+            inotify = None
+            watching = False
+            print(f"inotify unavailable: checking {self.label_file.name} every {POLL_INTERVAL}s")
+        if self.socket_path:
+            try:
+                sel.register(self._listen(), selectors.EVENT_READ, "accept")
+            except OSError as e:
+                print(f"Label socket {self.socket_path} disabled: {e}")
+
+        buffers = {}
+        while True:
+            events = sel.select(timeout=None if watching else POLL_INTERVAL)
+            now = datetime.now()
+            if not watching:
+                # No inotify, or the file is missing: look again, and watch it once it exists
+                if inotify is not None and inotify.watch(self.label_file):
+                    watching = True
+                    self._set(self._read_file(), now)
+                else:
+                    self._poll_file(now)
+
+            for key, _ in events:
+                if key.data == "inotify":
+                    masks = inotify.masks()
+                    if any(m & (IN_MOVE_SELF | IN_DELETE_SELF | IN_IGNORED) for m in masks):
+                        # Replaced (rename over it) or removed: follow the path, not the old inode
+                        watching = inotify.watch(self.label_file)
+                        self._set(self._read_file(), now)
+                    elif masks:
+                        self._set(self._read_file(), now)
+                elif key.data == "accept":
+                    conn, _ = key.fileobj.accept()
+                    conn.setblocking(False)
+                    buffers[conn] = b""
+                    sel.register(conn, selectors.EVENT_READ, "client")
+                else:
+                    conn = key.fileobj
+                    try:
+                        chunk = conn.recv(4096)
+                    except OSError:
+                        chunk = b""
+                    buffers[conn] += chunk
+                    *lines, buffers[conn] = buffers[conn].split(b"\n")
+                    if not chunk:  # EOF: a final line without newline still counts
+                        lines.append(buffers.pop(conn))
+                        sel.unregister(conn)
+                        conn.close()
+                    for line in lines:
+                        label = line.decode(errors="replace").strip()
+                        if label:
+                            self._set(label, now, write_file=True)
@@ -1,202 +1,312 @@
 import time
-import pandas as pd
-import joblib
+import argparse
 import sys
 import os
-import subprocess
+import threading
 from collections import deque
+from datetime import datetime
+
+# Only numpy + the backend module at import time: pandas / sklearn / joblib
+# (if the chosen backend needs them at all) are imported by the loader thread.
+import numpy as np
+
+from inference_backends import BACKENDS, DEFAULT_BACKEND, load_backend, resolve_model_path
+from model_store import read_metadata
+from activity_features import NUMERIC_COLS, WINDOWS, feature_names, latest_feature_row
+from metrics_bus import Subscriber
+from state_smoothing import VOTE_K, VOTE_N, Notifier, VoteSmoother
+from sequence_decoder import FIXED_LAG, TRANSITIONS_PATH, FixedLagDecoder, SequenceModel
 
 # Configuration
-MODEL_PATH = 'activity_model.joblib'
 CSV_PATH = 'comprehensive_activity_log.csv' # Default, can be changed
-MAX_WINDOW = 30 # We need at least 30s of history for features
+MAX_WINDOW = max(WINDOWS) # We need at least 30s of history for features
 POLL_INTERVAL = 0.5 # Seconds to sleep between checks
+RELOAD_INTERVAL = 5.0 # Seconds between model update checks
 
 # Features used in training (MUST MATCH EXACTLY)
-NUMERIC_COLS = [
-    'cpu_percent', 'ram_percent', 
-    'disk_read_Bps', 'disk_write_Bps',
-    'net_in_Bps', 'net_out_Bps',
-    'idle_time_sec',
-    'gpu_RC6_pct', 'gpu_RCS_pct', 'gpu_VCS_pct',
-    'gpu_Power_W_pkg'
-]
-WINDOWS = [5, 30]
-
-def load_model():
-    if not os.path.exists(MODEL_PATH):
-        print(f"Error: Model file {MODEL_PATH} not found. Run train_model.py first.")
-        sys.exit(1)
-    return joblib.load(MODEL_PATH)
-
-def calculate_features(buffer_df):
+FEATURE_NAMES = feature_names(NUMERIC_COLS, WINDOWS)
+
+class ModelWatcher(threading.Thread):
     """
-    Takes a DataFrame of the last N seconds and calculates the single 
-    feature row for the *latest* timestamp.
+    Loads the model in the background, then keeps watching it for updates.
+
+    A new model (store `current` link swapped, or the model file replaced)
+    is loaded, validated against FEATURE_NAMES and warmed up on this thread;
+    only then is `self.current` replaced, in a single assignment, so the tail
+    loop picks it up between two rows without ever waiting on a load.
     """
-    # Create a single row dataframe for the result
-    current_row = buffer_df.iloc[[-1]].copy()
-    
-    # We need to compute features based on the history in buffer_df
-    # For the last row, the rolling window looks back at buffer_df
-    
-    features = {}
-    
+
+    def __init__(self, backend=DEFAULT_BACKEND, model_path=None, interval=RELOAD_INTERVAL):
+        super().__init__(daemon=True)
+        self.backend = backend
+        self.model_path = model_path
+        self.interval = interval
+        self.current = None  # (model, column_order) once loaded
+        self.error = None
+        self.reloads = 0
+
+    def _signature(self, path):
+        if os.path.isdir(path):
+            return read_metadata(path)['model_hash']
+        st = os.stat(path)
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _load(self, path):
+        model = load_backend(self.backend, path)
+        missing = [name for name in model.feature_names_in_ if name not in FEATURE_NAMES]
+        if missing:
+            raise ValueError(f"model expects unknown features: {missing}")
+        column_order = [FEATURE_NAMES.index(name) for name in model.feature_names_in_]
+        # Warm-up call so the first real row does not pay for lazy init / page faults
+        model.predict(np.zeros((1, len(column_order))))
+        return model, column_order
+
+    def run(self):
+        path = resolve_model_path(self.backend, self.model_path)
+        try:
+            loaded_sig = self._signature(path)
+            self.current = self._load(path)
+        except Exception as e:
+            self.error = e
+            return
+
+        pending_sig = loaded_sig
+        while True:
+            time.sleep(self.interval)
+            try:
+                sig = self._signature(path)
+            except (OSError, ValueError, KeyError):
+                continue  # mid-swap or mid-write; look again next time
+            if sig == loaded_sig:
+                continue
+            if sig != pending_sig:
+                # Changed since the last poll: wait one more interval for the writer to finish
+                pending_sig = sig
+                continue
+            try:
+                self.current = self._load(path)
+                loaded_sig = sig
+                self.reloads += 1
+                print(f"Model reloaded from {path} (reload #{self.reloads}).")
+            except Exception as e:
+                print(f"Ignoring new model at {path}: {e}")
+                loaded_sig = sig  # don't retry the same broken file every poll
+
+class RemoteWatcher:
+    """Stands in for ModelWatcher with --server: the model lives in inference_server.py."""
+
+    def __init__(self, address):
+        from inference_server import RemoteModel
+        # The server maps FEATURE_NAMES to its model's order itself
+        self.current = (RemoteModel(address), list(range(len(FEATURE_NAMES))))
+        self.error = None
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Real-time activity state inference")
+    parser.add_argument('csv', nargs='?', default=CSV_PATH, help="Log file to tail")
+    parser.add_argument('--backend', choices=list(BACKENDS), default=DEFAULT_BACKEND,
+                        help="Inference runtime (onnx needs only numpy + onnxruntime)")
+    parser.add_argument('--model', default=None, help="Model file (defaults to the backend's usual file)")
+    parser.add_argument('--source', choices=['auto', 'bus', 'csv'], default='auto',
+                        help="Read samples from the logger's shared memory bus or tail the CSV "
+                             "(auto: bus if the logger publishes one)")
+    parser.add_argument('--server', metavar='ADDRESS',
+                        help="Send feature rows to inference_server.py (host:port or socket) instead of loading a model")
+    parser.add_argument('--smoothing', choices=['auto', 'hmm', 'vote'], default='auto',
+                        help="hmm: fixed-lag HMM decoding with transitions from sequence_decoder.py fit; "
+                             "vote: K-of-N vote (auto: hmm if the transitions file exists)")
+    parser.add_argument('--lag', type=int, default=FIXED_LAG, help="Rows the HMM state trails the input by")
+    parser.add_argument('--transitions', default=TRANSITIONS_PATH, help="Transitions file for --smoothing hmm")
+    parser.add_argument('--vote', nargs=2, type=int, metavar=('K', 'N'), default=[VOTE_K, VOTE_N],
+                        help="Change state only when a label wins K of the last N predictions (1 1: no smoothing)")
+    parser.add_argument('--no-notify', action='store_true', help="Don't send desktop notifications")
+    args = parser.parse_args()
+    if not 1 <= args.vote[0] <= args.vote[1]:
+        parser.error("--vote needs 1 <= K <= N")
+    return args
+
+def make_smoother(args):
+    if args.smoothing != 'vote':
+        try:
+            decoder = FixedLagDecoder(SequenceModel.load(args.transitions), args.lag)
+            print(f"Smoothing: HMM decoding, state reported {args.lag} rows behind.")
+            return decoder
+        except FileNotFoundError:
+            if args.smoothing == 'hmm':
+                print(f"Error: {args.transitions} not found. Run 'sequence_decoder.py fit' first.")
+                sys.exit(1)
+    print(f"Smoothing: {args.vote[0]}-of-{args.vote[1]} vote.")
+    return VoteSmoother(*args.vote)
+
+def read_header(path):
+    with open(path, 'r') as f:
+        return {name: i for i, name in enumerate(f.readline().strip().split(','))}
+
+def read_tail_lines(path, n, block_size=8192):
+    """Last `n` data lines of `path` without reading the whole file."""
+    with open(path, 'rb') as f:
+        f.seek(0, 2)
+        end = pos = f.tell()
+        data = b''
+        while pos > 0 and data.count(b'\n') <= n:
+            pos = max(0, pos - block_size)
+            f.seek(pos)
+            data = f.read(end - pos)
+    lines = data.decode('utf-8', errors='replace').splitlines()
+    if pos == 0:
+        lines = lines[1:]  # drop the header
+    return lines[-n:]
+
+def parse_row(line, header_map):
+    """Extract NUMERIC_COLS from a raw CSV line; returns (timestamp, values) or None."""
+    parts = line.strip().split(',')
+    if len(parts) < len(NUMERIC_COLS):
+        # incomplete line or empty
+        return None
+    values = []
     for col in NUMERIC_COLS:
-        series = buffer_df[col]
-        for w in WINDOWS:
-            # We only care about the value for the *last* row
-            # rolling().mean() returns a series, we take the last value
-            if len(series) >= 1:
-                # We limit the rolling calculation to the tail to be efficient, 
-                # but pandas rolling is optimized anyway.
-                # However, strictly, rolling(w) needs w elements.
-                # min_periods=1 ensures we get a result even if buffer is small (startup)
-                
-                # Slice the series to the relevant window size + a bit for safety, though pandas handles it
-                # Actually, simplest is to just compute rolling on the whole buffer and take the last one
-                rolled_mean = series.rolling(window=w, min_periods=1).mean().iloc[-1]
-                rolled_std = series.rolling(window=w, min_periods=1).std().fillna(0).iloc[-1]
-                
-                features[f'{col}_mean_{w}s'] = rolled_mean
-                features[f'{col}_std_{w}s'] = rolled_std
-            else:
-                features[f'{col}_mean_{w}s'] = 0.0
-                features[f'{col}_std_{w}s'] = 0.0
-    
-    # Add raw columns to features (model expects them)
-    if len(buffer_df) > 0:
-        last_row = buffer_df.iloc[-1]
-        for col in NUMERIC_COLS:
-            features[col] = last_row[col]
-    else:
-        for col in NUMERIC_COLS:
-            features[col] = 0.0
-                
-    return pd.DataFrame([features])
+        idx = header_map.get(col)
+        try:
+            values.append(float(parts[idx]) if idx is not None and idx < len(parts) else 0.0)
+        except ValueError:
+            values.append(0.0)
+    return parts[0], values
 
-def main():
-    target_file = sys.argv[1] if len(sys.argv) > 1 else CSV_PATH
-    print(f"Loading model from {MODEL_PATH}...")
-    model = load_model()
-    
-    print(f"Monitoring {target_file} for real-time inference...")
-    
-    last_prediction = None
-    
-    # Initialize buffer
-    # We use a fixed-size buffer logic
-    # First, read existing file to populate buffer
-    try:
-        # Read only the columns we need to save memory/time, plus maybe timestamp if needed for debugging
-        # But pandas read_csv is fast enough for typical log files.
-        # simpler: read the last 60 lines
-        df_init = pd.read_csv(target_file)
-        # Keep only necessary columns
-        df_buffer = df_init[NUMERIC_COLS].tail(MAX_WINDOW * 2).copy() # Keep a bit more for safety
-        print(f"Initialized buffer with {len(df_buffer)} rows.")
-    except FileNotFoundError:
+def calculate_features(buffer):
+    """
+    Takes the last N rows of NUMERIC_COLS and calculates the single
+    feature row (FEATURE_NAMES order) for the *latest* timestamp.
+    """
+    return latest_feature_row(np.asarray(buffer), NUMERIC_COLS, WINDOWS)
+
+def csv_samples(target_file):
+    """(timestamp, history) for every row the logger appends to `target_file`."""
+    while not os.path.exists(target_file):
         print("File not found, waiting for it to be created...")
-        df_buffer = pd.DataFrame(columns=NUMERIC_COLS)
+        time.sleep(POLL_INTERVAL * 4)
+
+    # Initialize buffer from the tail of the existing file
+    # (a bit more than the largest window for safety)
+    header_map = read_header(target_file)
+    buffer = deque(maxlen=MAX_WINDOW * 2)
+    for line in read_tail_lines(target_file, MAX_WINDOW * 2):
+        row = parse_row(line, header_map)
+        if row is not None:
+            buffer.append(row[1])
+    print(f"Initialized buffer with {len(buffer)} rows.")
 
     # Open file for tailing
     with open(target_file, 'r') as f:
         # Move to end of file
         f.seek(0, 2)
-        
+
         while True:
             line = f.readline()
             if not line:
                 time.sleep(POLL_INTERVAL)
                 continue
-            
-            # Parse line
-            try:
-                # Assuming CSV structure is known and constant.
-                # We can't use pd.read_csv on a single line string easily without header
-                # So we parse manually or use io.StringIO
-                from io import StringIO
-                # We need the header to map columns correctly. 
-                # We assume the file *has* a header and we know the column order from df_init
-                # If the file is just being appended to, the new line doesn't have a header.
-                # We rely on the column order being consistent with NUMERIC_COLS?
-                # No, the CSV has many columns. We need to map them by index or name.
-                
-                # Robust way: Read the header once, store column names -> indices map
-                # But we already read the whole file into df_init.
-                # Let's just use the column names from df_init.columns
-                
-                # Parse the single line using pandas by creating a mini-csv string with header
-                # This is slightly inefficient but robust against column reordering if we had the header.
-                # Since we only have the data line, we MUST assume column order matches the file header.
-                
-                # Let's look at the header from the file again
-                # timestamp,cpu_percent,ram_percent,disk_read_Bps,...
-                
-                # Fast and dirty: split by comma
-                parts = line.strip().split(',')
-                if len(parts) < len(NUMERIC_COLS): 
-                    # incomplete line or empty
-                    continue
-                
-                # We need to map values to NUMERIC_COLS.
-                # We can learn the mapping from the header we read earlier.
-                if 'header_map' not in locals():
-                    # Read header line
-                    with open(target_file, 'r') as f_head:
-                        header_line = f_head.readline().strip()
-                        headers = header_line.split(',')
-                        header_map = {name: i for i, name in enumerate(headers)}
-                
-                # Extract only the numeric columns we need
-                row_data = {}
-                for col in NUMERIC_COLS:
-                    idx = header_map.get(col)
-                    if idx is not None and idx < len(parts):
-                        try:
-                            row_data[col] = float(parts[idx])
-                        except ValueError:
-                            row_data[col] = 0.0
-                    else:
-                        row_data[col] = 0.0 # Default if missing
-                
-                # Append to buffer
-                new_row_df = pd.DataFrame([row_data])
-                df_buffer = pd.concat([df_buffer, new_row_df], ignore_index=True)
-                
-                # Trim buffer
-                if len(df_buffer) > MAX_WINDOW * 2:
-                    df_buffer = df_buffer.iloc[-(MAX_WINDOW * 2):]
-                
-                # Calculate Features
-                # We only need to predict for the LATEST row
-                X_input = calculate_features(df_buffer)
-                
-                # Predict
-                # Ensure column order matches training
-                # The dataframe created by calculate_features usually sorts columns or uses dict order.
-                # The model expects specific column order.
-                # We should reorder X_input to match model.feature_names_in_ if available
-                if hasattr(model, 'feature_names_in_'):
-                    X_input = X_input[model.feature_names_in_]
-                
-                prediction = model.predict(X_input)[0]
-                probs = model.predict_proba(X_input)[0]
-                max_prob = max(probs)
-                
-                # Print result
-                timestamp = parts[0] # Assuming timestamp is first col
-                print(f"[{timestamp}] State: {prediction:<20} (Conf: {max_prob:.2f})")
-
-                # Notify on change
-                if prediction != last_prediction:
-                    subprocess.run(["notify-send", "-t", "2000", "System State Change", f"Detected: {prediction}\nConfidence: {max_prob:.2f}"])
-                    last_prediction = prediction
-                
-            except Exception as e:
-                # Don't crash on a bad line
-                print(f"Error processing line: {e}")
+            row = parse_row(line, header_map)
+            if row is None:
+                continue
+            buffer.append(row[1])
+            yield row[0], buffer
+
+def bus_samples(sub):
+    """(timestamp, history) for every sample the logger publishes on the metrics bus."""
+    last = sub.count
+    print(f"Reading the metrics bus ({min(last, sub.n_slots)} samples available).")
+    while True:
+        last = sub.wait(last)
+        timestamps, history = sub.latest(MAX_WINDOW * 2, NUMERIC_COLS)
+        if len(history) == 0:
+            continue
+        # Missing fields (GPU not up yet) read 0.0, as in parse_row
+        yield datetime.fromtimestamp(timestamps[-1]).isoformat(timespec='seconds'), np.nan_to_num(history)
+
+def open_source(source, target_file):
+    if source != 'csv':
+        try:
+            sub = Subscriber()
+            print(f"Monitoring metrics bus '{sub.name}' for real-time inference...")
+            return bus_samples(sub)
+        except FileNotFoundError:
+            if source == 'bus':
+                print("Error: no metrics bus (is the logger running with PUBLISH_BUS?).")
+                sys.exit(1)
+    print(f"Monitoring {target_file} for real-time inference...")
+    return csv_samples(target_file)
+
+def main():
+    args = parse_args()
+
+    if args.server:
+        print(f"Predicting through the inference server at {args.server}.")
+        watcher = RemoteWatcher(args.server)
+    else:
+        print(f"Loading {args.backend} model in the background...")
+        watcher = ModelWatcher(args.backend, args.model)
+        watcher.start()
+
+    smoother = make_smoother(args)
+    notifier = Notifier()
+    if not args.no_notify:
+        notifier.start()
+
+    try:
+        follow(args, watcher, smoother, notifier)
+    except KeyboardInterrupt:
+        print("\nStopped.")
+    print(f"Smoothing: {smoother.summary()}")
+    print(f"Notifications: {notifier.summary()}")
+
+def follow(args, watcher, smoother, notifier):
+    current = None
+    for timestamp, buffer in open_source(args.source, args.csv):
+        try:
+            # Swap in a newly (re)loaded model between rows; buffer is untouched
+            if watcher.current is not current:
+                if current is None:
+                    print(f"Model ready ({'server' if args.server else args.backend}).")
+                current = watcher.current
+            if current is None:
+                if isinstance(watcher.error, FileNotFoundError):
+                    print(f"Error: Model file {watcher.error} not found. Run train_model.py (and export_onnx.py for onnx) first.")
+                    sys.exit(1)
+                if watcher.error is not None:
+                    print(f"Error: could not load model: {watcher.error}")
+                    sys.exit(1)
+                print(f"[{timestamp}] Warming up (model still loading, {len(buffer)} rows buffered)")
                 continue
+            # column_order maps FEATURE_NAMES to the model's training order
+            model, column_order = current
+
+            # Calculate Features for the LATEST row only
+            X_input = calculate_features(buffer)[column_order][np.newaxis]
+
+            labels, probs = model.predict(X_input)
+            prediction = labels[0]
+            max_prob = max(probs[0])
+            if isinstance(smoother, FixedLagDecoder):
+                state, changed = smoother.update(probs[0], model.classes_)
+                # The HMM state is that of the row `delay` rows back: report that row
+                raw_label, conf = smoother.raw, smoother.confidence
+                lag = f"  [lag {smoother.delay}]" if smoother.delay else ""
+            else:
+                state, changed = smoother.update(prediction)
+                raw_label, conf, lag = prediction, max_prob, ""
+
+            # Print result
+            raw = f"  raw: {raw_label}" if raw_label != state else ""
+            print(f"[{timestamp}] State: {state:<20} (Conf: {conf:.2f}){raw}{lag}")
+
+            # Notify on change (queued; the dispatcher thread runs notify-send)
+            if changed and notifier.is_alive():
+                notifier.post("System State Change", f"Detected: {state}\nConfidence: {conf:.2f}")
+
+        except Exception as e:
+            # Don't crash on a bad line
+            print(f"Error processing line: {e}")
+            continue
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,289 @@
+"""
+Live metrics bus: the logger publishes every sample once into a shared
+memory ring, and any number of local processes read the latest samples
+from it without tailing or parsing the CSV.
+
+    python metrics_bus.py latest cpu_percent gpu_RC6_pct    # newest sample as JSON
+    python metrics_bus.py watch [fields ...]                 # print samples as they arrive
+
+Segment layout (/dev/shm/<BUS_NAME>, all little-endian):
+
+    header   magic, version, closed flag, n_slots, n_fields, count (u64)
+    fields   JSON list of field names, FIELDS_BYTES long
+    slots    n_slots x [seq u64, timestamp f64, n_fields x f64]
+
+Sample k goes to slot k % n_slots under a per-slot seqlock: the publisher
+stores seq = 2k+1, the values, then seq = 2k+2, and finally count = k+1.
+A reader copies a slot and keeps it only if seq was 2k+2 both before and
+after the copy, i.e. the slot was neither being written nor overwritten
+by a newer sample meanwhile. The publisher never waits for anyone, so
+readers cost it nothing; a reader that loses a race just retries.
+
+If the field set changes (GPU headers arriving after the first sample) the
+publisher marks the old segment closed and creates a new one; Subscriber
+re-attaches by itself. When the logger stops, the segment is gone until
+it starts again: a subscriber keeps waiting on the closed one meanwhile.
+
+Only the standard library is imported at module level (the logger imports
+this at login); Subscriber needs NumPy.
+"""
+import json
+import os
+import struct
+import sys
+import time
+
+BUS_NAME = "activity_metrics"
+N_SLOTS = 512                    # samples kept (8.5 minutes at 1 Hz)
+MAGIC = b"AMB1"
+FIELDS_BYTES = 4096
+SHM_DIR = "/dev/shm"
+
+# magic, version, closed, n_slots, n_fields, count
+_HEADER = struct.Struct("<4sIIIIxxxxQ")
+_COUNT_OFFSET = _HEADER.size - 8
+_U64 = struct.Struct("<Q")
+_SLOT_HEAD = struct.Struct("<Qd")
+DATA_OFFSET = _HEADER.size + FIELDS_BYTES
+
+
+def _slot_size(n_fields):
+    return _SLOT_HEAD.size + 8 * n_fields
+
+
+def _map(name, write=False):
+    """
+    (fd, mmap) of an existing segment. Mapped directly rather than through
+    SharedMemory, whose resource tracker (Python < 3.13) would unlink the
+    publisher's segment when a subscriber exits.
+    """
+    import mmap
+    fd = os.open(f"{SHM_DIR}/{name}", os.O_RDWR if write else os.O_RDONLY)
+    try:
+        buf = mmap.mmap(fd, 0, prot=mmap.PROT_READ | (mmap.PROT_WRITE if write else 0))
+    except (OSError, ValueError):  # ValueError: created but not sized yet
+        os.close(fd)
+        raise
+    return fd, buf
+
+
+# =========================
+# PUBLISHER (logger side)
+# =========================
+class Publisher:
+    """
+    Owner of the ring. publish() is a few struct.pack_into calls; the
+    segment is created on the first sample, once the field names are known.
+    """
+
+    def __init__(self, name=BUS_NAME, n_slots=N_SLOTS):
+        self.name = name
+        self.n_slots = n_slots
+        self.shm = None
+        self.fields = None
+        self.count = 0
+
+    def _create(self, fields):
+        from multiprocessing import shared_memory
+
+        names = json.dumps(list(fields)).encode()
+        if len(names) > FIELDS_BYTES:
+            raise ValueError(f"field names need {len(names)} bytes, only {FIELDS_BYTES} reserved")
+        self._close_segment()
+        size = DATA_OFFSET + self.n_slots * _slot_size(len(fields))
+        try:
+            shm = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a logger that was killed: close it for its readers, replace it
+            fd, stale = _map(self.name, write=True)
+            struct.pack_into("<I", stale, 8, 1)
+            stale.close()
+            os.close(fd)
+            os.unlink(f"{SHM_DIR}/{self.name}")
+            shm = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+        shm.buf[_HEADER.size:_HEADER.size + len(names)] = names
+        _HEADER.pack_into(shm.buf, 0, MAGIC, 1, 0, self.n_slots, len(fields), 0)
+        self.shm = shm
+        self.fields = list(fields)
+        self.slot = struct.Struct(f"<{len(fields)}d")
+        self.count = 0
+
+    def publish(self, timestamp, fields, values):
+        """Publish one sample: `timestamp` in epoch seconds, `values` in `fields` order."""
+        if fields != self.fields:
+            self._create(fields)
+        k = self.count
+        buf = self.shm.buf
+        offset = DATA_OFFSET + (k % self.n_slots) * _slot_size(len(self.fields))
+        _U64.pack_into(buf, offset, 2 * k + 1)
+        struct.pack_into("<d", buf, offset + 8, timestamp)
+        self.slot.pack_into(buf, offset + _SLOT_HEAD.size, *values)
+        _U64.pack_into(buf, offset, 2 * k + 2)
+        self.count = k + 1
+        _U64.pack_into(buf, _COUNT_OFFSET, self.count)
+
+    def _close_segment(self):
+        if self.shm is None:
+            return
+        struct.pack_into("<I", self.shm.buf, 8, 1)
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
+
+    def close(self):
+        self._close_segment()
+
+
+# =========================
+# SUBSCRIBER
+# =========================
+class Subscriber:
+    """
+    Read side of the ring, any number per publisher.
+
+        sub = Subscriber()                      # FileNotFoundError if no logger is running
+        count = sub.wait(last_count)            # block until a newer sample exists
+        ts, rows = sub.latest(60, ['cpu_percent', 'gpu_RC6_pct'])
+    """
+
+    def __init__(self, name=BUS_NAME):
+        self.name = name
+        self.buf = None
+        self._attach()
+
+    def _attach(self):
+        import numpy as np
+
+        fd, buf = _map(self.name)
+        magic, _, _, n_slots, n_fields, _ = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC:
+            buf.close()
+            os.close(fd)
+            raise ValueError(f"{self.name} is not a metrics bus segment")
+        self.close()
+        self.fd, self.buf = fd, buf
+        raw = buf[_HEADER.size:DATA_OFFSET].rstrip(b"\0")
+        self.fields = json.loads(raw)
+        self.index = {name: i for i, name in enumerate(self.fields)}
+        self.n_slots = n_slots
+        # (n_slots, 2 + n_fields) float64 view; column 0 holds the seq bits
+        self.slots = np.ndarray((n_slots, 2 + n_fields), dtype="<f8", buffer=buf, offset=DATA_OFFSET)
+        self.seqs = self.slots.view("<u8")[:, 0]
+
+    def _reattach(self):
+        """Move to the current segment; stays on the old one while there is none."""
+        try:
+            self._attach()
+        except (FileNotFoundError, ValueError):
+            # Logger stopped, or between two segments (new one not written yet)
+            pass
+
+    @property
+    def closed(self):
+        return struct.unpack_from("<I", self.buf, 8)[0] == 1
+
+    def _replaced(self):
+        """True if the name now points at another segment (logger killed and restarted)."""
+        try:
+            return os.stat(f"{SHM_DIR}/{self.name}").st_ino != os.fstat(self.fd).st_ino
+        except OSError:
+            return False
+
+    @property
+    def count(self):
+        """Samples published so far, re-attaching first if the publisher replaced the segment."""
+        if self.closed:
+            self._reattach()
+        return _U64.unpack_from(self.buf, _COUNT_OFFSET)[0]
+
+    def wait(self, last_count, timeout=None, poll=0.02, stale_after=5.0):
+        """
+        Count once it differs from `last_count` (it restarts at 0 on a new
+        segment), or the current count after `timeout` seconds.
+        """
+        start = time.monotonic()
+        checked = start
+        while True:
+            count = self.count
+            now = time.monotonic()
+            if count != last_count or (timeout is not None and now - start >= timeout):
+                return count
+            if now - checked >= stale_after:
+                checked = now
+                if self._replaced():
+                    self._reattach()
+                    continue
+            time.sleep(poll)
+
+    def latest(self, n, fields=None, retries=100):
+        """
+        (timestamps, values) of the newest min(n, available) samples, oldest
+        first, as copies that were consistent at read time. `fields` selects
+        columns (default: all, in self.fields order); unknown names read NaN.
+        """
+        import numpy as np
+
+        for _ in range(retries):
+            count = self.count
+            n_read = min(n, count, self.n_slots)
+            ks = np.arange(count - n_read, count, dtype=np.uint64)
+            rows = ks % self.n_slots
+            block = self.slots[rows].copy()
+            # Seqlock check: every slot still holds the sample we expected, complete
+            expected = 2 * ks + 2
+            if np.array_equal(self.seqs[rows], expected) and np.array_equal(block[:, 0].view("<u8"), expected):
+                break
+        else:
+            raise RuntimeError("metrics bus: publisher kept overwriting the requested samples")
+
+        timestamps = block[:, 1]
+        if fields is None:
+            return timestamps, block[:, 2:]
+        out = np.full((n_read, len(fields)), np.nan)
+        for j, name in enumerate(fields):
+            i = self.index.get(name)
+            if i is not None:
+                out[:, j] = block[:, 2 + i]
+        return timestamps, out
+
+    def close(self):
+        if self.buf is not None:
+            # Views must go before the mapping can be closed
+            self.slots = self.seqs = None
+            self.buf.close()
+            os.close(self.fd)
+            self.buf = None
+
+
+def main():
+    import argparse
+    from datetime import datetime
+
+    parser = argparse.ArgumentParser(description="Read the live metrics bus")
+    parser.add_argument("command", choices=["latest", "watch"])
+    parser.add_argument("fields", nargs="*", help="Fields to show (default: all)")
+    parser.add_argument("--name", default=BUS_NAME)
+    args = parser.parse_args()
+
+    try:
+        sub = Subscriber(args.name)
+    except FileNotFoundError:
+        print(f"Error: no metrics bus '{args.name}' (is the logger running?)", file=sys.stderr)
+        sys.exit(1)
+    fields = args.fields or sub.fields
+
+    last = 0 if args.command == "watch" else max(sub.count - 1, 0)
+    while True:
+        last = sub.wait(last)
+        ts, values = sub.latest(1, fields)
+        if len(ts) == 0:
+            continue  # logger restarted, nothing published yet
+        sample = {"timestamp": datetime.fromtimestamp(ts[0]).isoformat(timespec="seconds")}
+        sample.update({f: (None if v != v else float(v)) for f, v in zip(fields, values[0])})
+        print(json.dumps(sample), flush=True)
+        if args.command == "latest":
+            break
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Versioned, memory-mappable model store.
+
+    activity_model.store/
+        current -> 3f2a9c1e7b44          (symlink, swapped atomically)
+        3f2a9c1e7b44/
+            metadata.json                feature spec, classes, hashes, timestamp
+            feature.npy threshold.npy left.npy right.npy value.npy roots.npy
+            model.joblib                 uncompressed sklearn estimator
+
+The forest arrays are raw .npy files opened with mmap_mode='r', so every
+inference process on the machine shares the same page-cache pages instead
+of holding its own unpickled copy. (sklearn's Tree copies its nodes while
+unpickling, so model.joblib is kept only for the sklearn backend and for
+re-training tools; it is never what the flat backend reads.)
+
+Readers poll `metadata.json` through the `current` link: a changed
+`model_hash` means a new model, without touching the arrays themselves.
+"""
+import hashlib
+import json
+import os
+import pickle
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+STORE_PATH = 'activity_model.store'
+FORMAT_VERSION = 1
+ARRAY_NAMES = ['feature', 'threshold', 'left', 'right', 'value', 'roots']
+KEEP_VERSIONS = 3  # old versions stay on disk briefly for processes still mapping them
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def current_dir(store_path=STORE_PATH):
+    """The `current` link; call .resolve() to pin one version."""
+    return Path(store_path) / 'current'
+
+
+def read_metadata(store_path=STORE_PATH):
+    with open(current_dir(store_path) / 'metadata.json') as f:
+        return json.load(f)
+
+
+def save_model(model, store_path=STORE_PATH, training_data_path=None, feature_spec=None):
+    """
+    Write `model` as a new version of the store and point `current` at it.
+
+    Returns the metadata dict. Saving the same model twice is a no-op apart
+    from re-pointing `current`.
+    """
+    from forest_predictor import FlatForest
+    import joblib
+
+    store = Path(store_path)
+    store.mkdir(parents=True, exist_ok=True)
+
+    arrays = {}
+    if hasattr(model, 'estimators_') and hasattr(model.estimators_[0], 'tree_'):
+        forest = FlatForest.from_sklearn(model)
+        arrays = {name: getattr(forest, name) for name in ARRAY_NAMES}
+
+    digest = hashlib.sha256()
+    for name in ARRAY_NAMES:
+        if name in arrays:
+            digest.update(np.ascontiguousarray(arrays[name]).tobytes())
+    if not arrays:
+        digest.update(pickle.dumps(model))
+    digest.update(repr(model.get_params()).encode())
+    model_hash = digest.hexdigest()
+
+    metadata = {
+        'format_version': FORMAT_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'model_type': type(model).__name__,
+        'model_params': {k: repr(v) for k, v in model.get_params().items()},
+        'model_hash': model_hash,
+        'classes': [str(c) for c in model.classes_],
+        'feature_names': [str(c) for c in model.feature_names_in_],
+        'feature_spec': feature_spec or {},
+        'has_forest_arrays': bool(arrays),
+        'max_depth': int(max(e.tree_.max_depth for e in model.estimators_)) if arrays else None,
+        'training_data': None,
+    }
+    if training_data_path is not None:
+        metadata['training_data'] = {
+            'path': str(training_data_path),
+            'sha256': file_sha256(training_data_path),
+        }
+
+    version = store / model_hash[:12]
+    if not version.exists():
+        tmp = store / f'.tmp-{os.getpid()}-{model_hash[:12]}'
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        for name, arr in arrays.items():
+            np.save(tmp / f'{name}.npy', np.ascontiguousarray(arr))
+        joblib.dump(model, tmp / 'model.joblib', compress=0)
+        with open(tmp / 'metadata.json', 'w') as f:
+            json.dump(metadata, f, indent=2)
+        os.replace(tmp, version)
+    else:
+        with open(version / 'metadata.json') as f:
+            metadata = json.load(f)
+        os.utime(version)  # most recent again, so pruning keeps it
+
+    # Atomic swap: build the new link beside the old one, then rename over it
+    link = store / 'current'
+    tmp_link = store / f'.current-{os.getpid()}'
+    if tmp_link.is_symlink():
+        tmp_link.unlink()
+    tmp_link.symlink_to(version.name)
+    os.replace(tmp_link, link)
+
+    _prune(store, keep=version.name)
+    return metadata
+
+
+def _prune(store, keep):
+    versions = sorted(
+        (p for p in store.iterdir() if p.is_dir() and not p.is_symlink() and not p.name.startswith('.')),
+        key=lambda p: p.stat().st_mtime,
+        reverse=True,
+    )
+    for old in versions[KEEP_VERSIONS:]:
+        if old.name != keep:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def load_forest(store_path=STORE_PATH):
+    """FlatForest whose arrays are read-only memory maps of the current version."""
+    from forest_predictor import FlatForest
+
+    # Resolve once so a concurrent swap cannot mix arrays from two versions
+    version = current_dir(store_path).resolve()
+    with open(version / 'metadata.json') as f:
+        metadata = json.load(f)
+    if not metadata['has_forest_arrays']:
+        raise ValueError(f"{metadata['model_type']} in {version} has no forest arrays (use the sklearn backend)")
+
+    arrays = {name: np.load(version / f'{name}.npy', mmap_mode='r') for name in ARRAY_NAMES}
+    forest = FlatForest(
+        max_depth=metadata['max_depth'],
+        classes=metadata['classes'],
+        feature_names=metadata['feature_names'],
+        **arrays,
+    )
+    forest.metadata = metadata
+    return forest
+
+
+def load_sklearn(store_path=STORE_PATH):
+    """The original estimator (arrays memory-mapped where sklearn allows it)."""
+    import joblib
+
+    version = current_dir(store_path).resolve()
+    model = joblib.load(version / 'model.joblib', mmap_mode='r')
+    with open(version / 'metadata.json') as f:
+        model.store_metadata = json.load(f)
+    return model
+
+
+class ModelStore:
+    """Tracks which version a process has loaded and cheaply detects new ones."""
+
+    def __init__(self, store_path=STORE_PATH):
+        self.store_path = store_path
+        self.model_hash = None
+
+    def load_forest(self):
+        forest = load_forest(self.store_path)
+        self.model_hash = forest.metadata['model_hash']
+        return forest
+
+    def has_changed(self):
+        """True if `current` points at a model other than the one loaded (reads only metadata.json)."""
+        try:
+            return read_metadata(self.store_path)['model_hash'] != self.model_hash
+        except (OSError, ValueError, KeyError):
+            # Missing or half-written store: keep the model we have
+            return False
@@ -0,0 +1,138 @@
+"""
+Shared plotting helpers for the report scripts.
+
+Segments (runs of equal label / app / flag) are found with one vectorised
+run-length encoding pass and drawn as ONE PolyCollection per category,
+instead of one axvspan/hlines artist per segment.
+
+Long series are reduced to about POINTS_PER_PIXEL points per horizontal
+pixel of the axes before plotting (min + max of each bucket), so a month of
+1 Hz samples draws as a few thousand points and peaks are kept.
+"""
+import numpy as np
+import matplotlib.dates as mdates
+from matplotlib.collections import PolyCollection
+
+ONE_SECOND = np.timedelta64(1, 's')
+POINTS_PER_PIXEL = 2
+
+
+def find_segments(values, timestamps):
+    """
+    Run-length encode `values` (in row order).
+
+    Returns (starts, ends, segment_values): the timestamp of the first and
+    last row of every run, and the value the run holds.
+    """
+    values = np.asarray(values)
+    timestamps = np.asarray(timestamps)
+    if len(values) == 0:
+        return timestamps[:0], timestamps[:0], values[:0]
+    change = np.flatnonzero(values[1:] != values[:-1]) + 1
+    first = np.concatenate([[0], change])
+    last = np.concatenate([change, [len(values)]]) - 1
+    return timestamps[first], timestamps[last], values[first]
+
+
+def draw_segments(ax, starts, ends, values, colors, default_color='whitesmoke',
+                  y=None, height=None, min_duration=None, **kwargs):
+    """
+    Draw [start, end] spans, one PolyCollection per distinct value.
+
+    With y=None the spans cover the full axes height (like axvspan);
+    otherwise they are bars centred on data coordinate `y` with `height`
+    (like a thick hlines). `min_duration` widens zero-length runs so that
+    single-row segments stay visible.
+    """
+    if len(starts) == 0:
+        return
+    if min_duration is not None:
+        ends = np.maximum(ends, starts + min_duration)
+    x0 = mdates.date2num(starts)
+    x1 = mdates.date2num(ends)
+
+    if y is None:
+        y0, y1 = 0.0, 1.0
+        transform = ax.get_xaxis_transform()
+    else:
+        y0, y1 = y - height / 2, y + height / 2
+        transform = ax.transData
+
+    # (n, 4, 2) rectangle vertices, built in one go
+    verts = np.empty((len(x0), 4, 2))
+    verts[:, :, 0] = np.column_stack([x0, x0, x1, x1])
+    verts[:, :, 1] = [y0, y1, y1, y0]
+
+    for value in np.unique(values):
+        mask = values == value
+        ax.add_collection(PolyCollection(
+            verts[mask], facecolors=colors.get(value, default_color),
+            transform=transform, **kwargs,
+        ), autolim=y is not None)
+
+    if y is not None:
+        ax.xaxis_date()
+        ax.autoscale_view()
+
+
+# =========================
+# LEVEL OF DETAIL
+# =========================
+def target_points(ax):
+    """Number of points worth drawing across `ax` at the figure's dpi."""
+    return max(2, int(ax.bbox.width * POINTS_PER_PIXEL))
+
+
+def minmax_indices(y, n_out):
+    """
+    Sorted row indices keeping the min and the max of each of n_out // 2
+    equal-count buckets. Rows are bucketed by position, which for a 1 Hz
+    log is the same as bucketing by time.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    size = -(-n // max(1, n_out // 2))
+    n_buckets = -(-n // size)
+    pad = n_buckets * size - n
+    # NaNs never win: they become -inf for the max and +inf for the min
+    hi = np.concatenate([np.where(np.isnan(y), -np.inf, y), np.full(pad, -np.inf)]).reshape(n_buckets, size)
+    lo = np.concatenate([np.where(np.isnan(y), np.inf, y), np.full(pad, np.inf)]).reshape(n_buckets, size)
+    offsets = np.arange(n_buckets) * size
+    idx = np.concatenate([offsets + hi.argmax(axis=1), offsets + lo.argmin(axis=1)])
+    return np.unique(np.minimum(idx, n - 1))
+
+
+def downsample(x, y, n_out):
+    """(x, y) reduced to at most ~n_out points, keeping every bucket's extremes."""
+    x = np.asarray(x)
+    y = np.asarray(y)
+    idx = minmax_indices(y, n_out)
+    return x[idx], y[idx]
+
+
+def plot_lod(ax, x, y, **kwargs):
+    """ax.plot of a downsampled copy of (x, y)."""
+    return ax.plot(*downsample(x, y, target_points(ax)), **kwargs)
+
+
+def fill_between_lod(ax, x, y, **kwargs):
+    """ax.fill_between of a downsampled copy of (x, y)."""
+    return ax.fill_between(*downsample(x, y, target_points(ax)), **kwargs)
+
+
+def thin_points(keys, n_buckets):
+    """
+    Sorted row indices keeping the first row of every (position bucket, key)
+    pair: for categorical scatter plots, where one marker per pixel column
+    and category looks identical to thousands of overlapping ones.
+    `keys` are non-negative integer codes (e.g. from pd.factorize).
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    n = len(keys)
+    if n <= n_buckets:
+        return np.arange(n)
+    bucket = np.arange(n) * n_buckets // n
+    _, first = np.unique(bucket * (keys.max() + 1) + keys, return_index=True)
+    return np.sort(first)
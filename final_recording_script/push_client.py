@@ -0,0 +1,304 @@
+"""
+Push logger rows to a central collector (collector.py).
+
+Wire protocol, over TCP ("host:port") or a UNIX stream socket (a path).
+Every frame is a 4-byte big-endian length followed by the payload, whose
+first byte is its type:
+
+    client -> server
+      H  hello   JSON {"host": ..., "client": ...}, once per connection
+      B  batch   <Q seq> <I n_rows> <H n_cols>, then per column:
+                   <H name_len> name  <c kind>  data
+                 kind 'd': n_rows little-endian float64 (NaN = missing)
+                 kind 's': n_rows <H byte_len>, then the UTF-8 bytes
+      S  stats   (empty) -> server answers with S + JSON counters
+    server -> client
+      A  ack     <Q seq>: batch is in the fleet store
+      E  error   <Q seq> message: batch rejected, do not resend
+
+Batches are columnar so the collector decodes numeric columns with one
+np.frombuffer each.
+
+RowPusher batches rows, seals each batch into a file of the spool
+directory and sends from there on a background thread, so the logger never
+blocks on the network. Up to IN_FLIGHT batches are sent before the first
+ack is awaited; a batch file is deleted only once it is acked. When the
+collector is unreachable the spool keeps growing up to SPOOL_MAX_BYTES,
+after which the oldest batches are dropped. Re-sending after a lost ack is
+harmless: the store drops rows it already has.
+
+Only the standard library is imported (the logger imports this at login).
+"""
+import json
+import math
+import os
+import socket
+import struct
+import threading
+import time
+from array import array
+from pathlib import Path
+
+BATCH_ROWS = 60                  # rows per batch (one minute at 1 Hz)
+BATCH_SECONDS = 60.0             # ... or seal a partial batch after this long
+IN_FLIGHT = 8                    # batches sent before waiting for an ack
+ACK_TIMEOUT = 30.0
+RETRY_MIN = 1.0                  # reconnect backoff, doubled up to RETRY_MAX
+RETRY_MAX = 60.0
+SPOOL_MAX_BYTES = 64 * 1024 * 1024
+
+_LEN = struct.Struct(">I")
+_BATCH = struct.Struct("<QIH")
+_SEQ = struct.Struct("<Q")
+_U16 = struct.Struct("<H")
+MAX_FRAME = 64 * 1024 * 1024
+
+
+# =========================
+# FRAMING / ENCODING
+# =========================
+def connect(address, timeout=None):
+    """Socket connected to "host:port" (TCP) or a UNIX socket path."""
+    host, sep, port = str(address).rpartition(":")
+    if sep and port.isdigit() and "/" not in address:
+        sock = socket.create_connection((host, int(port)), timeout=timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(str(address))
+    return sock
+
+
+def frame(kind, payload=b""):
+    return _LEN.pack(len(payload) + 1) + kind + payload
+
+
+def recv_frame(sock):
+    """(kind, payload) of the next frame; ConnectionError on EOF."""
+    (length,) = _LEN.unpack(_recv_exact(sock, _LEN.size))
+    if not 0 < length <= MAX_FRAME:
+        raise ConnectionError(f"bad frame length {length}")
+    data = _recv_exact(sock, length)
+    return data[:1], data[1:]
+
+
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        buf += chunk
+    return bytes(buf)
+
+
+def _is_number(v):
+    return v is None or isinstance(v, (int, float))
+
+
+def encode_batch(seq, columns, rows):
+    """Batch payload (without frame header) for `rows`, a list of lists in `columns` order."""
+    parts = [_BATCH.pack(seq, len(rows), len(columns))]
+    for j, name in enumerate(columns):
+        values = [row[j] for row in rows]
+        name_b = name.encode()
+        parts.append(_U16.pack(len(name_b)) + name_b)
+        if all(_is_number(v) for v in values):
+            parts.append(b"d")
+            parts.append(array("d", [math.nan if v is None else float(v) for v in values]).tobytes())
+        else:
+            encoded = [b"" if v is None else str(v).encode()[:0xFFFF] for v in values]
+            parts.append(b"s")
+            parts.append(array("H", [len(b) for b in encoded]).tobytes())
+            parts.extend(encoded)
+    return b"".join(parts)
+
+
+def decode_batch(payload):
+    """
+    (seq, n_rows, {column: values}); numeric columns come back as raw float64
+    bytes. Raises ValueError on any malformed or truncated payload.
+    """
+    if len(payload) < _BATCH.size:
+        raise ValueError(f"batch of {len(payload)} bytes is shorter than its header")
+    seq, n_rows, n_cols = _BATCH.unpack_from(payload)
+    pos = _BATCH.size
+    columns = {}
+    for _ in range(n_cols):
+        if pos + _U16.size > len(payload):
+            raise ValueError("batch truncated in a column header")
+        (name_len,) = _U16.unpack_from(payload, pos)
+        pos += 2
+        name = payload[pos:pos + name_len].decode()
+        pos += name_len
+        kind = payload[pos:pos + 1]
+        pos += 1
+        if kind == b"d":
+            columns[name] = payload[pos:pos + 8 * n_rows]
+            pos += 8 * n_rows
+        elif kind == b"s":
+            lengths = array("H")
+            lengths.frombytes(payload[pos:pos + 2 * n_rows])
+            pos += 2 * n_rows
+            values = []
+            for length in lengths:
+                values.append(payload[pos:pos + length].decode(errors="replace"))
+                pos += length
+            columns[name] = values
+        else:
+            raise ValueError(f"unknown column kind {kind!r}")
+    if pos > len(payload):
+        raise ValueError("batch truncated in column data")
+    if pos != len(payload):
+        raise ValueError("trailing bytes in batch")
+    return seq, n_rows, columns
+
+
+# =========================
+# CLIENT
+# =========================
+class RowPusher:
+    """
+    Batches rows and ships them to the collector from a bounded disk spool.
+
+        pusher = RowPusher("collector.lan:7070", spool_dir).start()
+        pusher.push(columns, row)          # cheap, never blocks on the network
+    """
+
+    def __init__(self, address, spool_dir, host=None, batch_rows=BATCH_ROWS,
+                 batch_seconds=BATCH_SECONDS, spool_max_bytes=SPOOL_MAX_BYTES):
+        self.address = address
+        self.spool = Path(spool_dir)
+        self.spool.mkdir(parents=True, exist_ok=True)
+        self.host = host or socket.gethostname()
+        self.batch_rows = batch_rows
+        self.batch_seconds = batch_seconds
+        self.spool_max_bytes = spool_max_bytes
+        # Sequence numbers continue after batches left in the spool by an earlier run
+        pending = self._pending()
+        self.seq = int(pending[-1].stem) + 1 if pending else 0
+        self.columns = None
+        self.rows = []
+        self.batch_started = 0.0
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.sent = self.acked = self.dropped = 0
+        self.connected = False
+
+    def _pending(self):
+        return sorted(self.spool.glob("*.batch"))
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def push(self, columns, row):
+        """Queue one row; `columns` may change (e.g. GPU headers arriving), which seals the batch."""
+        if self.rows and columns != self.columns:
+            self.flush()
+        if not self.rows:
+            self.columns = list(columns)
+            self.batch_started = time.monotonic()
+        self.rows.append(list(row))
+        if len(self.rows) >= self.batch_rows or time.monotonic() - self.batch_started >= self.batch_seconds:
+            self.flush()
+
+    def flush(self):
+        """Seal the current batch into the spool and wake the sender."""
+        if not self.rows:
+            return
+        payload = encode_batch(self.seq, self.columns, self.rows)
+        path = self.spool / f"{self.seq:012d}.batch"
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, path)
+        self.seq += 1
+        self.rows = []
+        self._trim_spool()
+        self.wakeup.set()
+
+    def _trim_spool(self):
+        sizes = {}
+        for path in self._pending():
+            try:
+                sizes[path] = path.stat().st_size
+            except FileNotFoundError:
+                pass  # acked and deleted by the sender meanwhile
+        total = sum(sizes.values())
+        for path, size in sizes.items():
+            if total <= self.spool_max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            self.dropped += 1
+
+    def close(self, timeout=5.0):
+        """Seal the last batch and give the sender `timeout` seconds to drain the spool."""
+        self.flush()
+        deadline = time.monotonic() + timeout
+        while self._pending() and time.monotonic() < deadline and self.thread and self.thread.is_alive():
+            time.sleep(0.05)
+        self.stopped.set()
+        self.wakeup.set()
+
+    # =========================
+    # SENDER THREAD
+    # =========================
+    def _run(self):
+        backoff = RETRY_MIN
+        while not self.stopped.is_set():
+            if not self._pending():
+                self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+            try:
+                sock = connect(self.address, timeout=ACK_TIMEOUT)
+            except OSError:
+                self.stopped.wait(backoff)
+                backoff = min(backoff * 2, RETRY_MAX)
+                continue
+            try:
+                sock.sendall(frame(b"H", json.dumps({"host": self.host, "client": f"{self.host}:{os.getpid()}"}).encode()))
+                self.connected = True
+                backoff = RETRY_MIN
+                self._send_spool(sock)
+            except (OSError, ValueError):
+                pass
+            finally:
+                self.connected = False
+                sock.close()
+
+    def _send_spool(self, sock):
+        in_flight = {}
+        while not self.stopped.is_set():
+            for path in self._pending():
+                if len(in_flight) >= IN_FLIGHT:
+                    break
+                seq = int(path.stem)
+                if seq in in_flight:
+                    continue
+                try:
+                    payload = path.read_bytes()
+                except FileNotFoundError:
+                    continue  # trimmed meanwhile
+                sock.sendall(frame(b"B", payload))
+                in_flight[seq] = path
+                self.sent += 1
+            if not in_flight:
+                self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+            kind, payload = recv_frame(sock)
+            (seq,) = _SEQ.unpack_from(payload)
+            path = in_flight.pop(seq, None)
+            if path is not None:
+                path.unlink(missing_ok=True)
+            if kind == b"A":
+                self.acked += 1
+            elif kind == b"E":
+                self.dropped += 1
+                print(f"Collector rejected batch {seq}: {payload[_SEQ.size:].decode(errors='replace')}")
@@ -0,0 +1,168 @@
+"""
+KLL quantile sketch (Karnin, Lang, Liberty 2016), vectorised with NumPy.
+
+A sketch summarises any number of values in O(k log(n/k)) floats, answers
+rank/quantile queries with error ~1/k of n, and two sketches merge into one
+that summarises the union. That makes it usable for pre-aggregated tables
+(rollups.py) and for per-segment summaries merged across days and hosts.
+
+    s = KLLSketch(); s.update(values); s.quantile([0.5, 0.9])
+    merged = KLLSketch.merged([s1, s2, s3])
+    KLLSketch.from_dict(s.to_dict())      # JSON-safe round trip
+    unpack_sketches(pack_sketches(many))  # many sketches as a few flat arrays (np.savez)
+"""
+import numpy as np
+
+DEFAULT_K = 200
+_rng = np.random.default_rng()
+
+
+class KLLSketch:
+    def __init__(self, k=DEFAULT_K):
+        self.k = k
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        # levels[h] holds items of weight 2**h
+        self.levels = [np.empty(0)]
+
+    # =========================
+    # BUILD
+    # =========================
+    def _capacity(self, h):
+        depth = len(self.levels) - 1 - h
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.n += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            level = self.levels[h]
+            if len(level) > self._capacity(h):
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                level = np.sort(level)
+                # Odd count: one item stays behind at this level
+                keep = level[:1] if len(level) % 2 else level[:0]
+                pairs = level[len(keep):]
+                promoted = pairs[_rng.integers(2)::2]
+                self.levels[h] = keep
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+                # Capacities shrink as the sketch grows: recheck from the bottom
+                h = 0
+                continue
+            h += 1
+
+    def merge(self, other):
+        """Fold `other` into this sketch (in place); returns self."""
+        if other.n == 0:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, level in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], level])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    @classmethod
+    def merged(cls, sketches, k=DEFAULT_K):
+        out = cls(k)
+        for s in sketches:
+            out.merge(s)
+        return out
+
+    # =========================
+    # QUERY
+    # =========================
+    def _weighted(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2 ** h, dtype=np.int64)
+                                  for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], np.cumsum(weights[order])
+
+    def quantile(self, q):
+        """Approximate value at quantile(s) q in [0, 1] (NaN if empty)."""
+        q = np.asarray(q, dtype=np.float64)
+        if self.n == 0:
+            return np.full(q.shape, np.nan) if q.ndim else np.nan
+        items, cum = self._weighted()
+        idx = np.searchsorted(cum, q * cum[-1], side='left')
+        out = items[np.minimum(idx, len(items) - 1)]
+        # Exact extremes are tracked separately
+        out = np.where(q <= 0, self.min, np.where(q >= 1, self.max, out))
+        return out if q.ndim else float(out)
+
+    def rank(self, x):
+        """Approximate fraction of values <= x."""
+        if self.n == 0:
+            return np.nan
+        items, cum = self._weighted()
+        i = np.searchsorted(items, x, side='right')
+        return float(cum[i - 1] / cum[-1]) if i else 0.0
+
+    def __len__(self):
+        return self.n
+
+    # =========================
+    # SERIALISATION
+    # =========================
+    def to_dict(self):
+        return {
+            'k': self.k, 'n': self.n,
+            'min': None if self.n == 0 else float(self.min),
+            'max': None if self.n == 0 else float(self.max),
+            'levels': [level.tolist() for level in self.levels],
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        s = cls(d['k'])
+        s.n = d['n']
+        if s.n:
+            s.min, s.max = d['min'], d['max']
+        s.levels = [np.asarray(level, dtype=np.float64) for level in d['levels']] or [np.empty(0)]
+        return s
+
+
+def pack_sketches(sketches):
+    """Flat arrays for a list of sketches, e.g. to store with np.savez (no pickling)."""
+    n_levels = np.array([len(s.levels) for s in sketches], dtype=np.int64)
+    levels = [level for s in sketches for level in s.levels]
+    return {
+        'k': np.array([s.k for s in sketches], dtype=np.int64),
+        'n': np.array([s.n for s in sketches], dtype=np.int64),
+        'min': np.array([s.min for s in sketches], dtype=np.float64),
+        'max': np.array([s.max for s in sketches], dtype=np.float64),
+        'n_levels': n_levels,
+        'level_len': np.array([len(level) for level in levels], dtype=np.int64),
+        'items': np.concatenate(levels) if levels else np.empty(0),
+    }
+
+
+def unpack_sketches(arrays):
+    """Inverse of pack_sketches()."""
+    items = np.split(np.asarray(arrays['items'], dtype=np.float64), np.cumsum(arrays['level_len'])[:-1])
+    sketches = []
+    pos = 0
+    for k, n, lo, hi, n_levels in zip(arrays['k'], arrays['n'], arrays['min'], arrays['max'], arrays['n_levels']):
+        s = KLLSketch(int(k))
+        s.n, s.min, s.max = int(n), float(lo), float(hi)
+        s.levels = items[pos:pos + n_levels] or [np.empty(0)]
+        pos += n_levels
+        sketches.append(s)
+    return sketches
@@ -0,0 +1,179 @@
+"""
+Rule-based relabeling of activity logs.
+
+    python relabel.py INPUT.csv [-o OUTPUT.csv] [--rules idle] [--chunksize 200000]
+
+A rule set is an ordered list of (label, vectorised boolean mask) pairs,
+evaluated with np.select over whole columns: the first matching rule wins,
+exactly like an if/elif chain, but with no per-row Python call. The log is
+streamed through in chunks, so memory stays constant for multi-GB files.
+
+Every output gets a `<output>.rules.json` sidecar recording the rule set
+name and version, the rule descriptions and the resulting label counts.
+Bump a rule set's version whenever its thresholds or order change.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from string_dict import dict_path
+
+KEEP = None  # default: leave the existing label untouched
+
+
+class Columns:
+    """Numeric view of a string-typed chunk; each column is converted once, on first use."""
+
+    def __init__(self, chunk):
+        self.chunk = chunk
+        self.cache = {}
+
+    def __getitem__(self, name):
+        if name not in self.cache:
+            self.cache[name] = pd.to_numeric(self.chunk[name], errors='coerce').to_numpy(dtype=np.float64)
+        return self.cache[name]
+
+
+class Rule:
+    def __init__(self, name, label, mask, description):
+        self.name = name
+        self.label = label
+        self.mask = mask
+        self.description = description
+
+
+class RuleSet:
+    def __init__(self, name, version, rules, default=KEEP, label_col='label'):
+        self.name = name
+        self.version = version
+        self.rules = rules
+        self.default = default
+        self.label_col = label_col
+
+    def apply(self, chunk):
+        """Label array for a DataFrame chunk."""
+        cols = Columns(chunk)
+        conditions = [np.asarray(rule.mask(cols), dtype=bool) for rule in self.rules]
+        choices = [rule.label for rule in self.rules]
+        if self.default is KEEP:
+            default = chunk[self.label_col].to_numpy(dtype=object)
+        else:
+            default = self.default
+        return np.select(conditions, choices, default=default)
+
+    def describe(self):
+        return {
+            'ruleset': self.name,
+            'version': self.version,
+            'default': 'keep existing label' if self.default is KEEP else self.default,
+            'rules': [{'name': r.name, 'label': r.label, 'when': r.description} for r in self.rules],
+        }
+
+
+# =========================
+# RULE SETS
+# =========================
+IDLE_TIME_SEC = 10.0     # change_label_to_idle.py: >10 s without input is Idle
+
+TYPING_KEYS = 1          # >=1 key/sec = typing
+IDLE_TIME = 5            # >=5 sec no input = idle
+VIDEO_NET = 500_000      # ~0.5 MB/s sustained inbound
+BUSY_CPU = 40            # background load threshold
+
+RULESETS = {
+    # Overrides the recorded label with Idle whenever the user was away
+    'idle': RuleSet('idle', 1, [
+        Rule('idle_threshold', 'Idle',
+             lambda c: c['idle_time_sec'] > IDLE_TIME_SEC,
+             f'idle_time_sec > {IDLE_TIME_SEC}'),
+    ]),
+    # playground/get_label.py heuristics (unified_logger.py column set)
+    'activity': RuleSet('activity', 1, [
+        Rule('typing', 'typing',
+             lambda c: (c['keyboard_active'] != 0) & (c['keys_per_sec'] >= TYPING_KEYS),
+             f'keyboard_active and keys_per_sec >= {TYPING_KEYS}'),
+        Rule('browsing', 'browsing',
+             lambda c: ((c['mouse_active'] != 0) | (c['window_switch_count'] > 0))
+                       & (c['keys_per_sec'] < TYPING_KEYS),
+             f'(mouse_active or window_switch_count > 0) and keys_per_sec < {TYPING_KEYS}'),
+        Rule('video_net', 'watching_video',
+             lambda c: (c['mouse_active'] == 0) & (c['net_in_Bps'] >= VIDEO_NET),
+             f'mouse_active == 0 and net_in_Bps >= {VIDEO_NET}'),
+        Rule('background_busy', 'background_busy',
+             lambda c: (c['idle_time_sec'] >= IDLE_TIME) & (c['cpu_percent'] >= BUSY_CPU),
+             f'idle_time_sec >= {IDLE_TIME} and cpu_percent >= {BUSY_CPU}'),
+        Rule('idle', 'idle',
+             lambda c: c['idle_time_sec'] >= IDLE_TIME,
+             f'idle_time_sec >= {IDLE_TIME}'),
+    ], default='unknown'),
+}
+
+
+def relabel(input_path, output_path, ruleset, chunksize=200_000):
+    """Stream `input_path` through `ruleset` into `output_path`; returns label counts."""
+    if isinstance(ruleset, str):
+        ruleset = RULESETS[ruleset]
+
+    # Write next to the output and rename at the end: safe for in-place relabeling
+    tmp_path = f'{output_path}.tmp-{os.getpid()}'
+    counts = {}
+    rows = 0
+    try:
+        # dtype=str keeps every other column byte-for-byte as it was
+        reader = pd.read_csv(input_path, chunksize=chunksize, dtype=str, keep_default_na=False)
+        for i, chunk in enumerate(reader):
+            labels = ruleset.apply(chunk)
+            chunk[ruleset.label_col] = labels
+            chunk.to_csv(tmp_path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+
+            values, n = np.unique(labels.astype(str), return_counts=True)
+            for value, c in zip(values, n):
+                counts[str(value)] = counts.get(str(value), 0) + int(c)
+            rows += len(chunk)
+        os.replace(tmp_path, output_path)
+        # Encoded logs: ids pass through unchanged, so the dictionary goes along
+        if dict_path(input_path).exists() and dict_path(input_path) != dict_path(output_path):
+            shutil.copyfile(dict_path(input_path), dict_path(output_path))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    sidecar = ruleset.describe()
+    sidecar.update({
+        'input': str(input_path),
+        'rows': rows,
+        'label_counts': counts,
+        'created': datetime.now().isoformat(timespec='seconds'),
+    })
+    with open(f'{output_path}.rules.json', 'w') as f:
+        json.dump(sidecar, f, indent=2)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorised, streaming rule-based relabeling")
+    parser.add_argument('input')
+    parser.add_argument('-o', '--output', help="Output CSV (default: relabel in place)")
+    parser.add_argument('--rules', choices=list(RULESETS), default='idle')
+    parser.add_argument('--chunksize', type=int, default=200_000)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"Error: {args.input} not found.")
+        sys.exit(1)
+    output = args.output or args.input
+    ruleset = RULESETS[args.rules]
+    print(f"Relabeling {args.input} -> {output} with '{ruleset.name}' rules v{ruleset.version}...")
+    counts = relabel(args.input, output, ruleset, args.chunksize)
+    print(f"Label counts: {counts}")
+    print(f"Rule set recorded in {output}.rules.json")
+
+
+if __name__ == "__main__":
+    main()
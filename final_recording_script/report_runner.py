@@ -0,0 +1,115 @@
+"""
+Render independent report plots in parallel worker processes.
+
+The DataFrame is loaded once by the parent. Every column is copied once into
+a multiprocessing.shared_memory block: numeric and datetime columns as-is,
+text columns as int32 codes plus their (small) list of categories. Workers
+map the blocks instead of re-reading the CSV or unpickling the frame, rebuild
+the frame, and each renders one plot function (which writes its own PNG).
+
+    run_report(df, [plot_a, plot_b, ...], workers=None)
+
+Plot functions must be module-level (picklable) and take the frame as their
+only argument. With one worker (or one core) everything runs in-process.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+
+# =========================
+# SHARED COLUMNS
+# =========================
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 registers the block again with the resource tracker,
+        # which workers share with the parent: harmless, it is a set.
+        return shared_memory.SharedMemory(name=name)
+
+
+def share_frame(df):
+    """Copy `df` into shared memory; returns (spec, blocks). The caller unlinks the blocks."""
+    spec = []
+    blocks = []
+    for col in df.columns:
+        series = df[col]
+        categories = None
+        if series.dtype.kind in 'biufcmM':
+            values = series.to_numpy()
+        else:
+            codes, uniques = pd.factorize(series)
+            values = codes.astype(np.int32)
+            categories = (list(uniques), series.dtype)
+        shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[:] = values
+        blocks.append(shm)
+        spec.append((col, shm.name, values.dtype.str, len(values), categories))
+    return spec, blocks
+
+
+def frame_from_spec(spec):
+    """Rebuild the DataFrame from shared blocks; returns (df, blocks to keep alive)."""
+    blocks = []
+    columns = {}
+    for col, name, dtype, n, categories in spec:
+        shm = _attach(name)
+        blocks.append(shm)
+        values = np.ndarray((n,), dtype=np.dtype(dtype), buffer=shm.buf)
+        values.flags.writeable = False
+        if categories is not None:
+            # Back to the original text dtype (code -1 is a missing value)
+            uniques, text_dtype = categories
+            lookup = np.array(uniques + [None], dtype=object)
+            values = pd.array(lookup[values], dtype=text_dtype)
+        columns[col] = values
+    return pd.DataFrame(columns, copy=False), blocks
+
+
+# =========================
+# WORKERS
+# =========================
+_df = None
+_blocks = None
+
+
+def _init_worker(spec):
+    global _df, _blocks
+    _df, _blocks = frame_from_spec(spec)
+
+
+def _render(plot):
+    t0 = time.perf_counter()
+    plot(_df.copy(deep=False))
+    return time.perf_counter() - t0
+
+
+def run_report(df, plots, workers=None):
+    """Call every function in `plots` on `df`, one worker process per plot. Returns {plot name: seconds}."""
+    workers = workers or min(len(plots), os.cpu_count() or 1)
+    timings = {}
+    t0 = time.perf_counter()
+    if workers <= 1:
+        for plot in plots:
+            t = time.perf_counter()
+            plot(df.copy(deep=False))
+            timings[plot.__name__] = time.perf_counter() - t
+    else:
+        spec, blocks = share_frame(df)
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(spec,)) as pool:
+                futures = {pool.submit(_render, plot): plot.__name__ for plot in plots}
+                for future in as_completed(futures):
+                    timings[futures[future]] = future.result()
+        finally:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+    print(f"Rendered {len(plots)} plots on {workers} worker(s) in {time.perf_counter() - t0:.1f}s")
+    return timings
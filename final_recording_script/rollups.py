@@ -0,0 +1,305 @@
+"""
+Pre-aggregated activity tables (rollups) at 1 min, 15 min and 1 h.
+
+    python rollups.py [log.csv]                       # catch up with the log
+    python rollups.py [log.csv] --follow 60           # ... and keep following it
+    python rollups.py [log.csv] --query cpu_percent --granularity 1h --by label hour
+
+Every table is keyed by (time bucket, app_id, label) and holds, for each of
+METRICS: count, sum, sum of squares, min and max. The 15 min and 1 h tables
+also keep a KLL quantile sketch (quantile_sketch.py) per metric; a 1 min
+bucket has at most 60 values, so a sketch there would just be the raw rows,
+and 1 min queries take their quantiles from the enclosing 15 min buckets.
+Queries re-group those rows (by label, app_id and/or hour of day, within a
+time range) by adding the sums and merging the sketches, so mean / std /
+quantiles come back in milliseconds without touching the raw log.
+
+Updates are incremental: the state remembers how many bytes of the log it
+has consumed and only parses complete lines appended since, so the logger
+can keep writing while --follow (or any report) calls update(). The state
+lives next to the log as <log>.rollups.npz: plain arrays, no pickles, so
+any script can load it.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import zipfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from feature_cache import _complete_length
+from quantile_sketch import KLLSketch, pack_sketches, unpack_sketches
+from string_dict import ENCODED_COLS, is_encoded, load_strings
+
+LOG_PATH = 'comprehensive_activity_log_with_Idle.csv'
+
+GRANULARITIES = {'1min': '1min', '15min': '15min', '1h': '1h'}
+SKETCHED = ['15min', '1h']       # granularities that keep quantile sketches
+FORMAT_VERSION = 2
+METRICS = [
+    'cpu_percent', 'ram_percent',
+    'disk_read_Bps', 'disk_write_Bps',
+    'net_in_Bps', 'net_out_Bps',
+    'keys_per_sec', 'idle_time_sec',
+    'max_gpu', 'gpu_RC6_pct', 'gpu_RCS_pct', 'gpu_VCS_pct', 'gpu_Power_W_pkg',
+]
+KEY_COLS = ['app_id', 'label']
+STATS = ['count', 'sum', 'sumsq', 'min', 'max']
+QUANTILES = [0.5, 0.9, 0.99]
+
+
+def state_path(csv_path):
+    return Path(csv_path).with_suffix('.rollups.npz')
+
+
+class Rollups:
+    """
+    tables[granularity][(bucket, app_id, label)] = (stats, sketches) where
+    stats is a (len(metrics), 5) array of STATS and sketches a list of
+    KLLSketch, one per metric (None outside SKETCHED granularities).
+    """
+
+    def __init__(self, csv_path, metrics=METRICS):
+        self.csv_path = str(csv_path)
+        self.metrics = list(metrics)
+        self.offset = 0
+        self.header = None
+        self.tables = {g: {} for g in GRANULARITIES}
+
+    # =========================
+    # PERSISTENCE
+    # =========================
+    @classmethod
+    def load(cls, csv_path, metrics=METRICS):
+        """Saved state for `csv_path`, or an empty one (rebuilt by update()) if missing or unreadable."""
+        path = state_path(csv_path)
+        if not path.exists():
+            return cls(csv_path, metrics)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data['version']) != FORMAT_VERSION or list(data['metrics']) != list(metrics):
+                    return cls(csv_path, metrics)
+                state = cls(csv_path, metrics)
+                state.offset = int(data['offset'])
+                state.header = data['header'].tobytes()
+                for g in GRANULARITIES:
+                    state.tables[g] = state._unpack_table(data, g)
+            return state
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile) as e:
+            print(f"Rollups: ignoring unreadable {path} ({e}); rebuilding.")
+            return cls(csv_path, metrics)
+
+    def _unpack_table(self, data, g):
+        buckets, apps, labels, stats = (data[f'{g}_{name}'] for name in ('bucket', 'app_id', 'label', 'stats'))
+        n_metrics = len(self.metrics)
+        if g in SKETCHED:
+            sketches = unpack_sketches({name[len(g) + 4:]: data[name] for name in data.files
+                                        if name.startswith(f'{g}_sk_')})
+        else:
+            sketches = None
+        table = {}
+        for i, key in enumerate(zip(buckets.tolist(), apps.tolist(), labels.tolist())):
+            table[key] = (stats[i].copy(),
+                          None if sketches is None else sketches[i * n_metrics:(i + 1) * n_metrics])
+        return table
+
+    def save(self):
+        arrays = {
+            'version': np.array(FORMAT_VERSION),
+            'metrics': np.array(self.metrics),
+            'offset': np.array(self.offset, dtype=np.int64),
+            'header': np.frombuffer(self.header or b'', dtype=np.uint8),
+        }
+        n_metrics = len(self.metrics)
+        for g, table in self.tables.items():
+            keys = list(table)
+            arrays[f'{g}_bucket'] = np.array([k[0] for k in keys], dtype=np.int64)
+            arrays[f'{g}_app_id'] = np.array([k[1] for k in keys], dtype=str)
+            arrays[f'{g}_label'] = np.array([k[2] for k in keys], dtype=str)
+            arrays[f'{g}_stats'] = (np.stack([table[k][0] for k in keys]) if keys
+                                    else np.empty((0, n_metrics, len(STATS))))
+            if g in SKETCHED:
+                packed = pack_sketches([sk for k in keys for sk in table[k][1]])
+                arrays.update({f'{g}_sk_{name}': a for name, a in packed.items()})
+
+        path = state_path(self.csv_path)
+        tmp = path.with_suffix(f'.tmp-{os.getpid()}')
+        with open(tmp, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+
+    # =========================
+    # INCREMENTAL UPDATE
+    # =========================
+    def _read_new_rows(self):
+        length = _complete_length(self.csv_path)
+        with open(self.csv_path, 'rb') as f:
+            header = f.readline()
+            if header != self.header or length < self.offset:
+                # New or rewritten log: start over
+                self.offset = len(header)
+                self.header = header
+                self.tables = {g: {} for g in GRANULARITIES}
+            f.seek(self.offset)
+            data = f.read(length - self.offset)
+        self.offset += len(data)
+        if not data:
+            return None
+
+        cols = ['timestamp', *KEY_COLS, *self.metrics]
+        df = pd.read_csv(io.BytesIO(header + data), usecols=lambda c: c in cols)
+        for col in self.metrics:
+            if col not in df.columns:
+                df[col] = np.nan
+        if is_encoded(self.csv_path):
+            strings = load_strings(self.csv_path)
+            for col in ENCODED_COLS:
+                if col in KEY_COLS:
+                    df[col] = strings[df[col].to_numpy(dtype=np.int64)]
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        for col in KEY_COLS:
+            df[col] = df[col].fillna('none').astype(str)
+        return df
+
+    def update(self):
+        """Fold rows appended since the last call into every table; returns rows added."""
+        df = self._read_new_rows()
+        if df is None or df.empty:
+            return 0
+
+        values = df[self.metrics].to_numpy(dtype=np.float64)
+        finite = ~np.isnan(values)
+        zeroed = np.where(finite, values, 0.0)
+        for granularity, freq in GRANULARITIES.items():
+            bucket = df['timestamp'].dt.floor(freq).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+            keys = pd.DataFrame({'bucket': bucket, 'app_id': df['app_id'], 'label': df['label']})
+            groups = keys.groupby(['bucket', *KEY_COLS], sort=False).indices
+
+            table = self.tables[granularity]
+            for key, rows in groups.items():
+                v = values[rows]
+                stats = np.column_stack([
+                    finite[rows].sum(axis=0),
+                    zeroed[rows].sum(axis=0),
+                    (zeroed[rows] ** 2).sum(axis=0),
+                    np.where(finite[rows], v, np.inf).min(axis=0),
+                    np.where(finite[rows], v, -np.inf).max(axis=0),
+                ])
+                entry = table.get(key)
+                if entry is None:
+                    entry = table[key] = (np.array([[0, 0, 0, np.inf, -np.inf]] * len(self.metrics)),
+                                          [KLLSketch() for _ in self.metrics] if granularity in SKETCHED
+                                          else None)
+                acc, sketches = entry
+                acc[:, :3] += stats[:, :3]
+                acc[:, 3] = np.minimum(acc[:, 3], stats[:, 3])
+                acc[:, 4] = np.maximum(acc[:, 4], stats[:, 4])
+                for j, sketch in enumerate(sketches or ()):
+                    sketch.update(v[:, j])
+        return len(df)
+
+    # =========================
+    # QUERIES
+    # =========================
+    def _groups(self, j, granularity, by, lo, hi):
+        """key -> [stats, sketches] for metric j, re-grouped by `by`."""
+        groups = {}
+        for (bucket, app_id, label), (acc, sketches) in self.tables[granularity].items():
+            if not lo <= bucket < hi:
+                continue
+            fields = {'bucket': bucket, 'app_id': app_id, 'label': label,
+                      'hour': pd.Timestamp(bucket).hour}
+            key = tuple(fields[b] for b in by)
+            group = groups.setdefault(key, [np.array([0, 0, 0, np.inf, -np.inf]), []])
+            group[0][:3] += acc[j, :3]
+            group[0][3] = min(group[0][3], acc[j, 3])
+            group[0][4] = max(group[0][4], acc[j, 4])
+            if sketches is not None:
+                group[1].append(sketches[j])
+        return groups
+
+    def query(self, metric, granularity='1h', by=('label',), start=None, end=None, quantiles=QUANTILES):
+        """
+        Summary of `metric` regrouped by any of 'bucket', 'app_id', 'label',
+        'hour' (hour of day), over buckets in [start, end). For 1 min
+        granularity the quantiles are those of the enclosing 15 min buckets.
+        """
+        j = self.metrics.index(metric)
+        by = list(by)
+        lo = -np.inf if start is None else pd.Timestamp(start).value
+        hi = np.inf if end is None else pd.Timestamp(end).value
+        groups = self._groups(j, granularity, by, lo, hi)
+
+        sketch_groups = None
+        if granularity not in SKETCHED and quantiles:
+            coarse = SKETCHED[0]
+            step = pd.Timedelta(GRANULARITIES[coarse]).value
+            coarse_lo = lo if lo == -np.inf else lo - lo % step
+            sketch_groups = self._groups(j, coarse, by, coarse_lo, hi)
+
+        rows = []
+        for key, (acc, sketches) in groups.items():
+            count, total, sumsq, lo_v, hi_v = acc
+            if count == 0:
+                continue
+            mean = total / count
+            var = (sumsq - count * mean ** 2) / (count - 1) if count > 1 else 0.0
+            row = dict(zip(by, key))
+            if 'bucket' in row:
+                row['bucket'] = pd.Timestamp(row['bucket'])
+            row.update({'count': int(count), 'mean': mean, 'std': np.sqrt(max(var, 0.0)),
+                        'min': lo_v, 'max': hi_v})
+            if sketch_groups is not None:
+                coarse_key = tuple(pd.Timestamp(v).floor(GRANULARITIES[SKETCHED[0]]).value if b == 'bucket' else v
+                                   for b, v in zip(by, key))
+                sketches = sketch_groups.get(coarse_key, [None, []])[1]
+            if quantiles:
+                merged = KLLSketch.merged(sketches)
+                for q, value in zip(quantiles, np.atleast_1d(merged.quantile(list(quantiles)))):
+                    row[f'p{round(q * 100):g}'] = value
+            rows.append(row)
+        return pd.DataFrame(rows).sort_values(by).reset_index(drop=True) if rows else pd.DataFrame()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental 1 min / 15 min / 1 h rollups of the activity log")
+    parser.add_argument('csv', nargs='?', default=LOG_PATH)
+    parser.add_argument('--follow', type=float, metavar='SECONDS',
+                        help="Keep updating every SECONDS as the logger appends rows")
+    parser.add_argument('--query', metavar='METRIC', help="Print a summary of METRIC from the rollups")
+    parser.add_argument('--granularity', choices=list(GRANULARITIES), default='1h')
+    parser.add_argument('--by', nargs='+', default=['label'], choices=['bucket', 'app_id', 'label', 'hour'])
+    args = parser.parse_args()
+
+    if not os.path.exists(args.csv):
+        print(f"Error: {args.csv} not found.")
+        sys.exit(1)
+
+    rollups = Rollups.load(args.csv)
+    t0 = time.perf_counter()
+    added = rollups.update()
+    rollups.save()
+    print(f"Rollups: +{added} rows in {time.perf_counter() - t0:.2f}s "
+          f"({', '.join(f'{g}: {len(t)}' for g, t in rollups.tables.items())} rows)")
+
+    if args.query:
+        t0 = time.perf_counter()
+        result = rollups.query(args.query, args.granularity, args.by)
+        print(f"\n{args.query} by {', '.join(args.by)} ({args.granularity} rollups, "
+              f"{(time.perf_counter() - t0) * 1000:.1f} ms)")
+        print(result.to_string(index=False))
+
+    while args.follow:
+        time.sleep(args.follow)
+        added = rollups.update()
+        if added:
+            rollups.save()
+            print(f"Rollups: +{added} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""
+Sequence decoding of the classifier's output with a hidden Markov model.
+
+The classifier labels every row on its own. Activities last minutes, so the
+most likely *sequence* of states given all rows' predict_proba output is a
+better answer than the per-row argmax. Transition probabilities are
+counted from a labelled log. The per-row probabilities, divided by the
+class priors, serve as emission likelihoods. Viterbi then finds the best
+path in log space.
+
+    python sequence_decoder.py fit [labelled.csv]            # -> hmm_transitions.json
+    python sequence_decoder.py rescore log.csv [--out decoded.csv] [--backend flat]
+
+Offline, viterbi() decodes many sequences in one pass (one loop over time,
+vectorised over sequences and states): rescore decodes every day of a log
+together, restarting the chain wherever the logger paused.
+
+Online, FixedLagDecoder commits the state of the row `lag` rows back. The
+rows after it can still change that decision, so a short flicker costs
+nothing, and the output trails the input by `lag` rows.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+TRANSITIONS_PATH = 'hmm_transitions.json'
+LABELLED_LOG = 'comprehensive_activity_log_with_Idle.csv'
+PSEUDOCOUNT = 1.0                # added to every transition count
+PROB_FLOOR = 1e-3                # forest probabilities are often exactly 0
+GAP_SECONDS = 5.0                # a longer pause in the log starts a new sequence
+FIXED_LAG = 5                    # rows of look-ahead for online decoding
+
+
+def split_points(timestamps, gap_seconds=GAP_SECONDS):
+    """(day_starts, gap_starts): row indices where a new day, or a run after a logger gap, begins."""
+    ts = np.asarray(timestamps, dtype='datetime64[ns]')
+    if len(ts) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    new_day = ts[1:].astype('datetime64[D]') != ts[:-1].astype('datetime64[D]')
+    gap = (ts[1:] - ts[:-1]) > np.timedelta64(int(gap_seconds * 1e9), 'ns')
+    return (np.concatenate([[0], np.flatnonzero(new_day) + 1]),
+            np.flatnonzero(gap & ~new_day) + 1)
+
+
+# =========================
+# MODEL
+# =========================
+class SequenceModel:
+    """Log-space start, transition and prior probabilities over `classes`."""
+
+    def __init__(self, classes, log_start, log_trans, log_prior):
+        self.classes = list(classes)
+        self.log_start = np.asarray(log_start, dtype=np.float64)
+        self.log_trans = np.asarray(log_trans, dtype=np.float64)
+        self.log_prior = np.asarray(log_prior, dtype=np.float64)
+
+    @classmethod
+    def fit(cls, labels, starts=(0,), pseudocount=PSEUDOCOUNT):
+        """Count transitions between consecutive labels, never across a sequence start."""
+        labels = np.asarray(labels)
+        classes, codes = np.unique(labels, return_inverse=True)
+        k = len(classes)
+        keep = np.ones(max(len(codes) - 1, 0), dtype=bool)
+        first = np.asarray(starts, dtype=np.int64)
+        keep[first[first > 0] - 1] = False
+        counts = np.full((k, k), pseudocount)
+        np.add.at(counts, (codes[:-1][keep], codes[1:][keep]), 1)
+        start = np.bincount(codes[first], minlength=k) + pseudocount
+        prior = np.bincount(codes, minlength=k) + pseudocount
+        return cls(classes,
+                   np.log(start / start.sum()),
+                   np.log(counts / counts.sum(axis=1, keepdims=True)),
+                   np.log(prior / prior.sum()))
+
+    def save(self, path=TRANSITIONS_PATH):
+        with open(path, 'w') as f:
+            json.dump({'classes': [str(c) for c in self.classes],
+                       'start': np.exp(self.log_start).tolist(),
+                       'transitions': np.exp(self.log_trans).tolist(),
+                       'prior': np.exp(self.log_prior).tolist()}, f, indent=2)
+
+    @classmethod
+    def load(cls, path=TRANSITIONS_PATH):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data['classes'], np.log(data['start']), np.log(data['transitions']), np.log(data['prior']))
+
+    def emissions(self, probs, prob_classes):
+        """
+        (rows, len(self.classes)) log emission scores from predict_proba
+        output whose columns are `prob_classes`: log(p(state | row) / p(state)).
+        Classes the classifier does not know get PROB_FLOOR.
+        """
+        probs = np.atleast_2d(np.asarray(probs, dtype=np.float64))
+        column = {str(c): i for i, c in enumerate(prob_classes)}
+        out = np.full((len(probs), len(self.classes)), PROB_FLOOR)
+        for j, name in enumerate(self.classes):
+            i = column.get(str(name))
+            if i is not None:
+                out[:, j] = np.maximum(probs[:, i], PROB_FLOOR)
+        return np.log(out) - self.log_prior
+
+    def describe(self):
+        width = max(len(str(c)) for c in self.classes)
+        lines = [' ' * width + ' ' + ' '.join(f"{str(c)[:10]:>10}" for c in self.classes)]
+        for name, row in zip(self.classes, np.exp(self.log_trans)):
+            lines.append(f"{str(name):<{width}} " + ' '.join(f"{p:>10.5f}" for p in row))
+        return '\n'.join(lines)
+
+
+# =========================
+# OFFLINE DECODING
+# =========================
+def viterbi(log_emit, log_trans, log_start, lengths=None, resets=None):
+    """
+    Most likely state paths. `log_emit` is (rows, K) for one sequence or
+    (sequences, rows, K) for several padded ones, with `lengths` giving each
+    sequence's real length. `resets` (same leading shape, bool) marks rows
+    that start afresh from `log_start`, independent of the row before.
+    Returns int state indices of the same leading shape.
+    """
+    single = log_emit.ndim == 2
+    if single:
+        log_emit = log_emit[np.newaxis]
+        resets = None if resets is None else resets[np.newaxis]
+    n_seq, n_rows, k = log_emit.shape
+    lengths = np.full(n_seq, n_rows) if lengths is None else np.asarray(lengths)
+    back = np.empty((n_seq, n_rows, k), dtype=np.int8 if k < 128 else np.int32)
+    score = log_start + log_emit[:, 0]
+    final = score.copy()  # each sequence's scores at its own last row
+    for t in range(1, n_rows):
+        # (seq, from, to): best predecessor of every state, for every sequence at once
+        trans = log_trans
+        if resets is not None and resets[:, t].any():
+            # After a reset any state follows the best one before it
+            trans = np.where(resets[:, t, np.newaxis, np.newaxis], log_start, log_trans)
+        cand = score[:, :, np.newaxis] + trans
+        back[:, t] = cand.argmax(axis=1)
+        score = cand.max(axis=1) + log_emit[:, t]
+        score -= score.max(axis=1, keepdims=True)
+        ended = lengths == t + 1
+        final[ended] = score[ended]
+
+    paths = np.zeros((n_seq, n_rows), dtype=np.int64)
+    best = final.argmax(axis=1)
+    state = best.copy()
+    seq = np.arange(n_seq)
+    for t in range(n_rows - 1, -1, -1):
+        # A sequence's backtrack starts at its own last row
+        state = np.where(lengths == t + 1, best, state)
+        live = lengths > t
+        paths[live, t] = state[live]
+        if t > 0:
+            state = np.where(live, back[seq, t, state], state)
+    return paths[0] if single else paths
+
+
+def decode_days(log_emit, timestamps, model):
+    """
+    State indices for a whole log: (rows, K) `log_emit` in time order. All
+    days are decoded in one viterbi() pass, padded to the longest day, and
+    each logger gap restarts the chain.
+    """
+    day_starts, gap_starts = split_points(timestamps)
+    bounds = np.append(day_starts, len(log_emit))
+    lengths = np.diff(bounds)
+    batch = np.zeros((len(lengths), lengths.max(), log_emit.shape[1]))
+    resets = np.zeros(batch.shape[:2], dtype=bool)
+    day = np.searchsorted(day_starts, gap_starts, side='right') - 1
+    resets[day, gap_starts - day_starts[day]] = True
+    for i, (a, b) in enumerate(zip(bounds[:-1], bounds[1:])):
+        batch[i, :b - a] = log_emit[a:b]
+    paths = viterbi(batch, model.log_trans, model.log_start, lengths, resets)
+    return np.concatenate([paths[i, :n] for i, n in enumerate(lengths)])
+
+
+# =========================
+# ONLINE DECODING
+# =========================
+class FixedLagDecoder:
+    """
+    Viterbi over a stream, committing the state `lag` rows back:
+
+        decoder = FixedLagDecoder(SequenceModel.load(), lag=5)
+        state, changed = decoder.update(probs_row, classifier.classes_)
+        decoder.confidence, decoder.raw, decoder.delay   # about the row `state` is for
+
+    Keeps only the running scores and the last `lag` back-pointers and rows.
+    Counts raw flips (per-row argmax changes) and suppressed ones like
+    VoteSmoother.
+    """
+
+    def __init__(self, model, lag=FIXED_LAG):
+        from collections import deque
+
+        self.model = model
+        self.lag = lag
+        self.score = None
+        self.back = deque(maxlen=lag) if lag > 0 else None
+        # (argmax label, {class: probability}) of the rows the state can still refer to
+        self.rows = deque(maxlen=lag + 1)
+        self.state = None
+        self.raw = None                  # argmax label of the committed row
+        self.confidence = np.nan         # classifier probability of the state on that row
+        self.delay = 0                   # rows between the committed row and the newest
+        self.last_raw = None
+        self.raw_flips = 0
+        self.flips = 0
+
+    def update(self, probs, prob_classes):
+        """Add one row of class probabilities (columns `prob_classes`); returns (state, changed)."""
+        raw = prob_classes[int(np.argmax(probs))]
+        if self.last_raw is not None and raw != self.last_raw:
+            self.raw_flips += 1
+        self.last_raw = raw
+        self.rows.append((raw, {str(c): float(p) for c, p in zip(prob_classes, probs)}))
+
+        emit = self.model.emissions(probs, prob_classes)[0]
+        if self.score is None:
+            self.score = self.model.log_start + emit
+        else:
+            cand = self.score[:, np.newaxis] + self.model.log_trans
+            if self.back is not None:
+                self.back.append(cand.argmax(axis=0))
+            # Renormalise so the scores never drift towards -inf
+            score = cand.max(axis=0) + emit
+            self.score = score - score.max()
+
+        # Best current state, traced back `lag` rows
+        state = int(self.score.argmax())
+        for pointers in reversed(self.back or ()):
+            state = pointers[state]
+        label = self.model.classes[state]
+        # Traced back len(self.back) rows: that is the oldest row kept
+        self.raw, committed = self.rows[0]
+        self.confidence = committed.get(str(label), 0.0)
+        self.delay = len(self.rows) - 1
+        if self.state is None:
+            self.state = label
+            return label, True
+        if label != self.state:
+            self.state = label
+            self.flips += 1
+            return label, True
+        return label, False
+
+    @property
+    def suppressed(self):
+        return max(self.raw_flips - self.flips, 0)
+
+    def summary(self):
+        return (f"{self.raw_flips} raw flips, {self.flips} state changes, "
+                f"{self.suppressed} suppressed (HMM, lag {self.lag})")
+
+
+# =========================
+# CLI
+# =========================
+def load_labelled_log(csv_path):
+    """Time-ordered log with its label column, joined from label_segments.csv when the rows carry none."""
+    import pandas as pd
+
+    df = pd.read_csv(csv_path)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df = df.sort_values('timestamp', kind='stable').reset_index(drop=True)
+    if 'label' not in df.columns:
+        from label_index import SEGMENTS_PATH, LabelIndex
+        if SEGMENTS_PATH.exists():
+            df = LabelIndex.load().attach(df)
+    return df
+
+
+def fit_command(args):
+    df = load_labelled_log(args.csv)
+    if 'label' not in df.columns:
+        print(f"Error: {args.csv} has no labels (and there is no label_segments.csv).")
+        sys.exit(1)
+    df = df[df['label'] != 'none']
+    starts = np.sort(np.concatenate(split_points(df['timestamp'])))
+    model = SequenceModel.fit(df['label'].to_numpy(), starts)
+    model.save(args.out)
+    print(f"Learned transitions from {len(df)} rows in {len(starts)} sequences -> {args.out}")
+    print(model.describe())
+
+
+def rescore_command(args):
+    import pandas as pd
+    from activity_features import NUMERIC_COLS, WINDOWS, rolling_features
+    from inference_backends import load_backend
+
+    try:
+        hmm = SequenceModel.load(args.transitions)
+    except FileNotFoundError:
+        print(f"Error: {args.transitions} not found. Run 'sequence_decoder.py fit' first.")
+        sys.exit(1)
+    classifier = load_backend(args.backend, args.model)
+    df = load_labelled_log(args.csv)
+    X = rolling_features(df, NUMERIC_COLS, WINDOWS).fillna(0)
+    raw, probs = classifier.predict(X[classifier.feature_names_in_].to_numpy())
+
+    log_emit = hmm.emissions(probs, classifier.classes_)
+    decoded = np.asarray(hmm.classes)[decode_days(log_emit, df['timestamp'], hmm)]
+
+    out = pd.DataFrame({'timestamp': df['timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%S'),
+                        'predicted': raw, 'decoded': decoded})
+    raw_flips = int((raw[1:] != raw[:-1]).sum())
+    flips = int((decoded[1:] != decoded[:-1]).sum())
+    print(f"{len(df)} rows: {raw_flips} raw flips, {flips} after decoding")
+    if 'label' in df.columns:
+        labelled = (df['label'] != 'none').to_numpy()
+        out['label'] = df['label']
+        if labelled.any():
+            truth = df['label'].to_numpy()[labelled]
+            print(f"Accuracy on {labelled.sum()} labelled rows: per-row {(raw[labelled] == truth).mean():.4f}, "
+                  f"decoded {(decoded[labelled] == truth).mean():.4f}")
+    path = args.out or str(Path(args.csv).with_name(Path(args.csv).stem + '_decoded.csv'))
+    out.to_csv(path, index=False)
+    print(f"Wrote {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HMM sequence decoding of activity predictions")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('fit', help="Learn transition probabilities from a labelled log")
+    p.add_argument('csv', nargs='?', default=LABELLED_LOG)
+    p.add_argument('--out', default=TRANSITIONS_PATH)
+    p = sub.add_parser('rescore', help="Decode a whole log offline")
+    p.add_argument('csv')
+    p.add_argument('--out', default=None, help="Output CSV (default: <log>_decoded.csv)")
+    p.add_argument('--transitions', default=TRANSITIONS_PATH)
+    p.add_argument('--backend', default='flat')
+    p.add_argument('--model', default=None)
+    args = parser.parse_args()
+
+    if args.command == 'fit':
+        fit_command(args)
+    else:
+        rescore_command(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Post-processing for live predictions: temporal smoothing of the predicted
+state, and desktop notifications that never block the inference loop.
+
+    smoother = VoteSmoother(k=3, n=5)
+    notifier = Notifier()
+    notifier.start()
+    ...
+    state, changed = smoother.update(prediction)
+    if changed:
+        notifier.post("System State Change", f"Detected: {state}")
+
+VoteSmoother is k-of-n voting with hysteresis: the reported state only moves
+to another label once that label holds at least k of the last n raw
+predictions, so a classifier flickering between two labels keeps the state
+it already had. The cost is up to k rows of delay on a real change.
+
+Notifier runs notify-send on its own thread. post() only stores the event:
+if the previous one has not been shown yet it is replaced (coalesced), and
+at most one notification goes out per MIN_INTERVAL seconds.
+
+Standard library only.
+"""
+import subprocess
+import threading
+import time
+from collections import Counter, deque
+
+VOTE_K = 3                       # votes a new label needs ...
+VOTE_N = 5                       # ... among the last N raw predictions
+NOTIFY_CMD = ["notify-send", "-t", "2000"]
+MIN_INTERVAL = 2.0               # seconds between two notifications
+NOTIFY_TIMEOUT = 5.0             # give up on a notify-send that hangs
+
+
+# =========================
+# SMOOTHING
+# =========================
+class VoteSmoother:
+    """
+    k-of-n vote with hysteresis over a stream of labels. With k > n / 2 at
+    most one label can win a vote, so the state cannot oscillate.
+    """
+
+    def __init__(self, k=VOTE_K, n=VOTE_N):
+        if not 1 <= k <= n:
+            raise ValueError(f"need 1 <= k <= n, got k={k}, n={n}")
+        self.k = k
+        self.votes = deque(maxlen=n)
+        self.counts = Counter()
+        self.state = None
+        self.last_raw = None
+        self.raw_flips = 0
+        self.flips = 0
+
+    def update(self, label):
+        """Add one raw prediction; returns (state, changed)."""
+        if len(self.votes) == self.votes.maxlen:
+            self.counts[self.votes[0]] -= 1
+        self.votes.append(label)
+        self.counts[label] += 1
+
+        if self.last_raw is not None and label != self.last_raw:
+            self.raw_flips += 1
+        self.last_raw = label
+
+        if self.state is None:
+            # Nothing to hold on to yet: start from the first prediction
+            self.state = label
+            return label, True
+        if label != self.state and self.counts[label] >= self.k:
+            self.state = label
+            self.flips += 1
+            return label, True
+        return self.state, False
+
+    @property
+    def suppressed(self):
+        """Raw label changes that did not change the reported state."""
+        return max(self.raw_flips - self.flips, 0)
+
+    def summary(self):
+        return (f"{self.raw_flips} raw flips, {self.flips} state changes, "
+                f"{self.suppressed} suppressed ({self.k}-of-{self.votes.maxlen} vote)")
+
+
+def smooth_labels(labels, k=VOTE_K, n=VOTE_N):
+    """VoteSmoother over a whole sequence (offline); returns (states, smoother)."""
+    smoother = VoteSmoother(k, n)
+    return [smoother.update(label)[0] for label in labels], smoother
+
+
+# =========================
+# NOTIFICATIONS
+# =========================
+class Notifier(threading.Thread):
+    """
+    Background notify-send dispatcher. post() returns immediately; events
+    posted faster than they can be shown collapse into the newest one.
+    """
+
+    def __init__(self, cmd=NOTIFY_CMD, min_interval=MIN_INTERVAL):
+        super().__init__(daemon=True)
+        self.cmd = list(cmd)
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.pending = None
+        self.disabled = False
+        self.posted = self.sent = self.coalesced = self.failed = 0
+
+    def post(self, title, body=""):
+        with self.lock:
+            self.posted += 1
+            if self.pending is not None:
+                self.coalesced += 1
+            self.pending = (title, body)
+        self.wake.set()
+
+    def _take(self):
+        with self.lock:
+            event, self.pending = self.pending, None
+            self.wake.clear()
+        return event
+
+    def run(self):
+        last_sent = -self.min_interval
+        while True:
+            self.wake.wait()
+            # Rate limit: anything posted while we wait replaces the pending event
+            delay = last_sent + self.min_interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            event = self._take()
+            if event is None or self.disabled:
+                continue
+            last_sent = time.monotonic()
+            try:
+                subprocess.run(self.cmd + list(event), stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL, timeout=NOTIFY_TIMEOUT)
+                self.sent += 1
+            except FileNotFoundError:
+                print(f"Warning: {self.cmd[0]} not found, desktop notifications disabled.")
+                self.disabled = True
+                self.failed += 1
+            except subprocess.TimeoutExpired:
+                self.failed += 1
+
+    def summary(self):
+        return (f"{self.posted} notifications posted, {self.sent} shown, "
+                f"{self.coalesced} coalesced, {self.failed} failed")
@@ -0,0 +1,117 @@
+"""
+Dictionary encoding for the text columns of the activity log.
+
+The logger writes a small integer id into `app_id` and `window_title`
+instead of the (often 80+ character, emoji-laden) text, and appends each new
+string once to a sidecar next to the log:
+
+    comprehensive_activity_log.csv           ..., app_id, window_title, ...
+                                             ..., 3,      17,           ...
+    comprehensive_activity_log.strings.csv   id,text
+                                             3,org.gnome.Nautilus
+                                             17,final_recording_script
+
+A log is either fully encoded (sidecar exists) or fully plain (older logs),
+never mixed. read_log() handles both, and joins the dictionary only when an
+encoded column is actually loaded, as a Categorical (codes + one copy of
+each string).
+
+Only the standard library is imported at module level (the logger imports
+this at login).
+"""
+import csv
+from pathlib import Path
+
+ENCODED_COLS = ['app_id', 'window_title']
+SUFFIX = '.strings.csv'
+
+
+def dict_path(csv_path):
+    """Sidecar dictionary path for a log: foo.csv -> foo.strings.csv."""
+    return Path(csv_path).with_suffix(SUFFIX)
+
+
+def is_encoded(csv_path):
+    return dict_path(csv_path).exists()
+
+
+class StringDictionary:
+    """Append-only text -> id mapping, persisted as it grows."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.ids = {}
+        if self.path.exists():
+            with open(self.path, newline='') as f:
+                for row in csv.DictReader(f):
+                    self.ids[row['text']] = int(row['id'])
+        new = not self.path.exists()
+        self.file = open(self.path, 'a', newline='')
+        self.writer = csv.writer(self.file)
+        if new:
+            self.writer.writerow(['id', 'text'])
+            self.file.flush()
+
+    def encode(self, text):
+        """Id for `text`; a new entry is written (and flushed) before it is returned."""
+        key = self.ids.get(text)
+        if key is None:
+            key = len(self.ids)
+            self.writer.writerow([key, text])
+            self.file.flush()
+            self.ids[text] = key
+        return key
+
+    def close(self):
+        self.file.close()
+
+
+def load_strings(csv_path):
+    """All dictionary strings of an encoded log, indexed by id (object array)."""
+    import numpy as np
+    import pandas as pd
+    table = pd.read_csv(dict_path(csv_path), dtype={'id': np.int64, 'text': object},
+                        keep_default_na=False)
+    strings = np.empty(table['id'].max() + 1 if len(table) else 0, dtype=object)
+    strings[table['id'].to_numpy()] = table['text'].to_numpy()
+    return strings
+
+
+def read_log(csv_path, **kwargs):
+    """
+    pd.read_csv for activity logs, plain or encoded. Encoded text columns
+    come back as Categoricals of their strings; the dictionary is only read
+    if one of them is among the loaded columns.
+    """
+    import numpy as np
+    import pandas as pd
+
+    df = pd.read_csv(csv_path, **kwargs)
+    cols = [c for c in ENCODED_COLS if c in df.columns]
+    if not cols or not is_encoded(csv_path):
+        return df
+
+    strings = load_strings(csv_path)
+    for col in cols:
+        codes = df[col].to_numpy(dtype=np.int64)
+        used, local = np.unique(codes, return_inverse=True)
+        values = pd.Categorical.from_codes(local.astype(np.int32), categories=pd.Index(strings[used], dtype=object))
+        # Empty text is a missing value, as pd.read_csv reads it from a plain log
+        df[col] = values.remove_categories(['']) if '' in values.categories else values
+    return df
+
+
+def encode_log(src, dst):
+    """Write an encoded copy of the plain log `src` to `dst` (plus its dictionary)."""
+    import numpy as np
+    import pandas as pd
+
+    df = pd.read_csv(src, dtype=str, keep_default_na=False)
+    strings = StringDictionary(dict_path(dst))
+    for col in ENCODED_COLS:
+        if col in df.columns:
+            codes, uniques = pd.factorize(df[col])
+            ids = np.array([strings.encode(text) for text in uniques], dtype=np.int64)
+            df[col] = ids[codes]
+    strings.close()
+    df.to_csv(dst, index=False)
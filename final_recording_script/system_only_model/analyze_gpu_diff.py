@@ -1,13 +1,15 @@
-import pandas as pd
+import sys
+from pathlib import Path
 
-# Load data
-df = pd.read_csv('comprehensive_activity_log_with_Idle.csv')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from label_sketches import from_log
 
-# Filter for relevant columns and labels
-cols = ['label', 'gpu_RC6_pct', 'gpu_RCS_pct', 'gpu_Power_W_pkg']
-df_subset = df[cols]
+# Per-label sketches (count / sum / sum² + KLL quantiles) from the log's
+# rollups instead of raw rows; only rows appended since the last run are read
+cols = ['gpu_RC6_pct', 'gpu_RCS_pct', 'gpu_Power_W_pkg']
+sketches = from_log('comprehensive_activity_log_with_Idle.csv', cols)
 
-# Group by label and calculate stats
-stats = df_subset.groupby('label').agg(['mean', 'median', 'std', 'count'])
+# Group by label and calculate stats (median is approximate, from the sketch)
+stats = sketches.summary(cols)
 
 print(stats)
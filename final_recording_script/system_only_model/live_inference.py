@@ -1,10 +1,18 @@
 import time
+import numpy as np
 import pandas as pd
 import joblib
 import sys
 import os
-import subprocess
 from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from metrics_bus import Subscriber
+from model_store import STORE_PATH, load_sklearn
+from state_smoothing import Notifier, VoteSmoother
+from sequence_decoder import TRANSITIONS_PATH, FixedLagDecoder, SequenceModel
 
 # Configuration
 MODEL_PATH = 'activity_model.joblib'
@@ -24,6 +32,9 @@ NUMERIC_COLS = [
 WINDOWS = [5, 30]
 
 def load_model():
+    # Prefer the memory-mapped store written by train_model.py
+    if os.path.isdir(STORE_PATH):
+        return load_sklearn(STORE_PATH)
     if not os.path.exists(MODEL_PATH):
         print(f"Error: Model file {MODEL_PATH} not found. Run train_model.py first.")
         sys.exit(1)
@@ -75,15 +86,93 @@ def calculate_features(buffer_df):
                 
     return pd.DataFrame([features])
 
+def predict_and_report(model, df_buffer, timestamp, smoother, notifier):
+    """Predict the latest row of df_buffer, smooth it, print it and queue a notification on change."""
+    # Calculate Features
+    # We only need to predict for the LATEST row
+    X_input = calculate_features(df_buffer)
+
+    # Predict
+    # Ensure column order matches training
+    # The dataframe created by calculate_features usually sorts columns or uses dict order.
+    # The model expects specific column order.
+    # We should reorder X_input to match model.feature_names_in_ if available
+    if hasattr(model, 'feature_names_in_'):
+        X_input = X_input[model.feature_names_in_]
+
+    prediction = model.predict(X_input)[0]
+    probs = model.predict_proba(X_input)[0]
+    max_prob = max(probs)
+    classes = model.classes_
+    prob_dict = {classes[i]: probs[i] for i in range(len(classes))}
+
+    # HMM decoding replaces the old "quiet => Idle" override, which
+    # mislabelled most quiet rows of the labelled log
+    if isinstance(smoother, FixedLagDecoder):
+        state, changed = smoother.update(probs, list(classes))
+        # The state is that of the row `delay` rows back, so is its confidence
+        conf = smoother.confidence
+        lag = f" [lag {smoother.delay}]" if smoother.delay else ""
+    else:
+        # k-of-n vote so a single flickering row doesn't change the state
+        state, changed = smoother.update(prediction)
+        conf, lag = max_prob, ""
+
+    # Print result (Probs are the newest row's)
+    print(f"[{timestamp}] State: {state:<20}{lag} | Probs: {prob_dict}")
+
+    # Notify on change (the notifier thread runs notify-send)
+    if changed:
+        notifier.post("System State Change", f"Detected: {state}\nConfidence: {conf:.2f}")
+
+def make_smoother():
+    """HMM fixed-lag decoder if sequence_decoder.py fit has been run, else a k-of-n vote."""
+    try:
+        return FixedLagDecoder(SequenceModel.load(TRANSITIONS_PATH))
+    except FileNotFoundError:
+        print(f"{TRANSITIONS_PATH} not found (run sequence_decoder.py fit); using a k-of-n vote.")
+        return VoteSmoother()
+
+def follow_bus(model, smoother, notifier):
+    """Predict from the logger's shared memory bus (metrics_bus.py); False if there is none."""
+    try:
+        sub = Subscriber()
+    except FileNotFoundError:
+        return False
+    print(f"Monitoring metrics bus '{sub.name}' for real-time inference...")
+    last = sub.count
+    while True:
+        last = sub.wait(last)
+        timestamps, history = sub.latest(MAX_WINDOW * 2, NUMERIC_COLS)
+        if len(history) == 0:
+            continue
+        df_buffer = pd.DataFrame(np.nan_to_num(history), columns=NUMERIC_COLS)
+        timestamp = datetime.fromtimestamp(timestamps[-1]).isoformat(timespec='seconds')
+        try:
+            predict_and_report(model, df_buffer, timestamp, smoother, notifier)
+        except Exception as e:
+            print(f"Error processing sample: {e}")
+
 def main():
     target_file = sys.argv[1] if len(sys.argv) > 1 else CSV_PATH
     print(f"Loading model from {MODEL_PATH}...")
     model = load_model()
-    
+    smoother = make_smoother()
+    notifier = Notifier()
+    notifier.start()
+
+    try:
+        # The logger's shared memory bus, when it is running, saves tailing the CSV
+        if len(sys.argv) > 1 or not follow_bus(model, smoother, notifier):
+            follow_csv(model, target_file, smoother, notifier)
+    except KeyboardInterrupt:
+        print("\nStopped.")
+    print(f"Smoothing: {smoother.summary()}")
+    print(f"Notifications: {notifier.summary()}")
+
+def follow_csv(model, target_file, smoother, notifier):
     print(f"Monitoring {target_file} for real-time inference...")
     
-    last_prediction = None
-    
     # Initialize buffer
     # We use a fixed-size buffer logic
     # First, read existing file to populate buffer
@@ -168,47 +257,8 @@ def main():
                 if len(df_buffer) > MAX_WINDOW * 2:
                     df_buffer = df_buffer.iloc[-(MAX_WINDOW * 2):]
                 
-                # Calculate Features
-                # We only need to predict for the LATEST row
-                X_input = calculate_features(df_buffer)
-                
-                # Predict
-                # Ensure column order matches training
-                # The dataframe created by calculate_features usually sorts columns or uses dict order.
-                # The model expects specific column order.
-                # We should reorder X_input to match model.feature_names_in_ if available
-                if hasattr(model, 'feature_names_in_'):
-                    X_input = X_input[model.feature_names_in_]
-                
-                prediction = model.predict(X_input)[0]
-                probs = model.predict_proba(X_input)[0]
-                max_prob = max(probs)
-                classes = model.classes_
-                prob_dict = {classes[i]: probs[i] for i in range(len(classes))}
-
-                # Heuristic Override for Idle
-                # If system is extremely quiet, force Idle.
-                # Thresholds: GPU Sleep > 99.0% AND CPU < 5% (averaged over 5s)
-                # OR if max_gpu < 1.0 (very low GPU activity)
-                rc6_mean_5s = X_input['gpu_RC6_pct_mean_5s'].values[0]
-                cpu_mean_5s = X_input['cpu_percent_mean_5s'].values[0]
-                max_gpu_raw = X_input['max_gpu'].values[0]
-
-                if prediction == 'interactive_light':
-                    if (rc6_mean_5s > 99.0 and cpu_mean_5s < 5.0) or (max_gpu_raw < 1.0):
-                        prediction = 'Idle'
-                        max_prob = 1.0 # Artificially high confidence for override
-                        prob_dict['Idle'] = 1.0 # For display
-                        prob_dict['interactive_light'] = 0.0 # Clear other
-                
-                # Print result
                 timestamp = parts[0] # Assuming timestamp is first col
-                print(f"[{timestamp}] State: {prediction:<20} | Probs: {prob_dict}")
-
-                # Notify on change
-                if prediction != last_prediction:
-                    subprocess.run(["notify-send", "-t", "2000", "System State Change", f"Detected: {prediction}\nConfidence: {max_prob:.2f}"])
-                    last_prediction = prediction
+                predict_and_report(model, df_buffer, timestamp, smoother, notifier)
                 
             except Exception as e:
                 # Don't crash on a bad line
@@ -6,15 +6,15 @@ from sklearn.model_selection import train_test_split
 import matplotlib.pyplot as plt
 import seaborn as sns
 import joblib
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from model_store import STORE_PATH, save_model
+from feature_cache import load_features
 
 # 1. Load Data
 FILE_PATH = 'comprehensive_activity_log_with_Idle.csv'
-print(f"Loading data from {FILE_PATH}...")
-df = pd.read_csv(FILE_PATH)
-
-# Sort by time just in case, though logs should be ordered
-df['timestamp'] = pd.to_datetime(df['timestamp'])
-df = df.sort_values('timestamp')
 
 # 2. Feature Selection
 # Define raw columns we care about
@@ -29,21 +29,20 @@ numeric_cols = [
 
 target_col = 'label'
 
-# 3. Feature Engineering
-print("Engineering rolling features...")
-df_features = df[numeric_cols].copy()
-
 # Add rolling window statistics
 # We use a 10-second window to capture immediate context
 # and a 60-second window to capture longer term trends
 windows = [5, 30]
 
-for col in numeric_cols:
-    for w in windows:
-        # Mean: smooths signal
-        df_features[f'{col}_mean_{w}s'] = df_features[col].rolling(window=w, min_periods=1).mean()
-        # Std: captures volatility (e.g. constant video stream vs bursty web loading)
-        df_features[f'{col}_std_{w}s'] = df_features[col].rolling(window=w, min_periods=1).std().fillna(0)
+# 3. Feature Engineering
+# Mean smooths the signal, std captures volatility (e.g. constant video stream
+# vs bursty web loading). The matrices are cached on disk per (log content,
+# feature spec), so re-running after a parameter change skips this step and
+# an appended log only computes its new rows. Rows stay in file order, which
+# is time order for logs written by the logger.
+print(f"Loading data from {FILE_PATH}...")
+df_features = load_features(FILE_PATH, numeric_cols, windows, target_col)
+df = pd.DataFrame({target_col: df_features.pop(target_col)})
 
 # Drop initial rows where rolling features might be unstable (optional, handled by min_periods=1 effectively)
 # But for cleaner training, let's drop the first max_window rows
@@ -111,4 +110,12 @@ print(feature_imp_df)
 # 8. Save Model
 print("Saving model to activity_model.joblib...")
 joblib.dump(rf, 'activity_model.joblib')
+
+# Memory-mappable copy + metadata sidecar for the inference daemons
+metadata = save_model(
+    rf, STORE_PATH,
+    training_data_path=FILE_PATH,
+    feature_spec={'numeric_cols': numeric_cols, 'windows': windows},
+)
+print(f"Saved model store {STORE_PATH} (version {metadata['model_hash'][:12]})")
 print("Done.")
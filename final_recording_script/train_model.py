@@ -1,26 +1,26 @@
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report, confusion_matrix
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.metrics import classification_report, confusion_matrix, f1_score
+import argparse
 import joblib
+import os
+import pickle
 import sys
+import time
 
-# 1. Load Data
-FILE_PATH = 'comprehensive_activity_log_with_Idle.csv'
-print(f"Loading data from {FILE_PATH}...")
-try:
-    df = pd.read_csv(FILE_PATH)
-except FileNotFoundError:
-    print(f"Error: {FILE_PATH} not found.")
-    sys.exit(1)
+from activity_features import feature_names, iter_feature_chunks, rolling_features
+from feature_cache import load_features
+from fleet_store import STORE_DIR, fleet_features
+from model_store import STORE_PATH, save_model
 
-# Sort by time
-df['timestamp'] = pd.to_datetime(df['timestamp'])
-df = df.sort_values('timestamp')
+# 1. Data / output
+FILE_PATH = 'comprehensive_activity_log_with_Idle.csv'
+MODEL_PATH = 'activity_model.joblib'
 
 # 2. Feature Selection
 numeric_cols = [
-    'cpu_percent', 'ram_percent', 
+    'cpu_percent', 'ram_percent',
     'disk_read_Bps', 'disk_write_Bps',
     'net_in_Bps', 'net_out_Bps',
     'idle_time_sec',
@@ -30,46 +30,314 @@ numeric_cols = [
 
 target_col = 'label'
 
-# 3. Feature Engineering
-print("Engineering rolling features...")
-df_features = df[numeric_cols].copy()
-
 windows = [5, 30]
 
-for col in numeric_cols:
-    for w in windows:
-        df_features[f'{col}_mean_{w}s'] = df_features[col].rolling(window=w, min_periods=1).mean()
-        df_features[f'{col}_std_{w}s'] = df_features[col].rolling(window=w, min_periods=1).std().fillna(0)
-
-# Drop initial rows for training stability
-df_features = df_features.iloc[max(windows):]
-y = df.iloc[max(windows):][target_col]
-df_features = df_features.fillna(0)
-
-# 4. Train/Test Split
-split_idx = int(len(df_features) * 0.8)
-X_train = df_features.iloc[:split_idx]
-y_train = y.iloc[:split_idx]
-X_test = df_features.iloc[split_idx:]
-y_test = y.iloc[split_idx:]
-
-# 5. Model Training
-print("Training Random Forest Classifier...")
-rf = RandomForestClassifier(
-    n_estimators=100,
-    max_depth=15,
-    class_weight='balanced',
-    random_state=42,
-    n_jobs=-1
-)
-rf.fit(X_train, y_train)
-
-# 6. Evaluation
-print("Evaluating model...")
-y_pred = rf.predict(X_test)
-print(classification_report(y_test, y_pred))
-
-# 7. Save Model
-print("Saving model to activity_model.joblib...")
-joblib.dump(rf, 'activity_model.joblib')
-print("Done.")
+TEST_FRACTION = 0.2
+
+
+def build_forest():
+    return RandomForestClassifier(
+        n_estimators=100,
+        max_depth=15,
+        class_weight='balanced',
+        random_state=42,
+        n_jobs=-1
+    )
+
+
+def build_hgb():
+    # Features are quantised once into <=255 bins and stored as uint8, so the
+    # fit works on a matrix 1/8 the size of the float64 one.
+    return HistGradientBoostingClassifier(
+        max_iter=200,
+        learning_rate=0.1,
+        max_bins=255,
+        class_weight='balanced',
+        early_stopping=False,
+        random_state=42,
+    )
+
+
+ENGINES = {
+    'rf': ('Random Forest Classifier', build_forest),
+    'hgb': ('Histogram Gradient Boosting Classifier', build_hgb),
+}
+
+
+def build_model(engine='rf'):
+    return ENGINES[engine][1]()
+
+
+def load_split(file_path, use_cache=True, fleet_days=None):
+    if fleet_days is not None:
+        return fleet_split(fleet_days)
+
+    # 1. Load Data
+    print(f"Loading data from {file_path}...")
+    if not os.path.exists(file_path):
+        print(f"Error: {file_path} not found.")
+        sys.exit(1)
+
+    if use_cache:
+        # Cached features are in file order; the logger appends rows in time order
+        df_features = load_features(file_path, numeric_cols, windows, target_col)
+        df = pd.DataFrame({target_col: df_features.pop(target_col)})
+    else:
+        df = pd.read_csv(file_path)
+
+        # Sort by time
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        df = df.sort_values('timestamp')
+
+        # 3. Feature Engineering
+        print("Engineering rolling features...")
+        df_features = rolling_features(df, numeric_cols, windows)
+
+    # Drop initial rows for training stability
+    df_features = df_features.iloc[max(windows):]
+    y = df.iloc[max(windows):][target_col]
+    df_features = df_features.fillna(0)
+
+    # 4. Train/Test Split
+    split_idx = int(len(df_features) * (1 - TEST_FRACTION))
+    X_train = df_features.iloc[:split_idx]
+    y_train = y.iloc[:split_idx]
+    X_test = df_features.iloc[split_idx:]
+    y_test = y.iloc[split_idx:]
+    return X_train, y_train, X_test, y_test
+
+
+def fleet_split(days):
+    """Time-ordered split over every host in the fleet store (fleet_store.py), last `days` days."""
+    print(f"Loading all hosts, last {days} days, from {STORE_DIR}...")
+    try:
+        df_features, y = fleet_features(numeric_cols, windows, target_col, days=days)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    split_idx = int(len(df_features) * (1 - TEST_FRACTION))
+    return (df_features.iloc[:split_idx], y.iloc[:split_idx],
+            df_features.iloc[split_idx:], y.iloc[split_idx:])
+
+
+def train_full(file_path, engine='rf', use_cache=True, fleet_days=None):
+    X_train, y_train, X_test, y_test = load_split(file_path, use_cache, fleet_days)
+
+    # 5. Model Training
+    print(f"Training {ENGINES[engine][0]}...")
+    rf = build_model(engine)
+    rf.fit(X_train, y_train)
+
+    # 6. Evaluation
+    print("Evaluating model...")
+    y_pred = rf.predict(X_test)
+    print(classification_report(y_test, y_pred))
+    return rf
+
+
+# =========================
+# OUT-OF-CORE TRAINING
+# =========================
+class ClassReservoir:
+    """
+    Fixed-size uniform sample per class (Algorithm R), float32 rows.
+
+    Memory is n_classes * per_class * n_features * 4 bytes no matter how
+    long the log is, and rare classes (Idle) keep as many rows as common ones.
+    """
+
+    def __init__(self, per_class, n_features, seed=42):
+        self.per_class = per_class
+        self.n_features = n_features
+        self.rng = np.random.default_rng(seed)
+        self.buffers = {}
+        self.seen = {}
+
+    def add(self, X, y):
+        for label in np.unique(y):
+            rows = X[y == label]
+            buf = self.buffers.setdefault(label, np.empty((self.per_class, self.n_features), dtype=np.float32))
+            seen = self.seen.get(label, 0)
+            # Global stream position of each incoming row
+            t = seen + np.arange(len(rows))
+            slot = np.where(t < self.per_class, t, self.rng.integers(0, t + 1))
+            keep = slot < self.per_class
+            # Later rows overwrite earlier ones at the same slot, as in sequential Algorithm R
+            buf[slot[keep]] = rows[keep]
+            self.seen[label] = seen + len(rows)
+
+    def sample(self):
+        labels = sorted(self.buffers)
+        X = np.concatenate([self.buffers[c][:min(self.seen[c], self.per_class)] for c in labels])
+        y = np.concatenate([np.full(min(self.seen[c], self.per_class), c, dtype=object) for c in labels])
+        return X, y
+
+
+def count_rows(file_path, chunk_size=1 << 20):
+    """Data rows in a CSV (newline count minus header) without parsing it."""
+    n = 0
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            n += chunk.count(b'\n')
+    return n - 1
+
+
+def print_confusion_report(cm, labels):
+    """classification_report-style summary from an accumulated confusion matrix."""
+    tp = np.diag(cm).astype(float)
+    support = cm.sum(axis=1)
+    predicted = cm.sum(axis=0)
+    precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+    recall = np.divide(tp, support, out=np.zeros_like(tp), where=support > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall,
+                   out=np.zeros_like(tp), where=(precision + recall) > 0)
+    width = max(len(str(label)) for label in labels) + 2
+    print(f"{'':>{width}} {'precision':>9} {'recall':>9} {'f1-score':>9} {'support':>9}\n")
+    for i, label in enumerate(labels):
+        print(f"{label:>{width}} {precision[i]:>9.2f} {recall[i]:>9.2f} {f1[i]:>9.2f} {support[i]:>9}")
+    print(f"\n{'accuracy':>{width}} {'':>9} {'':>9} {tp.sum() / max(cm.sum(), 1):>9.2f} {cm.sum():>9}")
+    print(f"{'macro avg':>{width}} {precision.mean():>9.2f} {recall.mean():>9.2f} {f1.mean():>9.2f} {cm.sum():>9}")
+
+
+def single_row_latency(model, X, repeat=200):
+    """Median seconds for one predict_proba call on one row."""
+    row = X.iloc[[-1]]
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        model.predict_proba(row)
+        timings.append(time.perf_counter() - t0)
+    return float(np.median(timings))
+
+
+def compare_engines(file_path, use_cache=True, fleet_days=None):
+    """Train every engine on the same time-ordered split and tabulate cost vs quality."""
+    X_train, y_train, X_test, y_test = load_split(file_path, use_cache, fleet_days)
+    print(f"Training samples: {len(X_train)}, testing samples: {len(X_test)}")
+
+    results = []
+    for engine, (title, _) in ENGINES.items():
+        print(f"Training {title}...")
+        model = build_model(engine)
+        t0 = time.perf_counter()
+        model.fit(X_train, y_train)
+        train_s = time.perf_counter() - t0
+        if hasattr(model, 'n_jobs'):
+            # Latency of the live daemon, which predicts one row at a time
+            model.set_params(n_jobs=1)
+        results.append({
+            'engine': engine,
+            'train_s': train_s,
+            'size_mb': len(pickle.dumps(model)) / 1e6,
+            'latency_ms': single_row_latency(model, X_test) * 1000,
+            'macro_f1': f1_score(y_test, model.predict(X_test), average='macro'),
+        })
+
+    print(f"\n{'engine':<8} {'train (s)':>10} {'size (MB)':>10} {'1-row (ms)':>11} {'macro-F1':>9}")
+    for r in results:
+        print(f"{r['engine']:<8} {r['train_s']:>10.2f} {r['size_mb']:>10.2f} "
+              f"{r['latency_ms']:>11.3f} {r['macro_f1']:>9.3f}")
+    return results
+
+
+def train_chunked(file_path, chunksize, per_class, engine='rf'):
+    """
+    Bounded-memory training: features are computed chunk by chunk (rolling
+    state carried across chunk boundaries), training rows feed a
+    class-balanced reservoir, the forest is fit on the reservoir, and the
+    time-ordered test tail is scored chunk by chunk into a confusion matrix.
+    """
+    if not os.path.exists(file_path):
+        print(f"Error: {file_path} not found.")
+        sys.exit(1)
+
+    n_rows = count_rows(file_path) - max(windows)
+    split_idx = int(n_rows * (1 - TEST_FRACTION))
+    n_features = len(numeric_cols) * (1 + 2 * len(windows))
+    print(f"Streaming {n_rows} rows from {file_path} in chunks of {chunksize} "
+          f"(train < row {split_idx}, reservoir {per_class} rows/class)...")
+
+    reservoir = ClassReservoir(per_class, n_features)
+    for X, y, start in iter_feature_chunks(file_path, numeric_cols, windows, chunksize, target_col):
+        if start >= split_idx:
+            break
+        end = min(len(X), split_idx - start)
+        reservoir.add(X[:end], y[:end])
+
+    X_train, y_train = reservoir.sample()
+    counts = {c: int(min(n, per_class)) for c, n in sorted(reservoir.seen.items())}
+    print(f"Training {ENGINES[engine][0]} on reservoir sample {counts}...")
+    rf = build_model(engine)
+    # DataFrame so the model records feature_names_in_ like full-file training
+    rf.fit(pd.DataFrame(X_train, columns=feature_names(numeric_cols, windows)), y_train)
+
+    print("Evaluating model...")
+    labels = list(rf.classes_)
+    cm = np.zeros((len(labels), len(labels)), dtype=np.int64)
+    for X, y, start in iter_feature_chunks(file_path, numeric_cols, windows, chunksize, target_col):
+        if start + len(X) <= split_idx:
+            continue
+        offset = max(0, split_idx - start)
+        X_test = pd.DataFrame(X[offset:], columns=rf.feature_names_in_)
+        cm += confusion_matrix(y[offset:], rf.predict(X_test), labels=labels)
+    print_confusion_report(cm, labels)
+    return rf
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the activity state classifier")
+    parser.add_argument('csv', nargs='?', default=FILE_PATH, help="Labeled activity log")
+    parser.add_argument('--engine', choices=list(ENGINES), default='rf',
+                        help="rf: RandomForest (default), hgb: HistGradientBoosting on uint8-binned features")
+    parser.add_argument('--compare', action='store_true',
+                        help="Train every engine on the same split, print time/size/latency/macro-F1, save nothing")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Recompute features instead of using the on-disk feature cache")
+    parser.add_argument('--chunked', action='store_true',
+                        help="Out-of-core mode: bounded memory for logs larger than RAM")
+    parser.add_argument('--chunksize', type=int, default=100_000, help="Rows per chunk in --chunked mode")
+    parser.add_argument('--per-class', type=int, default=200_000,
+                        help="Reservoir rows kept per label in --chunked mode")
+    parser.add_argument('--fleet-days', type=int, metavar='N',
+                        help="Train on every host in the fleet store over the last N days instead of csv")
+    args = parser.parse_args()
+    if args.chunked and args.fleet_days is not None:
+        # train_chunked streams one CSV; the fleet store has no chunked reader
+        parser.error("--chunked trains on a single csv and cannot be combined with --fleet-days")
+    return args
+
+
+def main():
+    args = parse_args()
+    if args.compare:
+        compare_engines(args.csv, not args.no_cache, args.fleet_days)
+        return
+    if args.chunked:
+        rf = train_chunked(args.csv, args.chunksize, args.per_class, args.engine)
+        trained_on = args.csv
+    elif args.fleet_days is not None:
+        rf = train_full(args.csv, args.engine, not args.no_cache, args.fleet_days)
+        # The manifest lists every ingested upload, so its hash identifies the fleet data
+        trained_on = STORE_DIR / 'manifest.json'
+    else:
+        rf = train_full(args.csv, args.engine, not args.no_cache)
+        trained_on = args.csv
+
+    # 7. Save Model
+    print(f"Saving model to {MODEL_PATH}...")
+    # Write then rename, so a running live_inference.py never sees a half-written file
+    joblib.dump(rf, MODEL_PATH + '.tmp')
+    os.replace(MODEL_PATH + '.tmp', MODEL_PATH)
+
+    # Memory-mappable copy + metadata sidecar for the inference daemons
+    metadata = save_model(
+        rf, STORE_PATH,
+        training_data_path=trained_on,
+        feature_spec={'numeric_cols': numeric_cols, 'windows': windows, 'engine': args.engine},
+    )
+    print(f"Saved model store {STORE_PATH} (version {metadata['model_hash'][:12]})")
+    print("Done.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Walk-forward cross-validation and hyperparameter search for the activity model.
+
+    python tune_model.py [log.csv] [--splits 5] [--workers N] [--out tuning_results.csv]
+
+Rolling features for every column and window in the search space are
+computed ONCE, written to a float32 .npy file and opened read-only with
+mmap_mode='r' by every worker process, so the pool shares one copy through
+the page cache instead of recomputing (or pickling) the matrix per task.
+
+Folds are time-ordered (TimeSeriesSplit) with a gap of max(all windows)
+rows between train and test, so no 30 s rolling window straddles a fold
+boundary.
+"""
+import argparse
+import itertools
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import f1_score
+from sklearn.model_selection import TimeSeriesSplit
+
+import train_model
+from activity_features import feature_names, rolling_features
+
+# =========================
+# SEARCH SPACE
+# =========================
+WINDOW_SETS = [
+    [5, 30],
+    [5, 15, 30],
+    [10, 60],
+]
+
+FEATURE_SETS = {
+    'with_idle': train_model.numeric_cols,
+    # What system_only_model/train_model.py uses: no input-derived columns
+    'system_only': [c for c in train_model.numeric_cols if c != 'idle_time_sec'] + ['max_gpu'],
+}
+
+PARAM_GRID = {
+    'rf': [
+        {'n_estimators': n, 'max_depth': d}
+        for n, d in itertools.product([100, 200], [10, 15, None])
+    ],
+    'hgb': [
+        {'learning_rate': lr, 'max_iter': it}
+        for lr, it in itertools.product([0.05, 0.1], [100, 200])
+    ],
+}
+
+# =========================
+# SHARED FEATURE MATRIX
+# =========================
+def build_feature_matrix(file_path, workdir):
+    """Compute the union of all candidate features once; returns (X path, y path, columns)."""
+    cols = sorted(set(itertools.chain.from_iterable(FEATURE_SETS.values())))
+    windows = sorted(set(itertools.chain.from_iterable(WINDOW_SETS)))
+
+    print(f"Loading {file_path}...")
+    df = pd.read_csv(file_path, usecols=['timestamp', train_model.target_col, *cols])
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df = df.sort_values('timestamp', kind='stable')
+
+    print(f"Computing rolling features for {len(cols)} columns x windows {windows}...")
+    features = rolling_features(df, cols, windows).iloc[max(windows):].fillna(0)
+    y = df[train_model.target_col].iloc[max(windows):].to_numpy()
+
+    X_path = os.path.join(workdir, 'X.npy')
+    y_path = os.path.join(workdir, 'y.npy')
+    np.save(X_path, features.to_numpy(dtype=np.float32))
+    np.save(y_path, y.astype(str))
+    return X_path, y_path, list(features.columns)
+
+
+_X = None
+_y = None
+_columns = None
+
+
+def _init_worker(X_path, y_path, columns):
+    global _X, _y, _columns
+    # Read-only maps: every worker shares the same physical pages
+    _X = np.load(X_path, mmap_mode='r')
+    _y = np.load(y_path, mmap_mode='r')
+    _columns = {name: i for i, name in enumerate(columns)}
+
+
+def _run_fold(candidate, train_idx, test_idx):
+    cols = feature_names(FEATURE_SETS[candidate['features']], candidate['windows'])
+    col_idx = [_columns[c] for c in cols]
+
+    model = train_model.build_model(candidate['engine'])
+    model.set_params(**candidate['params'])
+    if 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=1)  # parallelism comes from the pool
+
+    X_train = pd.DataFrame(_X[train_idx[0]:train_idx[1], col_idx], columns=cols)
+    X_test = pd.DataFrame(_X[test_idx[0]:test_idx[1], col_idx], columns=cols)
+    model.fit(X_train, _y[train_idx[0]:train_idx[1]])
+    y_pred = model.predict(X_test)
+    return f1_score(_y[test_idx[0]:test_idx[1]], y_pred, average='macro')
+
+
+def candidates():
+    for engine, grid in PARAM_GRID.items():
+        for windows, features, params in itertools.product(WINDOW_SETS, FEATURE_SETS, grid):
+            yield {'engine': engine, 'windows': windows, 'features': features, 'params': params}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward CV + hyperparameter search")
+    parser.add_argument('csv', nargs='?', default=train_model.FILE_PATH)
+    parser.add_argument('--splits', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--out', default='tuning_results.csv')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.csv):
+        print(f"Error: {args.csv} not found.")
+        sys.exit(1)
+
+    gap = max(itertools.chain.from_iterable(WINDOW_SETS))
+    with tempfile.TemporaryDirectory(prefix='tune_model_') as workdir:
+        X_path, y_path, columns = build_feature_matrix(args.csv, workdir)
+        n_rows = len(np.load(y_path, mmap_mode='r'))
+
+        splitter = TimeSeriesSplit(n_splits=args.splits, gap=gap)
+        # Folds are contiguous ranges; ship (start, stop) pairs, not index arrays
+        folds = [((tr[0], tr[-1] + 1), (te[0], te[-1] + 1)) for tr, te in splitter.split(np.empty(n_rows))]
+        grid = list(candidates())
+        print(f"{len(grid)} candidates x {len(folds)} folds (gap {gap} rows) on {args.workers} workers...")
+
+        scores = {i: [] for i in range(len(grid))}
+        t0 = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                 initargs=(X_path, y_path, columns)) as pool:
+            futures = {
+                pool.submit(_run_fold, cand, tr, te): i
+                for i, cand in enumerate(grid)
+                for tr, te in folds
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                scores[futures[future]].append(future.result())
+                if done % 20 == 0 or done == len(futures):
+                    print(f"  {done}/{len(futures)} fits ({time.perf_counter() - t0:.0f}s)")
+
+    rows = []
+    for i, cand in enumerate(grid):
+        rows.append({
+            'engine': cand['engine'],
+            'features': cand['features'],
+            'windows': '/'.join(map(str, cand['windows'])),
+            'params': ' '.join(f'{k}={v}' for k, v in cand['params'].items()),
+            'macro_f1_mean': np.mean(scores[i]),
+            'macro_f1_std': np.std(scores[i]),
+        })
+    results = pd.DataFrame(rows).sort_values('macro_f1_mean', ascending=False)
+    results.to_csv(args.out, index=False)
+
+    print("\n--- Top 10 candidates (walk-forward macro-F1) ---")
+    print(results.head(10).to_string(index=False))
+    print(f"\nFull results saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import matplotlib
 matplotlib.use("Agg")
 
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
@@ -8,9 +9,15 @@ import os
 import textwrap
 import re
 
+from plot_utils import target_points, thin_points
+from report_runner import run_report
+from string_dict import read_log
+
 # Setup
 INPUT_FILE = 'comprehensive_activity_log_with_Idle.csv'
 OUTPUT_DIR = 'window_title_reports'
+TOP_N = 15
+OTHER = '... Other Windows ...'
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 def clean_text(text):
@@ -22,31 +29,59 @@ def clean_text(text):
     text = re.sub(r'[^\x00-\x7F]+', '', text)
     return text.strip()
 
-def generate_window_visualizations():
+def intern_titles(titles):
+    """
+    Cleaned titles as a Categorical. clean_text runs once per DISTINCT raw
+    title; rows only carry int codes (raw titles that clean to the same text
+    share one category).
+    """
+    raw_codes, raw_uniques = pd.factorize(titles, use_na_sentinel=False)
+    cleaned = [clean_text(t) for t in raw_uniques]
+    clean_codes, clean_uniques = pd.factorize(pd.Series(cleaned, dtype=object))
+    return pd.Categorical.from_codes(clean_codes[raw_codes].astype(np.int32), categories=clean_uniques)
+
+def group_top_titles(titles, top_n=TOP_N):
+    """Top-N titles by row count kept, the rest bucketed into OTHER, all on codes."""
+    counts = np.bincount(titles.codes, minlength=len(titles.categories))
+    top = np.argsort(-counts, kind='stable')[:top_n]
+    remap = np.full(len(titles.categories), len(top), dtype=np.int32)
+    remap[top] = np.arange(len(top), dtype=np.int32)
+    return pd.Categorical.from_codes(remap[titles.codes], categories=[*titles.categories[top], OTHER])
+
+def load_data():
     print(f"Reading {INPUT_FILE}...")
-    df = pd.read_csv(INPUT_FILE)
+    df = read_log(INPUT_FILE)
     df['timestamp'] = pd.to_datetime(df['timestamp'])
     
-    # 1. CLEAN DATA
-    df['window_title'] = df['window_title'].apply(clean_text)
-    
-    # Identify Top 15 windows to keep the charts clean
-    top_n = 15
-    counts = df['window_title'].value_counts()
-    top_windows = counts.nlargest(top_n).index
+    # 1. CLEAN DATA (once per distinct title)
+    df['window_title'] = intern_titles(df['window_title'])
     
-    # Group everything else into "Other"
-    df['window_grouped'] = df['window_title'].apply(lambda x: x if x in top_windows else '... Other Windows ...')
+    # Keep the Top 15 windows, group everything else into "Other"
+    df['window_grouped'] = group_top_titles(df['window_title'].array)
+    return df
+
+def group_counts(df):
+    """Rows per window group, largest first (zero-count groups dropped)."""
+    grouped = df['window_grouped'].array
+    counts = pd.Series(np.bincount(grouped.codes, minlength=len(grouped.categories)),
+                       index=pd.Index(grouped.categories, dtype=object))
+    return counts[counts > 0].sort_values(ascending=False, kind='stable')
 
+def plot_focus_timeline(df):
     # 2. WINDOW FOCUS TIMELINE (Cleaned)
     print("Generating Window Focus Timeline (Top 15 + Others)...")
     plt.figure(figsize=(16, 10))
     
-    # Sort y-axis so "Other" is at the bottom
-    y_order = list(top_windows) + ['... Other Windows ...']
+    # Sort y-axis so "Other" is at the bottom (category order: top titles, then Other)
+    y_order = list(df['window_grouped'].cat.categories)
+    
+    # One marker per pixel column per (window, label) looks the same as all of them
+    window_codes = df['window_grouped'].cat.codes.to_numpy()
+    label_codes, label_uniques = pd.factorize(df['label'])
+    keep = thin_points(window_codes * (len(label_uniques) + 1) + label_codes + 1, target_points(plt.gca()))
     
     sns.scatterplot(
-        data=df, 
+        data=df.iloc[keep], 
         x='timestamp', 
         y='window_grouped', 
         hue='label', 
@@ -55,7 +90,7 @@ def generate_window_visualizations():
         edgecolor=None
     )
     
-    plt.title(f'Timeline of Active Windows (Top {top_n} vs Others)')
+    plt.title(f'Timeline of Active Windows (Top {TOP_N} vs Others)')
     plt.yticks(ticks=range(len(y_order)), labels=[textwrap.fill(t, 50) for t in y_order])
     plt.xlabel('Time')
     plt.ylabel('Window Title')
@@ -65,10 +100,11 @@ def generate_window_visualizations():
     plt.savefig(f"{OUTPUT_DIR}/1_window_focus_timeline.png")
     plt.close()
 
+def plot_duration_ranking(df):
     # 3. TOTAL DURATION (Fixed Palette Warning)
     print("Generating Window Duration Chart...")
     plt.figure(figsize=(12, 8))
-    window_counts = df['window_grouped'].value_counts()
+    window_counts = group_counts(df)
     
     sns.barplot(
         x=window_counts.values, 
@@ -84,6 +120,7 @@ def generate_window_visualizations():
     plt.savefig(f"{OUTPUT_DIR}/2_window_duration_ranking.png")
     plt.close()
 
+def plot_resource_impact(df):
     # 4. RESOURCE IMPACT (Fixed Palette Warning)
     print("Generating Resource Impact Boxplots...")
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(20, 10))
@@ -116,10 +153,20 @@ def generate_window_visualizations():
     plt.savefig(f"{OUTPUT_DIR}/3_window_resource_impact.png")
     plt.close()
 
+def plot_behavior_heatmap(df):
     # 5. BEHAVIOR HEATMAP
     print("Generating Behavior Heatmap...")
     # Calculate percentage of time each window spends in each label
-    pivot_data = pd.crosstab(df['window_grouped'], df['label'], normalize='index') * 100
+    grouped = df['window_grouped'].array
+    label_codes, label_uniques = pd.factorize(df['label'], use_na_sentinel=False)
+    table = np.bincount(grouped.codes * len(label_uniques) + label_codes,
+                        minlength=len(grouped.categories) * len(label_uniques))
+    pivot_data = pd.DataFrame(table.reshape(len(grouped.categories), len(label_uniques)),
+                              index=pd.Index(grouped.categories, dtype=object, name='window_grouped'),
+                              columns=pd.Index(label_uniques, name='label'))
+    # Same rows/columns and order as pd.crosstab(..., normalize='index')
+    pivot_data = pivot_data[pivot_data.sum(axis=1) > 0].sort_index().sort_index(axis=1)
+    pivot_data = pivot_data.div(pivot_data.sum(axis=1), axis=0) * 100
     
     plt.figure(figsize=(12, 8))
     sns.heatmap(pivot_data, annot=True, cmap="YlGnBu", fmt=".1f")
@@ -128,6 +175,14 @@ def generate_window_visualizations():
     plt.savefig(f"{OUTPUT_DIR}/4_window_behavior_heatmap.png")
     plt.close()
 
+PLOTS = [plot_focus_timeline, plot_duration_ranking, plot_resource_impact, plot_behavior_heatmap]
+
+def generate_window_visualizations():
+    df = load_data()
+
+    # Each chart renders in its own process over one shared copy of the data
+    run_report(df, PLOTS)
+
     print(f"\nDone! Cleaned charts saved to: {os.path.abspath(OUTPUT_DIR)}")
 
 if __name__ == "__main__":
@@ -7,6 +7,10 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from pathlib import Path
 
+# Shared plotting helpers (min/max downsampling)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "final_recording_script"))
+from plot_utils import plot_lod  # noqa: E402
+
 sns.set_theme(style="darkgrid")
 
 def main(csv_path):
@@ -87,7 +91,7 @@ def main(csv_path):
 def plot_timeseries(df, cols, title, outpath):
     plt.figure(figsize=(12,5))
     for c in cols:
-        plt.plot(df["timestamp"], df[c], label=c)
+        plot_lod(plt.gca(), df["timestamp"], df[c], label=c)
     plt.legend()
     plt.title(title)
     plt.xlabel("Time")
@@ -108,7 +112,7 @@ def plot_hist(series, title, outpath):
 def plot_categorical_timeline(df, col, outpath):
     plt.figure(figsize=(12,4))
     codes, uniques = pd.factorize(df[col])
-    plt.plot(df["timestamp"], codes, drawstyle="steps-post")
+    plot_lod(plt.gca(), df["timestamp"], codes, drawstyle="steps-post")
     plt.yticks(range(len(uniques)), uniques)
     plt.title(f"{col} over time")
     plt.tight_layout()
@@ -1,8 +1,6 @@
 import pandas as pd
 import numpy as np
-import torch
-import torch.nn as nn
-import joblib
+import sys
 import time
 
 # ----------------------------
@@ -12,44 +10,64 @@ import time
 CSV_PATH = "system_metrics.csv"   # live-updating file
 MODEL_PATH = "cpu_predictor.pt"
 SCALER_PATH = "scaler.save"
+ONNX_PATH = "cpu_predictor.onnx"  # produced by export_onnx.py
+
+# "torch" (original) or "onnx" (numpy + onnxruntime only, scaler baked in)
+BACKEND = sys.argv[1] if len(sys.argv) > 1 else "torch"
 
 SEQ_LEN = 120
 POLL_INTERVAL = 1  # seconds
 
 # ----------------------------
-# Model definition
-# ----------------------------
-
-class LSTMModel(nn.Module):
-    def __init__(self, input_size):
-        super().__init__()
-        self.lstm = nn.LSTM(input_size, 64, batch_first=True)
-        self.fc = nn.Linear(64, 1)
-
-    def forward(self, x):
-        out, _ = self.lstm(x)
-        out = out[:, -1, :]
-        out = self.fc(out)
-        return out
-
-# ----------------------------
-# Load scaler and model
+# Load backend
 # ----------------------------
 
-scaler = joblib.load(SCALER_PATH)
-
-# Determine input feature count from CSV
-tmp = pd.read_csv(CSV_PATH, nrows=1)
-tmp["timestamp"] = pd.to_datetime(tmp["timestamp"])
-tmp["time_sec"] = tmp["timestamp"].astype("int64") // 10**9
-tmp = tmp.drop(columns=["timestamp"])   # KEEP cpu_percent
-input_size = tmp.shape[1]
-
-model = LSTMModel(input_size)
-model.load_state_dict(torch.load(MODEL_PATH))
-model.eval()
+if BACKEND == "onnx":
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = 1
+    session = ort.InferenceSession(ONNX_PATH, sess_options=options)
+
+    def predict(seq):
+        return float(session.run(None, {"sequence": seq[np.newaxis]})[0][0, 0])
+else:
+    import torch
+    import torch.nn as nn
+    import joblib
+
+    class LSTMModel(nn.Module):
+        def __init__(self, input_size):
+            super().__init__()
+            self.lstm = nn.LSTM(input_size, 64, batch_first=True)
+            self.fc = nn.Linear(64, 1)
+
+        def forward(self, x):
+            out, _ = self.lstm(x)
+            out = out[:, -1, :]
+            out = self.fc(out)
+            return out
+
+    scaler = joblib.load(SCALER_PATH)
+
+    # Determine input feature count from CSV
+    tmp = pd.read_csv(CSV_PATH, nrows=1)
+    tmp["timestamp"] = pd.to_datetime(tmp["timestamp"])
+    tmp["time_sec"] = tmp["timestamp"].astype("int64") // 10**9
+    tmp = tmp.drop(columns=["timestamp"])   # KEEP cpu_percent
+    input_size = tmp.shape[1]
+
+    model = LSTMModel(input_size)
+    model.load_state_dict(torch.load(MODEL_PATH))
+    model.eval()
+
+    def predict(seq):
+        # Normalize with training scaler
+        seq = scaler.transform(seq).astype(np.float32)
+        with torch.no_grad():
+            return model(torch.from_numpy(seq).unsqueeze(0)).item()
 
-print("Model loaded. Waiting for data...")
+print(f"Model loaded ({BACKEND}). Waiting for data...")
 
 # ----------------------------
 # Load latest sequence
@@ -69,14 +87,8 @@ def load_latest_sequence():
     # All remaining columns INCLUDING cpu_percent are features
     features = df.values.astype(np.float32)
 
-    # Normalize with training scaler
-    features = scaler.transform(features)
-
-    # Take last SEQ_LEN timesteps
-    seq = features[-SEQ_LEN:]
-    seq = torch.tensor(seq).unsqueeze(0)  # shape: (1, seq_len, features)
-
-    return seq
+    # Take last SEQ_LEN timesteps, shape: (seq_len, features)
+    return features[-SEQ_LEN:]
 
 # ----------------------------
 # Prediction loop
@@ -86,9 +98,7 @@ while True:
     seq = load_latest_sequence()
 
     if seq is not None:
-        with torch.no_grad():
-            pred = model(seq)
-            cpu_next = pred.item()
-            print(f"Predicted next CPU usage: {cpu_next:.2f}%")
+        cpu_next = predict(seq)
+        print(f"Predicted next CPU usage: {cpu_next:.2f}%")
 
     time.sleep(POLL_INTERVAL)
@@ -0,0 +1,83 @@
+import numpy as np
+import torch
+import torch.nn as nn
+import joblib
+
+# ----------------------------
+# Config
+# ----------------------------
+
+MODEL_PATH = "cpu_predictor.pt"
+SCALER_PATH = "scaler.save"
+ONNX_PATH = "cpu_predictor.onnx"
+
+SEQ_LEN = 120
+
+# ----------------------------
+# Model definition (same as training)
+# ----------------------------
+
+class LSTMModel(nn.Module):
+    def __init__(self, input_size):
+        super().__init__()
+        self.lstm = nn.LSTM(input_size, 64, batch_first=True)
+        self.fc = nn.Linear(64, 1)
+
+    def forward(self, x):
+        out, _ = self.lstm(x)
+        out = out[:, -1, :]
+        out = self.fc(out)
+        return out
+
+
+class ScaledLSTM(nn.Module):
+    """Bakes the StandardScaler into the graph so inference needs no sklearn."""
+
+    def __init__(self, model, mean, scale):
+        super().__init__()
+        self.model = model
+        self.register_buffer("mean", torch.tensor(mean, dtype=torch.float32))
+        self.register_buffer("scale", torch.tensor(scale, dtype=torch.float32))
+
+    def forward(self, x):
+        return self.model((x - self.mean) / self.scale)
+
+# ----------------------------
+# Export
+# ----------------------------
+
+scaler = joblib.load(SCALER_PATH)
+state = torch.load(MODEL_PATH)
+input_size = state["lstm.weight_ih_l0"].shape[1]
+
+model = LSTMModel(input_size)
+model.load_state_dict(state)
+model.eval()
+
+wrapped = ScaledLSTM(model, scaler.mean_, scaler.scale_)
+wrapped.eval()
+
+dummy = torch.zeros(1, SEQ_LEN, input_size)
+torch.onnx.export(
+    wrapped,
+    dummy,
+    ONNX_PATH,
+    input_names=["sequence"],
+    output_names=["cpu_next"],
+    dynamic_axes={"sequence": {0: "batch", 1: "seq_len"}, "cpu_next": {0: "batch"}},
+    opset_version=17,
+)
+
+# Sanity check against torch on random data
+try:
+    import onnxruntime as ort
+
+    sample = np.random.rand(1, SEQ_LEN, input_size).astype(np.float32) * 100
+    with torch.no_grad():
+        expected = wrapped(torch.from_numpy(sample)).numpy()
+    got = ort.InferenceSession(ONNX_PATH).run(None, {"sequence": sample})[0]
+    print(f"Max abs diff torch vs onnx: {np.abs(expected - got).max():.2e}")
+except ImportError:
+    pass
+
+print(f"Exported {ONNX_PATH} (input_size={input_size}, scaler baked in)")